@@ -1,5 +1,14 @@
 from django.apps import AppConfig
+from django.core.signals import request_started
+from django.db.backends.signals import connection_created
 
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from core import sqlite_tuning, thumbnail_kvstore, timing
+        timing.instrument_templates()
+        connection_created.connect(sqlite_tuning.configure_connection)
+        request_started.connect(sqlite_tuning.check_connections)
+        request_started.connect(thumbnail_kvstore.forget_misses)
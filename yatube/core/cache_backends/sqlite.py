@@ -0,0 +1,287 @@
+"""Общий для всех процессов кеш в файле SQLite.
+
+Воркеры WSGI на одной машине открывают один и тот же файл в режиме WAL,
+поэтому видят записи и сбросы друг друга. Размер кеша ограничен
+количеством записей (MAX_ENTRIES) и суммарным объемом значений
+(MAX_SIZE), при переполнении вытесняются давно не читанные записи.
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+from core import metrics
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache ('
+    'key TEXT PRIMARY KEY, '
+    'value BLOB NOT NULL, '
+    'expires REAL, '
+    'accessed REAL NOT NULL, '
+    'size INTEGER NOT NULL) WITHOUT ROWID',
+    'CREATE INDEX IF NOT EXISTS cache_accessed_idx ON cache (accessed)',
+    'CREATE INDEX IF NOT EXISTS cache_expires_idx ON cache (expires)',
+    'CREATE TABLE IF NOT EXISTS cache_usage ('
+    'id INTEGER PRIMARY KEY CHECK (id = 1), '
+    'entries INTEGER NOT NULL, '
+    'size INTEGER NOT NULL)',
+    'INSERT OR IGNORE INTO cache_usage (id, entries, size) VALUES (1, 0, 0)',
+    'CREATE TRIGGER IF NOT EXISTS cache_usage_insert AFTER INSERT ON cache '
+    'BEGIN UPDATE cache_usage SET entries = entries + 1, '
+    'size = size + new.size; END',
+    'CREATE TRIGGER IF NOT EXISTS cache_usage_delete AFTER DELETE ON cache '
+    'BEGIN UPDATE cache_usage SET entries = entries - 1, '
+    'size = size - old.size; END',
+    'CREATE TRIGGER IF NOT EXISTS cache_usage_update '
+    'AFTER UPDATE OF size ON cache '
+    'BEGIN UPDATE cache_usage SET size = size - old.size + new.size; END',
+)
+
+# SQLite ограничивает количество параметров в одном запросе.
+MAX_VARIABLES = 900
+
+
+class SQLiteCache(BaseCache):
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._path = os.path.abspath(location)
+        self._max_size = int(options.get('MAX_SIZE', 256 * 1024 * 1024))
+        self._busy_timeout = float(options.get('BUSY_TIMEOUT', 5))
+        # Время последнего чтения обновляется не чаще, чем раз в
+        # ACCESS_GRANULARITY секунд, чтобы чтения почти не писали в файл.
+        self._access_granularity = float(
+            options.get('ACCESS_GRANULARITY', 30)
+        )
+        self._local = threading.local()
+
+    @property
+    def _connection(self):
+        # После fork соединение родителя использовать нельзя.
+        if getattr(self._local, 'pid', None) != os.getpid():
+            self._local.connection = self._connect()
+            self._local.pid = os.getpid()
+        return self._local.connection
+
+    def _connect(self):
+        directory = os.path.dirname(self._path)
+        os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(
+            self._path,
+            timeout=self._busy_timeout,
+            isolation_level=None,
+        )
+        connection.execute('PRAGMA journal_mode = WAL')
+        connection.execute('PRAGMA synchronous = NORMAL')
+        with connection:
+            for statement in SCHEMA:
+                connection.execute(statement)
+        return connection
+
+    def _transaction(self):
+        return _ImmediateTransaction(self._connection)
+
+    def _dumps(self, value):
+        return pickle.dumps(value, self.pickle_protocol)
+
+    def _make_key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    @staticmethod
+    def _is_expired(expires, now):
+        return expires is not None and expires <= now
+
+    def _fetch(self, keys):
+        now = time.time()
+        rows = {}
+        for start in range(0, len(keys), MAX_VARIABLES):
+            chunk = keys[start:start + MAX_VARIABLES]
+            placeholders = ','.join('?' * len(chunk))
+            rows.update(
+                (key, (value, expires, accessed))
+                for key, value, expires, accessed in self._connection.execute(
+                    'SELECT key, value, expires, accessed FROM cache '
+                    f'WHERE key IN ({placeholders})',
+                    chunk,
+                )
+            )
+        found, expired, stale = {}, [], []
+        for key, (value, expires, accessed) in rows.items():
+            if self._is_expired(expires, now):
+                expired.append(key)
+                continue
+            found[key] = pickle.loads(value)
+            if accessed < now - self._access_granularity:
+                stale.append(key)
+        if expired or stale:
+            with self._transaction() as connection:
+                self._delete_keys(connection, expired)
+                connection.executemany(
+                    'UPDATE cache SET accessed = ? WHERE key = ?',
+                    [(now, key) for key in stale],
+                )
+        return found
+
+    @staticmethod
+    def _delete_keys(connection, keys):
+        for start in range(0, len(keys), MAX_VARIABLES):
+            chunk = keys[start:start + MAX_VARIABLES]
+            placeholders = ','.join('?' * len(chunk))
+            connection.execute(
+                f'DELETE FROM cache WHERE key IN ({placeholders})', chunk
+            )
+
+    def _store(self, connection, items, timeout):
+        now = time.time()
+        expires = self.get_backend_timeout(timeout)
+        rows = []
+        for key, value in items:
+            pickled = self._dumps(value)
+            rows.append((key, pickled, expires, now, len(key) + len(pickled)))
+        # Upsert вместо INSERT OR REPLACE: REPLACE удаляет строку без
+        # вызова триггеров, и счетчики в cache_usage разошлись бы.
+        connection.executemany(
+            'INSERT INTO cache (key, value, expires, accessed, size) '
+            'VALUES (?, ?, ?, ?, ?) ON CONFLICT (key) DO UPDATE SET '
+            'value = excluded.value, expires = excluded.expires, '
+            'accessed = excluded.accessed, size = excluded.size',
+            rows,
+        )
+        self._cull(connection, now)
+
+    def _cull(self, connection, now):
+        entries, size = connection.execute(
+            'SELECT entries, size FROM cache_usage'
+        ).fetchone()
+        if entries <= self._max_entries and size <= self._max_size:
+            return
+        connection.execute('DELETE FROM cache WHERE expires <= ?', (now,))
+        if self._cull_frequency == 0:
+            connection.execute('DELETE FROM cache')
+            return
+        while True:
+            entries, size = connection.execute(
+                'SELECT entries, size FROM cache_usage'
+            ).fetchone()
+            if entries <= self._max_entries and size <= self._max_size:
+                return
+            # Вытесняем самые давно прочитанные записи порциями,
+            # как CULL_FREQUENCY у встроенных бэкендов.
+            batch = max(entries // self._cull_frequency, 1)
+            connection.execute(
+                'DELETE FROM cache WHERE key IN ('
+                'SELECT key FROM cache ORDER BY accessed LIMIT ?)',
+                (batch,),
+            )
+
+    def get(self, key, default=None, version=None):
+        made_key = self._make_key(key, version)
+        found = self._fetch([made_key])
+        metrics.count_cache_lookups([key], {key} if found else ())
+        return found.get(made_key, default)
+
+    def get_many(self, keys, version=None):
+        keys_map = {self._make_key(key, version): key for key in keys}
+        found = self._fetch(list(keys_map))
+        found = {keys_map[key]: value for key, value in found.items()}
+        metrics.count_cache_lookups(keys_map.values(), found)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._make_key(key, version)
+        with self._transaction() as connection:
+            self._store(connection, [(key, value)], timeout)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        items = [
+            (self._make_key(key, version), value)
+            for key, value in data.items()
+        ]
+        with self._transaction() as connection:
+            self._store(connection, items, timeout)
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._make_key(key, version)
+        with self._transaction() as connection:
+            row = connection.execute(
+                'SELECT expires FROM cache WHERE key = ?', (key,)
+            ).fetchone()
+            if row is not None and not self._is_expired(row[0], time.time()):
+                return False
+            self._store(connection, [(key, value)], timeout)
+        return True
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._make_key(key, version)
+        now = time.time()
+        with self._transaction() as connection:
+            cursor = connection.execute(
+                'UPDATE cache SET expires = ?, accessed = ? '
+                'WHERE key = ? AND (expires IS NULL OR expires > ?)',
+                (self.get_backend_timeout(timeout), now, key, now),
+            )
+        return cursor.rowcount == 1
+
+    def incr(self, key, delta=1, version=None):
+        key = self._make_key(key, version)
+        now = time.time()
+        # BEGIN IMMEDIATE берет блокировку на запись до чтения значения,
+        # поэтому параллельные incr из разных процессов не теряются.
+        with self._transaction() as connection:
+            row = connection.execute(
+                'SELECT value, expires FROM cache WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None or self._is_expired(row[1], now):
+                raise ValueError(f"Key '{key}' not found")
+            value = pickle.loads(row[0]) + delta
+            pickled = self._dumps(value)
+            connection.execute(
+                'UPDATE cache SET value = ?, accessed = ?, size = ? '
+                'WHERE key = ?',
+                (pickled, now, len(key) + len(pickled), key),
+            )
+        return value
+
+    def has_key(self, key, version=None):
+        key = self._make_key(key, version)
+        row = self._connection.execute(
+            'SELECT expires FROM cache WHERE key = ?', (key,)
+        ).fetchone()
+        return row is not None and not self._is_expired(row[0], time.time())
+
+    def delete(self, key, version=None):
+        key = self._make_key(key, version)
+        with self._transaction() as connection:
+            self._delete_keys(connection, [key])
+
+    def delete_many(self, keys, version=None):
+        keys = [self._make_key(key, version) for key in keys]
+        with self._transaction() as connection:
+            self._delete_keys(connection, keys)
+
+    def clear(self):
+        with self._transaction() as connection:
+            connection.execute('DELETE FROM cache')
+
+
+class _ImmediateTransaction:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        self.connection.execute('BEGIN IMMEDIATE')
+        return self.connection
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.connection.execute('COMMIT')
+        else:
+            self.connection.execute('ROLLBACK')
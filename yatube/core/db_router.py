@@ -0,0 +1,99 @@
+"""Чтение страниц постов с реплик.
+
+ReplicaMiddleware в process_view решает, можно ли читать с реплики:
+только GET и HEAD представлений из DATABASE_REPLICA_VIEWS. Роутер
+отправляет такие чтения на случайную реплику из DATABASE_REPLICAS,
+файл которой уже существует; остальные чтения и все записи идут в
+default.
+
+Реплика отстает от основной базы на интервал репликации, поэтому после
+записи пользователь получает cookie DATABASE_PIN_COOKIE на
+DATABASE_PIN_SECONDS секунд, и пока она жива, его чтения идут в
+default - так он сразу видит свой пост или комментарий.
+"""
+import os
+import random
+import threading
+
+from django.conf import settings
+
+SAFE_METHODS = ('GET', 'HEAD')
+
+_local = threading.local()
+
+
+class RoutingState:
+    def __init__(self, pinned):
+        self.pinned = pinned
+        self.use_replica = False
+        self.wrote = False
+
+
+def _state():
+    return getattr(_local, 'state', None)
+
+
+def available_replicas():
+    """Реплики, файл которых уже создан репликацией."""
+    return [
+        alias for alias in settings.DATABASE_REPLICAS
+        if os.path.exists(settings.DATABASES[alias]['NAME'])
+    ]
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _state()
+        if state is None or not state.use_replica:
+            return None
+        replicas = available_replicas()
+        return random.choice(replicas) if replicas else None
+
+    def db_for_write(self, model, **hints):
+        state = _state()
+        if state is not None:
+            state.wrote = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Реплики получают схему вместе с данными копированием файла.
+        return db not in settings.DATABASE_REPLICAS
+
+
+class ReplicaMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        state = RoutingState(
+            pinned=settings.DATABASE_PIN_COOKIE in request.COOKIES
+        )
+        _local.state = state
+        try:
+            response = self.get_response(request)
+        finally:
+            _local.state = None
+        if state.wrote and settings.DATABASE_REPLICAS:
+            response.set_cookie(
+                settings.DATABASE_PIN_COOKIE,
+                '1',
+                max_age=settings.DATABASE_PIN_SECONDS,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
+
+    @staticmethod
+    def process_view(request, view_func, view_args, view_kwargs):
+        state = _state()
+        if state is None:
+            return
+        state.use_replica = (
+            request.method in SAFE_METHODS
+            and not state.pinned
+            and request.resolver_match.view_name
+            in settings.DATABASE_REPLICA_VIEWS
+        )
@@ -0,0 +1,128 @@
+import multiprocessing
+import shutil
+import tempfile
+import time
+
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand
+
+from core.cache_backends.sqlite import SQLiteCache
+
+
+def count_hits(backend, location, params, keys, queue):
+    cache = backend(location, params)
+    queue.put(sum(cache.get(key) is not None for key in keys))
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает производительность кеша SQLite с locmem и файловым '
+        'кешем, а также проверяет общие попадания между процессами.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--operations',
+            type=int,
+            default=5000,
+            help='Количество операций каждого типа',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=4,
+            help='Количество процессов для проверки общих попаданий',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=50,
+            help='Размер пакета для get_many/set_many',
+        )
+
+    def handle(self, *args, **options):
+        directory = tempfile.mkdtemp()
+        params = {'OPTIONS': {'MAX_ENTRIES': options['operations'] * 2}}
+        backends = {
+            'locmem': (LocMemCache, 'bench'),
+            'filebased': (FileBasedCache, f'{directory}/filebased'),
+            'sqlite': (SQLiteCache, f'{directory}/cache.sqlite3'),
+        }
+        header = (
+            f'{"backend":<10} {"set":>10} {"get":>10} {"get_many":>10} '
+            f'{"set_many":>10} {"incr":>10} {"shared hits":>12}'
+        )
+        self.stdout.write('Операций в секунду:')
+        self.stdout.write(header)
+        try:
+            for name, (backend, location) in backends.items():
+                results = self.run_backend(
+                    backend, location, params, options
+                )
+                self.stdout.write(
+                    f'{name:<10} '
+                    + ' '.join(f'{value:>10.0f}' for value in results[:-1])
+                    + f' {results[-1]:>11.0%}'
+                )
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def run_backend(self, backend, location, params, options):
+        cache = backend(location, params)
+        cache.clear()
+        operations = options['operations']
+        batch_size = options['batch_size']
+        keys = [f'bench:{number}' for number in range(operations)]
+        payload = {'text': 'x' * 200, 'ids': list(range(20))}
+        batches = [
+            keys[start:start + batch_size]
+            for start in range(0, operations, batch_size)
+        ]
+
+        results = [
+            self.measure(lambda: [cache.set(key, payload) for key in keys],
+                         operations),
+            self.measure(lambda: [cache.get(key) for key in keys],
+                         operations),
+            self.measure(lambda: [cache.get_many(batch) for batch in batches],
+                         operations),
+            self.measure(
+                lambda: [cache.set_many(dict.fromkeys(batch, payload))
+                         for batch in batches],
+                operations,
+            ),
+        ]
+        cache.set('bench:counter', 0)
+        results.append(self.measure(
+            lambda: [cache.incr('bench:counter') for _ in keys], operations
+        ))
+        results.append(self.shared_hit_ratio(
+            backend, location, params, keys, options['workers']
+        ))
+        return results
+
+    @staticmethod
+    def measure(function, operations):
+        started = time.perf_counter()
+        function()
+        return operations / (time.perf_counter() - started)
+
+    @staticmethod
+    def shared_hit_ratio(backend, location, params, keys, workers):
+        # Отдельные процессы моделируют воркеры gunicorn: каждый читает
+        # ключи, записанные родительским процессом.
+        context = multiprocessing.get_context('spawn')
+        queue = context.Queue()
+        processes = [
+            context.Process(
+                target=count_hits,
+                args=(backend, location, params, keys, queue),
+            ) for _ in range(workers)
+        ]
+        for process in processes:
+            process.start()
+        hits = sum(queue.get() for _ in processes)
+        for process in processes:
+            process.join()
+        return hits / (len(keys) * workers)
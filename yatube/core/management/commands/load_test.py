@@ -0,0 +1,193 @@
+import multiprocessing
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+
+# Настройки без слоя core.sqlite_tuning: журнал по умолчанию, новое
+# соединение на каждый запрос, без повторов при блокировке.
+MODES = {
+    'default': {
+        'CONN_MAX_AGE': 0,
+        'SQLITE_PRAGMAS': {'journal_mode': 'delete'},
+        'SQLITE_HEALTH_CHECKS': False,
+        'SQLITE_BUSY_RETRIES': 0,
+    },
+    'tuned': {},
+}
+
+
+def configure(path, overrides):
+    """Настраивает Django в дочернем процессе на временную базу."""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+    from django.conf import settings
+    overrides = dict(overrides)
+    settings.DATABASES['default']['NAME'] = path
+    if 'CONN_MAX_AGE' in overrides:
+        settings.DATABASES['default']['CONN_MAX_AGE'] = overrides.pop(
+            'CONN_MAX_AGE'
+        )
+    for name, value in overrides.items():
+        setattr(settings, name, value)
+    settings.CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        },
+    }
+    import django
+    django.setup()
+
+
+def prepare(path, posts, seed):
+    configure(path, {})
+    from django.core.management import call_command
+    from posts.seeding import Seeder
+    call_command('migrate', verbosity=0)
+    seeder = Seeder(prefix='load', seed=seed)
+    user_ids = seeder.users(max(posts // 50, 10))
+    group_ids = seeder.groups(max(posts // 1000, 3))
+    seeder.follows(len(user_ids) * 5, user_ids)
+    first, last = seeder.posts(posts, user_ids, group_ids)
+    seeder.comments(posts, user_ids, first, last)
+    seeder.finish(user_ids)
+
+
+def run_worker(path, overrides, duration, write_ratio, seed, queue):
+    configure(path, overrides)
+    from django.contrib.auth import get_user_model
+    from django.core.signals import request_finished, request_started
+    from django.db import OperationalError
+    from posts.models import Comment, Post
+
+    rng = random.Random(seed)
+    post_ids = list(Post.objects.values_list('id', flat=True))
+    user_ids = list(get_user_model().objects.values_list('id', flat=True))
+    latencies, errors = [], 0
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        # Сигналы запроса закрывают и проверяют соединения, как в WSGI.
+        request_started.send(sender=None)
+        started = time.perf_counter()
+        try:
+            if rng.random() < write_ratio:
+                Comment.objects.create(
+                    post_id=rng.choice(post_ids),
+                    author_id=rng.choice(user_ids),
+                    text='Комментарий нагрузочного теста',
+                )
+            else:
+                list(Post.objects.select_related('author', 'group')[:10])
+                Comment.objects.filter(post_id=rng.choice(post_ids)).count()
+        except OperationalError:
+            errors += 1
+        else:
+            latencies.append((time.perf_counter() - started) * 1000)
+        finally:
+            request_finished.send(sender=None)
+    queue.put((latencies, errors))
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный тест SQLite: несколько процессов читают и пишут во '
+        'временную базу с настройками по умолчанию и со слоем '
+        'core.sqlite_tuning.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=4,
+            help='Количество процессов, как воркеров gunicorn',
+        )
+        parser.add_argument(
+            '--duration',
+            type=float,
+            default=10,
+            help='Длительность замера каждого режима, секунды',
+        )
+        parser.add_argument(
+            '--write-ratio',
+            type=float,
+            default=0.2,
+            help='Доля запросов, которые пишут комментарий',
+        )
+        parser.add_argument(
+            '--posts',
+            type=int,
+            default=10000,
+            help='Количество постов во временной базе',
+        )
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        context = multiprocessing.get_context('spawn')
+        directory = tempfile.mkdtemp()
+        path = os.path.join(directory, 'load.sqlite3')
+        try:
+            self.stdout.write('Подготовка временной базы...')
+            process = context.Process(
+                target=prepare, args=(path, options['posts'], options['seed'])
+            )
+            process.start()
+            process.join()
+            self.stdout.write(
+                f'{"mode":<10}{"req/s":>10}{"p50 ms":>10}{"p95 ms":>10}'
+                f'{"p99 ms":>10}{"errors":>8}'
+            )
+            results = {}
+            for mode, overrides in MODES.items():
+                results[mode] = self.run_mode(
+                    context, path, overrides, options
+                )
+                self.write_row(mode, results[mode])
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+        default, tuned = results['default'], results['tuned']
+        if default['rate']:
+            gain = tuned['rate'] / default['rate']
+            self.stdout.write(f'Пропускная способность: x{gain:.2f}')
+
+    @staticmethod
+    def run_mode(context, path, overrides, options):
+        queue = context.Queue()
+        processes = [
+            context.Process(
+                target=run_worker,
+                args=(path, overrides, options['duration'],
+                      options['write_ratio'], options['seed'] + number,
+                      queue),
+            )
+            for number in range(options['workers'])
+        ]
+        for process in processes:
+            process.start()
+        latencies, errors = [], 0
+        for _ in processes:
+            worker_latencies, worker_errors = queue.get()
+            latencies.extend(worker_latencies)
+            errors += worker_errors
+        for process in processes:
+            process.join()
+        percentiles = (
+            statistics.quantiles(latencies, n=100)
+            if len(latencies) > 1 else [0.0] * 99
+        )
+        return {
+            'rate': len(latencies) / options['duration'],
+            'p50': percentiles[49],
+            'p95': percentiles[94],
+            'p99': percentiles[98],
+            'errors': errors,
+        }
+
+    def write_row(self, mode, row):
+        self.stdout.write(
+            f'{mode:<10}{row["rate"]:>10.0f}{row["p50"]:>10.2f}'
+            f'{row["p95"]:>10.2f}{row["p99"]:>10.2f}{row["errors"]:>8}'
+        )
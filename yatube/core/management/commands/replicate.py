@@ -0,0 +1,41 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core import replication
+
+
+class Command(BaseCommand):
+    help = (
+        'Копирует основную базу SQLite в реплики из DATABASE_REPLICAS '
+        'через backup API - по расписанию или один раз.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=settings.REPLICATION_INTERVAL,
+            help='Пауза между копиями, секунды',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Сделать одну копию и выйти',
+        )
+
+    def handle(self, *args, **options):
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError(
+                'Реплики не настроены: задайте DB_REPLICAS.'
+            )
+        while True:
+            elapsed = replication.replicate()
+            self.stdout.write(
+                f'Реплики {", ".join(settings.DATABASE_REPLICAS)} '
+                f'обновлены за {elapsed * 1000:.0f} мс'
+            )
+            if options['once']:
+                return
+            time.sleep(max(options['interval'] - elapsed, 0))
@@ -0,0 +1,62 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core import slow_queries
+
+SQL_SHOWN = 300
+
+
+class Command(BaseCommand):
+    help = (
+        'Сводка журнала медленных запросов: самые дорогие отпечатки '
+        'запросов с представлениями и планами.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sort',
+            choices=slow_queries.SORT_KEYS,
+            default='total',
+            help='Порядок: суммарное, наибольшее, среднее время или число',
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=10,
+            help='Сколько отпечатков показать',
+        )
+        parser.add_argument(
+            '--view',
+            help='Только запросы этого представления (posts:follow_index)',
+        )
+
+    def handle(self, *args, **options):
+        rows = slow_queries.summarize(
+            slow_queries.read_entries(), options['sort'], options['view']
+        )
+        if not rows:
+            self.stdout.write(
+                f'В {settings.SLOW_QUERY_LOG} нет медленных запросов.'
+            )
+            return
+        for row in rows[:options['limit']]:
+            sql = row['fingerprint']
+            if len(sql) > SQL_SHOWN:
+                sql = sql[:SQL_SHOWN] + '...'
+            views = ', '.join(
+                f'{view} ({count})' for view, count in sorted(
+                    row['views'].items(), key=lambda item: -item[1]
+                )
+            )
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'{row["count"]} раз, всего {row["total"]:.0f} мс, '
+                f'в среднем {row["mean"]:.1f} мс, '
+                f'максимум {row["max"]:.1f} мс'
+            ))
+            self.stdout.write(f'  {sql}')
+            self.stdout.write(f'  Представления: {views}')
+            for detail in row['plan'] or ():
+                line = f'    {detail}'
+                if detail in row['scans']:
+                    line = self.style.WARNING(line)
+                self.stdout.write(line)
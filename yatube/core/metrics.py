@@ -0,0 +1,310 @@
+"""Метрики приложения в текстовом формате Prometheus.
+
+Каждый процесс пишет счетчики в свой файл METRICS_DIR/<pid>.db,
+отображенный в память через mmap: запись - это изменение восьми байт
+без системных вызовов. Страница /metrics читает файлы всех процессов и
+складывает значения, поэтому счетчики воркеров WSGI агрегируются без
+общего сервера. Файлы завершившихся процессов остаются, и счетчики не
+откатываются назад; при деплое каталог очищают.
+
+Формат файла: восемь байт заголовка с занятым объемом, затем записи
+"длина ключа, JSON-ключ [имя, метки] с выравниванием до восьми байт,
+double". Заголовок обновляется после записи, так что читатель не
+видит недописанных записей.
+
+Middleware для каждого ответа пишет гистограммы времени ответа, времени
+запросов к базе и отрисовки шаблонов по resolver_match.view_name.
+Попадания в кеш (фрагменты {% cache %} и ключи sorl-thumbnail) считает
+кеш-бэкенд.
+"""
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+
+from django.conf import settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+
+from core.timing import Timings
+
+METRICS = {
+    'yatube_requests_total': (
+        'counter', 'Ответы по представлению, методу и коду ответа.'
+    ),
+    'yatube_request_duration_seconds': (
+        'histogram', 'Время ответа представления.'
+    ),
+    'yatube_db_duration_seconds': (
+        'histogram', 'Время запросов к базе за один ответ.'
+    ),
+    'yatube_db_queries_total': (
+        'counter', 'Запросы к базе по представлению.'
+    ),
+    'yatube_template_render_duration_seconds': (
+        'histogram', 'Время отрисовки шаблонов за один ответ.'
+    ),
+    'yatube_cache_lookups_total': (
+        'counter', 'Чтения из кеша по виду ключа и результату.'
+    ),
+    'yatube_thumbnail_kv_lookups_total': (
+        'counter', 'Чтения ключей sorl-thumbnail по уровню хранилища.'
+    ),
+}
+
+METHODS = ('GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS')
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+FRAGMENT_PREFIX = 'template.cache.'
+
+INITIAL_SIZE = 64 * 1024
+
+_USED = struct.Struct('<I4x')
+_LENGTH = struct.Struct('<I')
+_VALUE = struct.Struct('<d')
+
+_lock = threading.Lock()
+_file = None
+
+
+def _encode(key):
+    name, labels = key
+    return json.dumps([name, labels], ensure_ascii=False).encode()
+
+
+def _decode(encoded):
+    name, labels = json.loads(encoded)
+    return name, tuple(tuple(label) for label in labels)
+
+
+def _entries(data, used):
+    position = _USED.size
+    while position < used:
+        (length,) = _LENGTH.unpack_from(data, position)
+        start = position + _LENGTH.size
+        value_position = start + length + (-(_LENGTH.size + length) % 8)
+        (value,) = _VALUE.unpack_from(data, value_position)
+        yield _decode(bytes(data[start:start + length])), value, value_position
+        position = value_position + _VALUE.size
+
+
+class MetricsFile:
+    """Счетчики одного процесса в файле, отображенном в память."""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'a+b')
+        size = os.fstat(self._file.fileno()).st_size
+        if size < INITIAL_SIZE:
+            self._file.truncate(INITIAL_SIZE)
+            size = INITIAL_SIZE
+        self._map = mmap.mmap(self._file.fileno(), size)
+        (self._used,) = _USED.unpack_from(self._map, 0)
+        if not self._used:
+            self._used = _USED.size
+            _USED.pack_into(self._map, 0, self._used)
+        self._positions = {
+            key: position
+            for key, _, position in _entries(self._map, self._used)
+        }
+
+    def add(self, key, amount):
+        position = self._positions.get(key)
+        if position is None:
+            position = self._append(key)
+        (value,) = _VALUE.unpack_from(self._map, position)
+        _VALUE.pack_into(self._map, position, value + amount)
+
+    def _append(self, key):
+        encoded = _encode(key)
+        padding = -(_LENGTH.size + len(encoded)) % 8
+        entry = (_LENGTH.pack(len(encoded)) + encoded + b'\0' * padding
+                 + _VALUE.pack(0.0))
+        end = self._used + len(entry)
+        if end > len(self._map):
+            size = len(self._map)
+            while size < end:
+                size *= 2
+            self._map.close()
+            self._file.truncate(size)
+            self._map = mmap.mmap(self._file.fileno(), size)
+        self._map[self._used:end] = entry
+        self._used = end
+        _USED.pack_into(self._map, 0, end)
+        position = end - _VALUE.size
+        self._positions[key] = position
+        return position
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+
+def read(path):
+    """Значения из файла процесса: {(имя, метки): значение}."""
+    with open(path, 'rb') as file:
+        data = file.read()
+    if len(data) < _USED.size:
+        return {}
+    (used,) = _USED.unpack_from(data, 0)
+    return {key: value for key, value, _ in _entries(data, used)}
+
+
+def inc(name, amount=1, **labels):
+    global _file
+    if not settings.METRICS_ENABLED:
+        return
+    key = (name, tuple(sorted(labels.items())))
+    path = os.path.join(settings.METRICS_DIR, f'{os.getpid()}.db')
+    with _lock:
+        if _file is None or _file.path != path:
+            # Новый путь бывает после fork или смены METRICS_DIR в тестах.
+            os.makedirs(settings.METRICS_DIR, exist_ok=True)
+            _file = MetricsFile(path)
+        _file.add(key, amount)
+
+
+def observe(name, seconds, **labels):
+    """Добавляет значение в гистограмму name с границами METRICS_BUCKETS."""
+    bound = next(
+        (bound for bound in settings.METRICS_BUCKETS if seconds <= bound),
+        None,
+    )
+    if bound is not None:
+        inc(f'{name}_bucket', le=str(bound), **labels)
+    inc(f'{name}_count', **labels)
+    inc(f'{name}_sum', seconds, **labels)
+
+
+def cache_kind(key):
+    """Вид ключа кеша для метки: имя фрагмента, ключи миниатюр или прочее."""
+    if key.startswith(FRAGMENT_PREFIX):
+        return 'fragment:' + key[len(FRAGMENT_PREFIX):].split('.', 1)[0]
+    if key.startswith(thumbnail_settings.THUMBNAIL_KEY_PREFIX):
+        return 'thumbnail_kv'
+    return 'other'
+
+
+def count_cache_lookups(keys, found):
+    for key in keys:
+        inc(
+            'yatube_cache_lookups_total',
+            cache=cache_kind(key),
+            result='hit' if key in found else 'miss',
+        )
+
+
+def collect():
+    """Сумма значений по файлам всех процессов."""
+    totals = {}
+    try:
+        names = os.listdir(settings.METRICS_DIR)
+    except FileNotFoundError:
+        return totals
+    for name in names:
+        if not name.endswith('.db'):
+            continue
+        try:
+            values = read(os.path.join(settings.METRICS_DIR, name))
+        except FileNotFoundError:
+            continue
+        for key, value in values.items():
+            totals[key] = totals.get(key, 0.0) + value
+    return totals
+
+
+def _escape(value):
+    return (str(value).replace('\\', r'\\').replace('"', r'\"')
+            .replace('\n', r'\n'))
+
+
+def _sample(name, labels, value):
+    if labels:
+        pairs = ','.join(
+            f'{label}="{_escape(text)}"' for label, text in labels
+        )
+        name = f'{name}{{{pairs}}}'
+    if value == int(value):
+        value = int(value)
+    return f'{name} {value}'
+
+
+def _histogram_samples(name, values):
+    counts = {
+        labels: value for (metric, labels), value in values.items()
+        if metric == f'{name}_count'
+    }
+    lines = []
+    for labels in sorted(counts):
+        buckets = {
+            dict(bucket_labels)['le']: value
+            for (metric, bucket_labels), value in values.items()
+            if metric == f'{name}_bucket'
+            and tuple(label for label in bucket_labels if label[0] != 'le')
+            == labels
+        }
+        seen = 0.0
+        for bound in settings.METRICS_BUCKETS:
+            seen += buckets.get(str(bound), 0.0)
+            lines.append(_sample(
+                f'{name}_bucket', (('le', str(bound)),) + labels, seen
+            ))
+        lines.append(_sample(
+            f'{name}_bucket', (('le', '+Inf'),) + labels, counts[labels]
+        ))
+        lines.append(_sample(
+            f'{name}_sum', labels, values.get((f'{name}_sum', labels), 0.0)
+        ))
+        lines.append(_sample(f'{name}_count', labels, counts[labels]))
+    return lines
+
+
+def render():
+    """Метрики всех процессов в текстовом формате Prometheus."""
+    values = collect()
+    lines = []
+    for name, (kind, help_text) in METRICS.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        if kind == 'histogram':
+            lines.extend(_histogram_samples(name, values))
+            continue
+        lines.extend(
+            _sample(name, labels, value)
+            for (metric, labels), value in sorted(values.items())
+            if metric == name
+        )
+    return '\n'.join(lines) + '\n'
+
+
+class MetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.METRICS_ENABLED:
+            return self.get_response(request)
+        status = 500
+        started = time.perf_counter()
+        with Timings().watching() as stats:
+            try:
+                response = self.get_response(request)
+                status = response.status_code
+                return response
+            finally:
+                elapsed = time.perf_counter() - started
+                match = getattr(request, 'resolver_match', None)
+                view = match.view_name if match else 'unresolved'
+                method = request.method if request.method in METHODS else (
+                    'OTHER'
+                )
+                inc('yatube_requests_total',
+                    view=view, method=method, status=str(status))
+                observe('yatube_request_duration_seconds', elapsed, view=view)
+                observe('yatube_db_duration_seconds',
+                        stats.db_seconds, view=view)
+                inc('yatube_db_queries_total', stats.queries, view=view)
+                observe('yatube_template_render_duration_seconds',
+                        stats.render_seconds, view=view)
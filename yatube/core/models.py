@@ -0,0 +1,27 @@
+from django.db import models
+
+
+class StoredFile(models.Model):
+    """Файл хранилища с адресацией по содержимому и число ссылок на него."""
+
+    name = models.CharField(
+        verbose_name='Путь в хранилище',
+        max_length=255,
+        primary_key=True,
+    )
+    size = models.PositiveIntegerField(verbose_name='Размер, байт')
+    references = models.PositiveIntegerField(
+        verbose_name='Количество ссылок',
+        default=0,
+    )
+    created = models.DateTimeField(
+        verbose_name='Дата загрузки',
+        auto_now_add=True,
+    )
+
+    class Meta:
+        verbose_name = 'Файл хранилища'
+        verbose_name_plural = 'Файлы хранилища'
+
+    def __str__(self) -> str:
+        return self.name
@@ -0,0 +1,177 @@
+"""Выборочное профилирование запросов.
+
+Middleware профилирует через cProfile каждый PROFILING_SAMPLE_EVERY-й
+в среднем запрос, запросы к URL из PROFILING_URL_NAMES и запросы
+сотрудников с заголовком X-Profile. Профили складываются в
+PROFILING_DIR, где хранится не больше PROFILING_KEEP последних файлов.
+
+Время ответа по страницам страница профилей берет из гистограммы
+yatube_request_duration_seconds модуля core.metrics: ее пишет каждый
+процесс в свой файл, так что значения воркеров складываются без общего
+реестра.
+"""
+import cProfile
+import os
+import pstats
+import random
+import re
+import tempfile
+import time
+from datetime import datetime
+from functools import partial
+
+from django.conf import settings
+from django.urls import Resolver404, resolve
+
+from core import metrics
+
+SORT_KEYS = ('cumulative', 'tottime', 'calls')
+
+DURATION_METRIC = 'yatube_request_duration_seconds'
+
+_UNSAFE = re.compile(r'[^\w.-]+')
+
+
+def _quantile(buckets, count, quantile):
+    seen = 0
+    for bound, bucket in zip(settings.METRICS_BUCKETS, buckets):
+        seen += bucket
+        if seen >= count * quantile:
+            return bound * 1000
+    return None
+
+
+def histograms():
+    """Время ответа по страницам во всех процессах.
+
+    Строки идут по убыванию суммарного времени.
+    """
+    values = metrics.collect()
+    rows = []
+    for (metric, labels), count in values.items():
+        if metric != f'{DURATION_METRIC}_count' or not count:
+            continue
+        buckets = [
+            values.get(
+                (f'{DURATION_METRIC}_bucket', (('le', str(bound)),) + labels),
+                0.0,
+            )
+            for bound in settings.METRICS_BUCKETS
+        ]
+        sum_ms = values.get((f'{DURATION_METRIC}_sum', labels), 0.0) * 1000
+        rows.append({
+            'view': dict(labels)['view'],
+            'count': int(count),
+            'sum_ms': sum_ms,
+            'mean_ms': sum_ms / count,
+            'p50_ms': _quantile(buckets, count, 0.5),
+            'p95_ms': _quantile(buckets, count, 0.95),
+        })
+    rows.sort(key=lambda row: row['sum_ms'], reverse=True)
+    return rows
+
+
+def save_profile(profiler, view_name):
+    """Записывает профиль и удаляет самые старые сверх PROFILING_KEEP."""
+    directory = settings.PROFILING_DIR
+    os.makedirs(directory, exist_ok=True)
+    name = (f'{time.time_ns()}-{os.getpid()}-'
+            f'{_UNSAFE.sub("_", view_name.replace(":", "."))}.prof')
+    descriptor, temporary_path = tempfile.mkstemp(
+        dir=directory, prefix='.profile-'
+    )
+    os.close(descriptor)
+    profiler.dump_stats(temporary_path)
+    os.replace(temporary_path, os.path.join(directory, name))
+    names = sorted(_profile_names(), reverse=True)
+    for old in names[settings.PROFILING_KEEP:]:
+        try:
+            os.remove(os.path.join(directory, old))
+        except FileNotFoundError:
+            pass
+    return name
+
+
+def _profile_names():
+    try:
+        return [
+            name for name in os.listdir(settings.PROFILING_DIR)
+            if name.endswith('.prof') and not name.startswith('.')
+        ]
+    except FileNotFoundError:
+        return []
+
+
+def profiles():
+    """Сохраненные профили, новые первыми."""
+    result = []
+    for name in sorted(_profile_names(), reverse=True):
+        timestamp, pid, view_name = name[:-len('.prof')].split('-', 2)
+        result.append({
+            'name': name,
+            'view': view_name,
+            'pid': int(pid),
+            'created': datetime.fromtimestamp(int(timestamp) / 1e9),
+        })
+    return result
+
+
+def hot_functions(names, sort='cumulative', limit=50):
+    """Самые дорогие функции по объединению профилей names."""
+    stored = set(_profile_names())
+    paths = [
+        os.path.join(settings.PROFILING_DIR, name)
+        for name in names if name in stored
+    ]
+    if not paths:
+        return []
+    stats = pstats.Stats(*paths)
+    rows = []
+    for (filename, line, function), (_, calls, tottime, cumtime, _) in (
+            stats.stats.items()):
+        rows.append({
+            'function': function,
+            'location': f'{filename}:{line}',
+            'calls': calls,
+            'tottime': tottime,
+            'cumtime': cumtime,
+            'percall': cumtime / calls if calls else 0,
+        })
+    field = {'cumulative': 'cumtime'}.get(sort, sort)
+    rows.sort(key=lambda row: row[field], reverse=True)
+    return rows[:limit]
+
+
+class ProfilingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        profiler = cProfile.Profile() if self.sampled(request) else None
+        get_response = self.get_response
+        if profiler is not None:
+            get_response = partial(profiler.runcall, self.get_response)
+        try:
+            return get_response(request)
+        finally:
+            if profiler is not None:
+                match = getattr(request, 'resolver_match', None)
+                view_name = match.view_name if match else 'unresolved'
+                save_profile(profiler, view_name)
+
+    @staticmethod
+    def sampled(request):
+        every = settings.PROFILING_SAMPLE_EVERY
+        if every and random.randrange(every) == 0:
+            return True
+        if settings.PROFILING_URL_NAMES:
+            try:
+                view_name = resolve(request.path_info).view_name
+            except Resolver404:
+                view_name = None
+            if view_name in settings.PROFILING_URL_NAMES:
+                return True
+        return bool(
+            request.META.get(settings.PROFILING_HEADER)
+            and request.user.is_staff
+        )
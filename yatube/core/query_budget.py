@@ -0,0 +1,120 @@
+"""Бюджеты запросов к базе для страниц.
+
+QUERY_BUDGETS задает наибольшее число запросов для имени URL
+('posts:index'); проверяются только GET и HEAD. Middleware считает
+запросы доли QUERY_BUDGET_SAMPLE_RATE ответов и при превышении пишет
+предупреждение с повторяющимися запросами - так обычно выглядит N+1.
+С QUERY_BUDGET_STRICT (его включает тестовый раннер) превышение
+вызывает QueryBudgetExceeded, и тест падает.
+
+Запросы, подходящие под шаблоны QUERY_BUDGET_EXCLUDE, не считаются:
+это заполнение кешей, которое происходит один раз, как запись ключей
+sorl-thumbnail при первом показе картинки. Не считаются и запросы,
+которые выполняются при отдаче StreamingHttpResponse, уже после выхода
+из middleware.
+
+Запрос, одинаково выполненный на нескольких базах (страница собирает
+посты со всех шардов POST_SHARDS), считается один раз: бюджет
+описывает страницу и не зависит от числа шардов.
+"""
+import contextlib
+import logging
+import random
+import re
+from collections import Counter
+
+from django.conf import settings
+
+from core.timing import wrapping_connections
+
+logger = logging.getLogger(__name__)
+
+_IN_LIST = re.compile(r'\((?:%s, )+%s\)')
+_SAVEPOINT = re.compile(r'SAVEPOINT "[^"]+"')
+_SPACES = re.compile(r'\s+')
+
+DUPLICATES_SHOWN = 5
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def fingerprint(sql):
+    """Приводит запрос к виду, одинаковому для разных значений параметров."""
+    sql = _SPACES.sub(' ', sql.strip())
+    return _SAVEPOINT.sub('SAVEPOINT ?', _IN_LIST.sub('(...)', sql))
+
+
+class QueryCounter:
+    def __init__(self, exclude=()):
+        self.exclude = [re.compile(pattern) for pattern in exclude]
+        self.queries = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        if not any(pattern.search(sql) for pattern in self.exclude):
+            alias = context['connection'].alias
+            self.queries[fingerprint(sql), alias] += 1
+        return execute(sql, params, many, context)
+
+    @property
+    def fingerprints(self):
+        counts = Counter()
+        for (sql, _), count in self.queries.items():
+            counts[sql] = max(counts[sql], count)
+        return counts
+
+    @property
+    def total(self):
+        return sum(self.fingerprints.values())
+
+    def duplicates(self):
+        return [
+            (sql, count)
+            for sql, count in self.fingerprints.most_common(DUPLICATES_SHOWN)
+            if count > 1
+        ]
+
+    @contextlib.contextmanager
+    def watching(self):
+        with wrapping_connections(self):
+            yield self
+
+
+def budget_for(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None or request.method not in ('GET', 'HEAD'):
+        return None
+    return settings.QUERY_BUDGETS.get(match.view_name)
+
+
+class QueryBudgetMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        strict = settings.QUERY_BUDGET_STRICT
+        if not strict and random.random() >= settings.QUERY_BUDGET_SAMPLE_RATE:
+            return self.get_response(request)
+
+        counter = QueryCounter(settings.QUERY_BUDGET_EXCLUDE)
+        with counter.watching():
+            response = self.get_response(request)
+        budget = budget_for(request)
+        if budget is None or counter.total <= budget:
+            return response
+
+        view_name = request.resolver_match.view_name
+        message = (
+            f'{view_name} ({request.path}): запросов {counter.total}, '
+            f'бюджет {budget}'
+        )
+        duplicates = '\n'.join(
+            f'  {count} x {sql}' for sql, count in counter.duplicates()
+        )
+        if duplicates:
+            message = f'{message}; повторяются:\n{duplicates}'
+        if strict:
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
+        return response
@@ -0,0 +1,52 @@
+"""Замена настоящей репликации для локальной проверки чтения с реплик.
+
+Файл основной базы копируется через backup API SQLite во временный
+файл рядом с репликой, копия переводится из WAL в обычный журнал и
+атомарно подменяет реплику через os.replace. Открытые соединения
+дочитывают старый файл, а проверка соединений из core.sqlite_tuning
+замечает новый файл в начале следующего запроса и переподключается.
+
+Реплики открываются с PRAGMA query_only (SQLITE_REPLICA_PRAGMAS), и
+рядом с ними не появляются файлы -wal, которые не подошли бы к
+следующей копии.
+"""
+import os
+import sqlite3
+import stat
+import tempfile
+import time
+
+from django.conf import settings
+
+
+def copy_database(source, target):
+    """Копирует базу source в target, подменяя target атомарно."""
+    directory = os.path.dirname(os.path.abspath(target))
+    descriptor, temporary_path = tempfile.mkstemp(
+        dir=directory, prefix='.replica-'
+    )
+    os.close(descriptor)
+    try:
+        source_connection = sqlite3.connect(source)
+        copy = sqlite3.connect(temporary_path)
+        try:
+            source_connection.backup(copy)
+            copy.execute('PRAGMA journal_mode = delete')
+        finally:
+            copy.close()
+            source_connection.close()
+        # mkstemp создает файл только для владельца.
+        os.chmod(temporary_path, stat.S_IMODE(os.stat(source).st_mode))
+        os.replace(temporary_path, target)
+    except BaseException:
+        os.remove(temporary_path)
+        raise
+
+
+def replicate():
+    """Обновляет все реплики, возвращает затраченное время в секундах."""
+    started = time.perf_counter()
+    source = settings.DATABASES['default']['NAME']
+    for alias in settings.DATABASE_REPLICAS:
+        copy_database(source, settings.DATABASES[alias]['NAME'])
+    return time.perf_counter() - started
@@ -0,0 +1,194 @@
+"""Журнал медленных запросов к базе.
+
+Middleware подключает к соединениям обертку через
+connection.execute_wrapper; запросы дольше SLOW_QUERY_THRESHOLD_MS
+записываются в SLOW_QUERY_LOG строкой JSON: отпечаток запроса, время,
+имя представления и план EXPLAIN QUERY PLAN, полученный на том же
+соединении с теми же параметрами. Файл ротируется по размеру
+SLOW_QUERY_LOG_MAX_BYTES, хранится SLOW_QUERY_LOG_BACKUPS старых копий.
+Процессы пишут в один файл, поэтому в момент ротации несколько строк
+могут потеряться - для этого журнала это допустимо.
+
+Команда slow_queries собирает записи по отпечаткам и показывает самые
+дорогие.
+"""
+import contextlib
+import json
+import logging
+import os
+import threading
+import time
+from logging.handlers import RotatingFileHandler
+
+from django.conf import settings
+from django.db import DatabaseError, NotSupportedError
+from django.utils import timezone
+
+from core.query_budget import fingerprint
+from core.timing import wrapping_connections
+
+logger = logging.getLogger(__name__)
+logger.propagate = False
+
+EXPLAINED = ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE')
+
+SORT_KEYS = ('total', 'max', 'mean', 'count')
+
+_handler_lock = threading.Lock()
+
+
+def _ensure_handler():
+    path = os.path.abspath(settings.SLOW_QUERY_LOG)
+    with _handler_lock:
+        for handler in list(logger.handlers):
+            if handler.baseFilename == path:
+                return
+            logger.removeHandler(handler)
+            handler.close()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        logger.addHandler(RotatingFileHandler(
+            path,
+            maxBytes=settings.SLOW_QUERY_LOG_MAX_BYTES,
+            backupCount=settings.SLOW_QUERY_LOG_BACKUPS,
+            encoding='utf-8',
+        ))
+        logger.setLevel(logging.INFO)
+
+
+def close_log():
+    """Закрывает файл журнала; следующая запись откроет его заново."""
+    with _handler_lock:
+        for handler in list(logger.handlers):
+            logger.removeHandler(handler)
+            handler.close()
+
+
+def explain(connection, sql, params):
+    """План запроса строками detail; None, если план получить нельзя."""
+    if not sql.lstrip().upper().startswith(EXPLAINED):
+        return None
+    try:
+        prefix = connection.ops.explain_query_prefix()
+        # create_cursor дает курсор без оберток execute_wrapper, поэтому
+        # EXPLAIN не попадает ни в журнал, ни в счетчики запросов.
+        cursor = connection.create_cursor()
+        try:
+            cursor.execute(f'{prefix} {sql}', params)
+            rows = cursor.fetchall()
+        finally:
+            cursor.close()
+    except (DatabaseError, NotSupportedError):
+        return None
+    return [row[-1] for row in rows]
+
+
+class SlowQueryLogger:
+    """Обертка execute_wrapper; label подписывает запросы вне ответов."""
+
+    def __init__(self, request=None, label=''):
+        self.request = request
+        self.label = label
+
+    def source(self):
+        if self.request is None:
+            return self.label, ''
+        # Имя представления известно только после разрешения URL.
+        match = getattr(self.request, 'resolver_match', None)
+        return match.view_name if match else 'unresolved', self.request.path
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            if elapsed_ms >= settings.SLOW_QUERY_THRESHOLD_MS:
+                self.log(sql, params, many, context['connection'],
+                         elapsed_ms)
+
+    def log(self, sql, params, many, connection, elapsed_ms):
+        plan = None
+        if settings.SLOW_QUERY_EXPLAIN and not many:
+            plan = explain(connection, sql, params)
+        view, path = self.source()
+        _ensure_handler()
+        logger.info(json.dumps({
+            'time': timezone.now().isoformat(),
+            'fingerprint': fingerprint(sql),
+            'duration_ms': round(elapsed_ms, 3),
+            'view': view,
+            'path': path,
+            'database': connection.alias,
+            'many': many,
+            'plan': plan,
+        }, ensure_ascii=False))
+
+    @contextlib.contextmanager
+    def watching(self):
+        with wrapping_connections(self):
+            yield self
+
+
+def log_files():
+    """Файл журнала и его копии, от старых к новым."""
+    path = settings.SLOW_QUERY_LOG
+    backups = [
+        f'{path}.{number}'
+        for number in range(settings.SLOW_QUERY_LOG_BACKUPS, 0, -1)
+    ]
+    return [name for name in backups + [path] if os.path.exists(name)]
+
+
+def read_entries():
+    for name in log_files():
+        with open(name, encoding='utf-8') as file:
+            for line in file:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    # Строка могла оборваться при ротации.
+                    continue
+
+
+def summarize(entries, sort='total', view=None):
+    """Записи, сгруппированные по отпечатку, дорогие первыми."""
+    groups = {}
+    for entry in entries:
+        if view and entry['view'] != view:
+            continue
+        group = groups.setdefault(entry['fingerprint'], {
+            'fingerprint': entry['fingerprint'],
+            'count': 0,
+            'total': 0.0,
+            'max': 0.0,
+            'views': {},
+            'plan': None,
+        })
+        group['count'] += 1
+        group['total'] += entry['duration_ms']
+        group['max'] = max(group['max'], entry['duration_ms'])
+        group['views'][entry['view']] = (
+            group['views'].get(entry['view'], 0) + 1
+        )
+        if entry['plan'] is not None:
+            group['plan'] = entry['plan']
+    rows = list(groups.values())
+    for row in rows:
+        row['mean'] = row['total'] / row['count']
+        row['scans'] = [
+            detail for detail in row['plan'] or ()
+            if detail.startswith('SCAN ')
+        ]
+    rows.sort(key=lambda row: row[sort], reverse=True)
+    return rows
+
+
+class SlowQueryMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if settings.SLOW_QUERY_THRESHOLD_MS is None:
+            return self.get_response(request)
+        with SlowQueryLogger(request).watching():
+            return self.get_response(request)
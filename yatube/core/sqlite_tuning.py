@@ -0,0 +1,101 @@
+"""Настройка соединений SQLite для нескольких воркеров.
+
+При открытии соединения (сигнал connection_created) выполняются прагмы
+из SQLITE_PRAGMAS: WAL, synchronous, mmap_size, cache_size,
+busy_timeout, temp_store; для реплик - SQLITE_REPLICA_PRAGMAS. Они
+идут через сырое соединение, мимо execute_wrapper, и не попадают в
+счетчики запросов.
+
+Соединения живут CONN_MAX_AGE секунд в своем потоке. В начале каждого
+запроса открытое соединение проверяется: SELECT 1 и тот же ли файл
+лежит по пути базы (после восстановления из копии старое соединение
+читало бы удаленный файл). Сломанное соединение закрывается, и Django
+откроет новое.
+
+Ошибка "database is locked" вне транзакции повторяется до
+SQLITE_BUSY_RETRIES раз с экспоненциальной паузой и случайным
+разбросом. Внутри транзакции повтор бесполезен: в WAL снимок
+транзакции уже устарел, и ошибку получает вызывающий код.
+"""
+import os
+import random
+import sqlite3
+import time
+
+from django.conf import settings
+from django.db import OperationalError, connections
+
+BUSY_MESSAGES = ('database is locked', 'database table is locked')
+
+
+def is_busy(error):
+    return any(message in str(error) for message in BUSY_MESSAGES)
+
+
+def backoff(attempt):
+    """Пауза перед повтором attempt (с нуля), секунды."""
+    delay = min(
+        settings.SQLITE_BUSY_BACKOFF * 2 ** attempt,
+        settings.SQLITE_BUSY_BACKOFF_MAX,
+    )
+    return delay * random.uniform(0.5, 1.5)
+
+
+def busy_retry(execute, sql, params, many, context):
+    connection = context['connection']
+    attempt = 0
+    while True:
+        try:
+            return execute(sql, params, many, context)
+        except OperationalError as error:
+            if (attempt >= settings.SQLITE_BUSY_RETRIES
+                    or connection.in_atomic_block
+                    or not is_busy(error)):
+                raise
+        time.sleep(backoff(attempt))
+        attempt += 1
+
+
+def _file_id(connection):
+    if connection.is_in_memory_db():
+        return None
+    try:
+        stat = os.stat(connection.settings_dict['NAME'])
+    except OSError:
+        return None
+    return stat.st_dev, stat.st_ino
+
+
+def configure_connection(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = settings.SQLITE_PRAGMAS
+    if connection.alias in settings.DATABASE_REPLICAS:
+        pragmas = settings.SQLITE_REPLICA_PRAGMAS
+    for name, value in pragmas.items():
+        connection.connection.execute(f'PRAGMA {name} = {value}')
+    connection.sqlite_file_id = _file_id(connection)
+    # Обертка стоит первой и остается при переподключениях: список
+    # execute_wrappers принадлежит объекту соединения Django.
+    if busy_retry not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, busy_retry)
+
+
+def is_healthy(connection):
+    try:
+        connection.connection.execute('SELECT 1').fetchone()
+    except sqlite3.Error:
+        return False
+    return getattr(connection, 'sqlite_file_id', None) == _file_id(connection)
+
+
+def check_connections(**kwargs):
+    """Закрывает открытые соединения SQLite, не прошедшие проверку."""
+    if not settings.SQLITE_HEALTH_CHECKS:
+        return
+    for connection in connections.all():
+        if (connection.vendor != 'sqlite' or connection.connection is None
+                or connection.in_atomic_block):
+            continue
+        if not is_healthy(connection):
+            connection.close()
@@ -0,0 +1,134 @@
+"""Хранилище файлов с адресацией по содержимому.
+
+Имя файла - SHA-256 его содержимого, файлы раскладываются по вложенным
+каталогам из первых символов хеша (posts/ab/cd/abcd....jpg), поэтому ни
+в одном каталоге не скапливаются сотни тысяч файлов. Одинаковые
+загрузки получают одно имя и хранятся один раз; число ссылок на файл
+хранится в таблице StoredFile, и delete() удаляет файл с диска только
+вместе с последней ссылкой. Повторная загрузка обновляет время
+изменения файла: сборщик мусора не трогает недавно измененные файлы,
+пока транзакция с новой ссылкой на них не завершилась.
+"""
+import hashlib
+import os
+import posixpath
+import re
+import tempfile
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import F
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    def __init__(self, shard_depth=2, shard_width=2, **kwargs):
+        super().__init__(**kwargs)
+        self.shard_depth = shard_depth
+        self.shard_width = shard_width
+
+    @staticmethod
+    def digest(content):
+        sha256 = hashlib.sha256()
+        content.seek(0)
+        for chunk in content.chunks():
+            sha256.update(chunk)
+        content.seek(0)
+        return sha256.hexdigest()
+
+    def shards(self, digest):
+        return [
+            digest[level * self.shard_width:(level + 1) * self.shard_width]
+            for level in range(self.shard_depth)
+        ]
+
+    def content_name(self, name, content):
+        """Имя файла по содержимому в каталоге исходного имени."""
+        directory = posixpath.dirname(name)
+        extension = posixpath.splitext(name)[1].lower()
+        digest = self.digest(content)
+        return posixpath.join(
+            directory, *self.shards(digest), digest + extension
+        )
+
+    def is_content_name(self, name):
+        """Проверяет, что имя построено по содержимому, а не загружено."""
+        parts = name.split('/')
+        digest = posixpath.splitext(parts[-1])[0]
+        if not re.fullmatch('[0-9a-f]{64}', digest):
+            return False
+        shards = parts[-1 - self.shard_depth:-1]
+        return shards == self.shards(digest)
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.content_name(name, content)
+        try:
+            os.utime(self.path(name))
+        except FileNotFoundError:
+            self._save(name, content)
+        self.add_reference(name, content.size)
+        return name
+
+    def _save(self, name, content):
+        # Файл пишется рядом под временным именем и переименовывается:
+        # параллельная загрузка того же содержимого просто перезапишет
+        # его теми же байтами.
+        full_path = self.path(name)
+        directory = os.path.dirname(full_path)
+        os.makedirs(directory, exist_ok=True)
+        if self.directory_permissions_mode is not None:
+            os.chmod(directory, self.directory_permissions_mode)
+        descriptor, temporary_path = tempfile.mkstemp(
+            dir=directory, prefix='.upload-'
+        )
+        try:
+            with os.fdopen(descriptor, 'wb') as output:
+                for chunk in content.chunks():
+                    output.write(chunk)
+            if self.file_permissions_mode is not None:
+                os.chmod(temporary_path, self.file_permissions_mode)
+            os.replace(temporary_path, full_path)
+        except BaseException:
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+            raise
+        return name
+
+    def get_available_name(self, name, max_length=None):
+        return name
+
+    def add_reference(self, name, size, count=1):
+        from core.models import StoredFile
+        with transaction.atomic():
+            StoredFile.objects.get_or_create(
+                name=name, defaults={'size': size}
+            )
+            StoredFile.objects.filter(name=name).update(
+                references=F('references') + count
+            )
+
+    def delete(self, name):
+        """Снимает одну ссылку и удаляет файл вместе с последней.
+
+        Файлы, записанные до появления учета ссылок, удаляются сразу.
+        """
+        from core.models import StoredFile
+        with transaction.atomic():
+            tracked = StoredFile.objects.filter(name=name)
+            if tracked.exists():
+                tracked.update(references=F('references') - 1)
+                if tracked.filter(references__gt=0).exists():
+                    return
+                tracked.delete()
+        super().delete(name)
+
+    def references(self, name):
+        from core.models import StoredFile
+        return (StoredFile.objects.filter(name=name)
+                .values_list('references', flat=True).first() or 0)
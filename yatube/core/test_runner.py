@@ -0,0 +1,44 @@
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+def cache_dir_settings(directory):
+    """Настройки файлов, которые проект по умолчанию держит в cache/."""
+    cache = {
+        **settings.CACHES['default'],
+        'LOCATION': os.path.join(directory, 'cache.sqlite3'),
+    }
+    return {
+        'CACHES': {**settings.CACHES, 'default': cache},
+        'PROFILING_DIR': os.path.join(directory, 'profiles'),
+        'METRICS_DIR': os.path.join(directory, 'metrics'),
+        'SLOW_QUERY_LOG': os.path.join(directory, 'slow_queries.jsonl'),
+        'MEDIA_GC_STATE_FILE': os.path.join(directory, 'media_gc.json'),
+    }
+
+
+class QueryBudgetTestRunner(DiscoverRunner):
+    """Запускает тесты с проверкой бюджета запросов на каждом ответе.
+
+    Кеш, метрики, профили и журналы тесты пишут во временный каталог, а
+    не в cache/ проекта, с которым работает сервер разработки.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        settings.QUERY_BUDGET_STRICT = True
+        self.cache_dir = tempfile.mkdtemp(prefix='yatube-tests-')
+        self.cache_dir_settings = override_settings(
+            **cache_dir_settings(self.cache_dir)
+        )
+        self.cache_dir_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.cache_dir_settings.disable()
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
@@ -0,0 +1,104 @@
+import multiprocessing
+import shutil
+import tempfile
+import time
+
+from django.test import SimpleTestCase
+
+from core.cache_backends.sqlite import SQLiteCache
+
+
+def increment_many(location, times):
+    cache = SQLiteCache(location, {})
+    for _ in range(times):
+        cache.incr('counter')
+
+
+class SQLiteCacheTest(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.location = f'{self.directory}/cache.sqlite3'
+        self.cache = SQLiteCache(
+            self.location, {'OPTIONS': {'MAX_ENTRIES': 10000}}
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_basic_operations(self):
+        """Проверка записи, чтения, добавления и удаления значений."""
+        self.cache.set('key', {'value': 1})
+        self.assertEqual(self.cache.get('key'), {'value': 1})
+        self.assertFalse(self.cache.add('key', 'other'))
+        self.assertTrue(self.cache.add('new_key', 'value'))
+        self.cache.delete('key')
+        self.assertIsNone(self.cache.get('key'))
+        self.assertEqual(self.cache.get('missing', 'default'), 'default')
+
+    def test_expired_values_are_not_returned(self):
+        """Проверка истечения срока жизни значений."""
+        self.cache.set('key', 'value', timeout=0.01)
+        time.sleep(0.02)
+        self.assertIsNone(self.cache.get('key'))
+        self.assertFalse(self.cache.has_key('key'))
+        with self.assertRaises(ValueError):
+            self.cache.incr('key')
+
+    def test_many_operations(self):
+        """Проверка пакетных операций get_many и set_many."""
+        data = {f'key{number}': number for number in range(1000)}
+        self.cache.set_many(data)
+        self.assertEqual(self.cache.get_many(list(data) + ['missing']), data)
+        self.cache.delete_many(list(data)[:500])
+        self.assertEqual(len(self.cache.get_many(list(data))), 500)
+
+    def test_values_are_shared_between_instances(self):
+        """Проверка общего кеша для разных экземпляров бэкенда."""
+        other_cache = SQLiteCache(self.location, {})
+        self.cache.set('key', 'value')
+        self.assertEqual(other_cache.get('key'), 'value')
+        other_cache.clear()
+        self.assertIsNone(self.cache.get('key'))
+
+    def test_incr_is_atomic_between_processes(self):
+        """Проверка атомарности incr при записи из нескольких процессов."""
+        self.cache.set('counter', 0)
+        context = multiprocessing.get_context('fork')
+        processes = [
+            context.Process(
+                target=increment_many, args=(self.location, 50)
+            ) for _ in range(4)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        self.assertEqual(self.cache.get('counter'), 200)
+
+    def test_least_recently_used_entries_are_evicted(self):
+        """Проверка вытеснения давно не читанных записей."""
+        cache = SQLiteCache(
+            self.location,
+            {'OPTIONS': {'MAX_ENTRIES': 10, 'ACCESS_GRANULARITY': 0}},
+        )
+        for number in range(10):
+            cache.set(f'key{number}', number)
+        cache.get('key0')
+        cache.set('key10', 10)
+        self.assertEqual(cache.get('key0'), 0)
+        self.assertIsNone(cache.get('key1'))
+        self.assertEqual(cache.get('key10'), 10)
+
+    def test_size_limit_is_respected(self):
+        """Проверка ограничения суммарного объема значений."""
+        cache = SQLiteCache(
+            self.location,
+            {'OPTIONS': {'MAX_SIZE': 10000}},
+        )
+        for number in range(100):
+            cache.set(f'key{number}', b'x' * 500)
+        entries, size = cache._connection.execute(
+            'SELECT entries, size FROM cache_usage'
+        ).fetchone()
+        self.assertLessEqual(size, 10000)
+        self.assertIsNotNone(cache.get('key99'))
@@ -0,0 +1,114 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from django.urls import resolve, reverse
+from posts.models import Post
+
+from core import db_router
+from core.replication import copy_database
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'])
+class ReplicaRouterTest(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.router = db_router.ReplicaRouter()
+        patcher = mock.patch(
+            'core.db_router.available_replicas', return_value=['replica1']
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def handle(self, request, write=False):
+        """Проводит запрос через ReplicaMiddleware и запоминает базы."""
+        used = {}
+
+        def view(request):
+            used['read'] = self.router.db_for_read(Post)
+            if write:
+                used['write'] = self.router.db_for_write(Post)
+            return HttpResponse()
+
+        def get_response(request):
+            middleware.process_view(request, view, (), {})
+            return view(request)
+        middleware = db_router.ReplicaMiddleware(get_response)
+        request.resolver_match = resolve(request.path)
+        response = middleware(request)
+        return used, response
+
+    def test_listed_views_read_from_replica(self):
+        """GET страниц постов читает с реплики, остальное - с default."""
+        cases = (
+            (self.factory.get(reverse('posts:index')), 'replica1'),
+            (self.factory.head(reverse('posts:index')), 'replica1'),
+            (self.factory.get(reverse('posts:follow_index')), None),
+            (self.factory.post(reverse('posts:index')), None),
+        )
+        for request, database in cases:
+            with self.subTest(method=request.method, path=request.path):
+                used, _ = self.handle(request)
+                self.assertEqual(used['read'], database)
+
+    def test_write_pins_reads_to_primary(self):
+        """После записи cookie отправляет чтения в default."""
+        request = self.factory.post(reverse('posts:index'))
+        used, response = self.handle(request, write=True)
+        self.assertEqual(used['write'], 'default')
+        cookie = response.cookies[settings.DATABASE_PIN_COOKIE]
+        self.assertEqual(
+            cookie['max-age'], settings.DATABASE_PIN_SECONDS
+        )
+        request = self.factory.get(reverse('posts:index'))
+        request.COOKIES[cookie.key] = cookie.value
+        used, response = self.handle(request)
+        self.assertIsNone(used['read'])
+        self.assertNotIn(cookie.key, response.cookies)
+
+    def test_reads_outside_requests_use_default(self):
+        """Без запроса (команды, тесты) роутер не выбирает реплику."""
+        self.assertIsNone(self.router.db_for_read(Post))
+        self.assertFalse(self.router.allow_migrate('replica1', 'posts'))
+        self.assertTrue(self.router.allow_migrate('default', 'posts'))
+
+
+class CopyDatabaseTest(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.source = os.path.join(self.directory, 'primary.sqlite3')
+        self.target = os.path.join(self.directory, 'replica.sqlite3')
+        connection = sqlite3.connect(self.source)
+        connection.execute('PRAGMA journal_mode = wal')
+        connection.execute('CREATE TABLE item (id INTEGER PRIMARY KEY)')
+        connection.executemany('INSERT INTO item VALUES (?)', [(1,), (2,)])
+        connection.commit()
+        self.addCleanup(connection.close)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_copy_replaces_replica_file(self):
+        """Копия содержит данные из WAL, без WAL и в новом файле."""
+        sqlite3.connect(self.target).close()
+        inode = os.stat(self.target).st_ino
+        copy_database(self.source, self.target)
+        self.assertNotEqual(os.stat(self.target).st_ino, inode)
+        replica = sqlite3.connect(self.target)
+        self.addCleanup(replica.close)
+        self.assertEqual(
+            replica.execute('PRAGMA journal_mode').fetchone()[0], 'delete'
+        )
+        self.assertEqual(
+            replica.execute('SELECT COUNT(*) FROM item').fetchone()[0], 2
+        )
+        self.assertEqual(
+            sorted(os.listdir(self.directory)),
+            ['primary.sqlite3', 'primary.sqlite3-shm',
+             'primary.sqlite3-wal', 'replica.sqlite3'],
+        )
@@ -0,0 +1,117 @@
+import os
+import shutil
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from posts.models import Post
+
+from core import metrics
+
+User = get_user_model()
+
+METRICS_DIR = tempfile.mkdtemp()
+
+
+@override_settings(METRICS_DIR=METRICS_DIR)
+class MetricsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        Post.objects.create(text='Тестовый пост', author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        shutil.rmtree(METRICS_DIR, ignore_errors=True)
+        metrics._file = None
+        self.client = Client()
+
+    def tearDown(self):
+        shutil.rmtree(METRICS_DIR, ignore_errors=True)
+
+    def test_counters_of_processes_are_summed(self):
+        """Значения из файлов разных процессов складываются."""
+        key = ('yatube_db_queries_total', (('view', 'posts:index'),))
+        os.makedirs(METRICS_DIR)
+        for pid, amount in ((1, 2), (2, 3)):
+            path = os.path.join(METRICS_DIR, f'{pid}.db')
+            worker = metrics.MetricsFile(path)
+            worker.add(key, amount)
+            worker.close()
+        self.assertEqual(metrics.collect()[key], 5)
+
+    def test_file_grows_and_reopens(self):
+        """Файл растет при заполнении, и значения читаются после открытия."""
+        path = os.path.join(METRICS_DIR, 'worker.db')
+        os.makedirs(METRICS_DIR)
+        worker = metrics.MetricsFile(path)
+        keys = [('metric', (('n', str(i) * 50),)) for i in range(2000)]
+        for key in keys:
+            worker.add(key, 1)
+        worker.add(keys[0], 1)
+        worker.close()
+        self.assertGreater(os.path.getsize(path), metrics.INITIAL_SIZE)
+        reopened = metrics.MetricsFile(path)
+        reopened.add(keys[-1], 1)
+        reopened.close()
+        values = metrics.read(path)
+        self.assertEqual(len(values), 2000)
+        self.assertEqual(values[keys[0]], 2)
+        self.assertEqual(values[keys[-1]], 2)
+
+    def test_endpoint_exposes_view_histograms_and_cache_lookups(self):
+        """/metrics отдает гистограммы представлений и попадания в кеш."""
+        self.client.get(reverse('posts:index'))
+        self.client.get(reverse('posts:index'))
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response['Content-Type'], metrics.CONTENT_TYPE)
+        body = response.content.decode()
+        for line in (
+            '# TYPE yatube_request_duration_seconds histogram',
+            'yatube_request_duration_seconds_bucket'
+            '{le="+Inf",view="posts:index"} 2',
+            'yatube_request_duration_seconds_count{view="posts:index"} 2',
+            'yatube_requests_total'
+            '{method="GET",status="200",view="posts:index"} 2',
+            'yatube_cache_lookups_total'
+            '{cache="fragment:index_page",result="hit"} 1',
+            'yatube_cache_lookups_total'
+            '{cache="fragment:index_page",result="miss"} 1',
+        ):
+            with self.subTest(line=line):
+                self.assertIn(line, body.splitlines())
+        values = metrics.collect()
+        labels = (('view', 'posts:index'),)
+        self.assertGreater(
+            values[('yatube_db_queries_total', labels)], 0
+        )
+        self.assertGreater(
+            values[('yatube_template_render_duration_seconds_sum', labels)], 0
+        )
+
+    def test_histogram_buckets_are_cumulative(self):
+        """Корзины гистограммы накопительные, +Inf равна количеству."""
+        metrics.observe('yatube_request_duration_seconds', 0.001, view='v')
+        metrics.observe('yatube_request_duration_seconds', 0.2, view='v')
+        metrics.observe('yatube_request_duration_seconds', 60, view='v')
+        lines = metrics.render().splitlines()
+        for line in (
+            'yatube_request_duration_seconds_bucket{le="0.005",view="v"} 1',
+            'yatube_request_duration_seconds_bucket{le="0.1",view="v"} 1',
+            'yatube_request_duration_seconds_bucket{le="0.25",view="v"} 2',
+            'yatube_request_duration_seconds_bucket{le="10",view="v"} 2',
+            'yatube_request_duration_seconds_bucket{le="+Inf",view="v"} 3',
+        ):
+            with self.subTest(line=line):
+                self.assertIn(line, lines)
+
+    @override_settings(METRICS_ALLOWED_IPS=['10.0.0.1'])
+    def test_endpoint_is_limited_to_allowed_ips(self):
+        """Метрики доступны только с адресов METRICS_ALLOWED_IPS."""
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 403)
+        response = self.client.get(reverse('metrics'), REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(response.status_code, 200)
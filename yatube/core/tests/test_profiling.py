@@ -0,0 +1,98 @@
+import os
+import shutil
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core import metrics, profiling
+
+User = get_user_model()
+
+PROFILING_DIR = tempfile.mkdtemp()
+METRICS_DIR = tempfile.mkdtemp()
+
+
+@override_settings(
+    PROFILING_DIR=PROFILING_DIR, PROFILING_KEEP=2, METRICS_DIR=METRICS_DIR
+)
+class ProfilingTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.staff = User.objects.create_user(username='staff', is_staff=True)
+        cls.user = User.objects.create_user(username='user')
+
+    def setUp(self):
+        cache.clear()
+        metrics._file = None
+        self.staff_client = Client()
+        self.staff_client.force_login(self.staff)
+
+    def tearDown(self):
+        shutil.rmtree(PROFILING_DIR, ignore_errors=True)
+        shutil.rmtree(METRICS_DIR, ignore_errors=True)
+
+    def test_header_profiles_only_staff_requests(self):
+        """Заголовок X-Profile включает профилирование только сотрудникам."""
+        client = Client()
+        client.force_login(self.user)
+        client.get('/', HTTP_X_PROFILE='1')
+        self.assertEqual(profiling.profiles(), [])
+        self.staff_client.get('/', HTTP_X_PROFILE='1')
+        [profile] = profiling.profiles()
+        self.assertEqual(profile['view'], 'posts.index')
+
+    def test_ring_keeps_latest_profiles(self):
+        """Хранятся только PROFILING_KEEP последних профилей."""
+        for _ in range(4):
+            self.staff_client.get('/', HTTP_X_PROFILE='1')
+        self.assertEqual(len(profiling.profiles()), 2)
+
+    @override_settings(PROFILING_URL_NAMES=('posts:index',))
+    def test_url_names_are_always_profiled(self):
+        """Страницы из PROFILING_URL_NAMES профилируются всегда."""
+        Client().get('/')
+        Client().get('/search/')
+        self.assertEqual(
+            [profile['view'] for profile in profiling.profiles()],
+            ['posts.index'],
+        )
+
+    def test_histograms_count_every_request(self):
+        """Гистограмма собирает время всех запросов страницы."""
+        for elapsed in (0.001, 0.007, 0.007, 70):
+            metrics.observe(
+                'yatube_request_duration_seconds', elapsed, view='posts:index'
+            )
+        [row] = profiling.histograms()
+        self.assertEqual(row['count'], 4)
+        self.assertEqual(row['p50_ms'], 10)
+        self.assertIsNone(row['p95_ms'])
+
+    def test_histograms_sum_processes(self):
+        """Страница складывает гистограммы из файлов всех процессов."""
+        os.makedirs(METRICS_DIR)
+        key = ('yatube_request_duration_seconds_count',
+               (('view', 'posts:index'),))
+        for pid in (1, 2):
+            path = os.path.join(METRICS_DIR, f'{pid}.db')
+            worker = metrics.MetricsFile(path)
+            worker.add(key, 1)
+            worker.close()
+        [row] = profiling.histograms()
+        self.assertEqual(row['count'], 2)
+
+    def test_report_is_staff_only(self):
+        """Страница профилей доступна только сотрудникам."""
+        self.staff_client.get('/', HTTP_X_PROFILE='1')
+        response = self.staff_client.get(reverse('profiling'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['functions'])
+        self.assertIn('posts:index', [
+            row['view'] for row in response.context['histograms']
+        ])
+        response = Client().get(reverse('profiling'))
+        self.assertEqual(response.status_code, 302)
@@ -0,0 +1,71 @@
+from types import SimpleNamespace
+
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase, override_settings
+from posts.models import Post
+
+from core.query_budget import (
+    QueryBudgetExceeded, QueryCounter, fingerprint,
+)
+
+User = get_user_model()
+
+
+class QueryBudgetMiddlewareTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        Post.objects.create(text='Тестовый пост', author=cls.author)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def test_fingerprint_ignores_list_length_and_savepoint_names(self):
+        """Отпечаток не зависит от длины IN и имени точки сохранения."""
+        self.assertEqual(
+            fingerprint('SELECT * FROM t WHERE id IN (%s, %s, %s)'),
+            fingerprint('SELECT *  FROM t\nWHERE id IN (%s, %s)'),
+        )
+        self.assertEqual(
+            fingerprint('SAVEPOINT "s1_x1"'), fingerprint('SAVEPOINT "s2_x9"')
+        )
+
+    def test_query_fanned_out_to_shards_counts_once(self):
+        """Одинаковый запрос к разным базам считается один раз."""
+        counter = QueryCounter()
+
+        def execute(sql, params, many, context):
+            return None
+        for alias in ('default', 'shard1', 'default'):
+            context = {'connection': SimpleNamespace(alias=alias)}
+            counter(execute, 'SELECT 1', None, False, context)
+        counter(execute, 'SELECT 2', None, False, context)
+        self.assertEqual(counter.total, 3)
+        self.assertEqual(counter.duplicates(), [('SELECT 1', 2)])
+
+    @override_settings(QUERY_BUDGETS={'posts:index': 1})
+    def test_strict_mode_raises(self):
+        """В тестах превышение бюджета роняет запрос."""
+        with self.assertRaisesMessage(QueryBudgetExceeded, 'бюджет 1'):
+            self.client.get('/')
+
+    @override_settings(QUERY_BUDGETS={'posts:index': 1},
+                       QUERY_BUDGET_STRICT=False,
+                       QUERY_BUDGET_SAMPLE_RATE=1)
+    def test_sampled_request_logs_warning(self):
+        """Вне тестов превышение записывается в лог."""
+        with self.assertLogs('core.query_budget', 'WARNING') as logs:
+            response = self.client.get('/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('posts:index (/)', logs.output[0])
+
+    @override_settings(QUERY_BUDGETS={'posts:index': 1},
+                       QUERY_BUDGET_STRICT=False,
+                       QUERY_BUDGET_SAMPLE_RATE=0)
+    def test_unsampled_request_is_not_checked(self):
+        """Запросы вне выборки не проверяются."""
+        with self.assertRaises(AssertionError):
+            with self.assertLogs('core.query_budget', 'WARNING'):
+                self.client.get('/')
@@ -0,0 +1,112 @@
+import os
+import runpy
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from posts.models import Follow, Post
+
+from core import slow_queries
+
+User = get_user_model()
+
+LOG_DIR = tempfile.mkdtemp()
+SLOW_QUERY_LOG = os.path.join(LOG_DIR, 'slow.jsonl')
+
+
+@override_settings(SLOW_QUERY_LOG=SLOW_QUERY_LOG, SLOW_QUERY_THRESHOLD_MS=0)
+class SlowQueryLogTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='user')
+        cls.author = User.objects.create_user(username='auth')
+        Follow.objects.create(user=cls.user, author=cls.author)
+        Post.objects.create(text='Тестовый пост', author=cls.author)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def tearDown(self):
+        slow_queries.close_log()
+        shutil.rmtree(LOG_DIR, ignore_errors=True)
+
+    def test_request_queries_are_logged_with_plan(self):
+        """Запросы ответа пишутся в журнал с представлением и планом."""
+        self.client.get(reverse('posts:follow_index'))
+        entries = list(slow_queries.read_entries())
+        self.assertTrue(entries)
+        selects = [
+            entry for entry in entries
+            if entry['fingerprint'].startswith('SELECT')
+        ]
+        self.assertTrue(selects)
+        for entry in selects:
+            self.assertEqual(entry['view'], 'posts:follow_index')
+            self.assertEqual(entry['path'], reverse('posts:follow_index'))
+            self.assertTrue(entry['plan'])
+
+    @override_settings(SLOW_QUERY_THRESHOLD_MS=60 * 1000)
+    def test_fast_queries_are_not_logged(self):
+        """Запросы быстрее порога в журнал не попадают."""
+        self.client.get(reverse('posts:follow_index'))
+        self.assertEqual(list(slow_queries.read_entries()), [])
+
+    @override_settings(SLOW_QUERY_LOG_MAX_BYTES=1000,
+                       SLOW_QUERY_LOG_BACKUPS=2)
+    def test_log_is_rotated(self):
+        """Журнал ротируется, а сводка читает и старые копии."""
+        with slow_queries.SlowQueryLogger(label='test').watching():
+            for _ in range(20):
+                Post.objects.filter(text__contains='пост').count()
+        self.assertEqual(len(slow_queries.log_files()), 3)
+        for name in slow_queries.log_files():
+            self.assertLessEqual(os.path.getsize(name), 1000)
+        [row] = slow_queries.summarize(slow_queries.read_entries())
+        self.assertEqual(row['views'], {'test': row['count']})
+        self.assertIn('SCAN posts_post', row['scans'])
+
+    def test_explain_is_not_counted_as_query(self):
+        """EXPLAIN выполняется в обход оберток соединения."""
+        calls = []
+
+        def wrapper(execute, sql, params, many, context):
+            calls.append(sql)
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(wrapper):
+            plan = slow_queries.explain(
+                connection, 'SELECT id FROM posts_post WHERE id = %s', [1]
+            )
+        self.assertEqual(calls, [])
+        self.assertTrue(plan[0].startswith('SEARCH posts_post'))
+
+    def test_command_summarises_worst_fingerprints(self):
+        """Команда показывает отпечатки, представления и сканирования."""
+        with slow_queries.SlowQueryLogger(label='test').watching():
+            Post.objects.filter(text__contains='пост').count()
+        out = StringIO()
+        call_command('slow_queries', '--view', 'test', stdout=out)
+        self.assertIn('Представления: test (1)', out.getvalue())
+        self.assertIn('SCAN posts_post', out.getvalue())
+
+
+class ThresholdSettingTest(SimpleTestCase):
+    def threshold(self, value):
+        path = os.path.join(settings.BASE_DIR, 'yatube', 'settings.py')
+        with mock.patch.dict(os.environ, SLOW_QUERY_THRESHOLD_MS=value):
+            return runpy.run_path(path)['SLOW_QUERY_THRESHOLD_MS']
+
+    def test_threshold_from_environment(self):
+        """Пустое значение и off выключают журнал, число задает порог."""
+        for value, expected in (('250', 250.0), ('', None), (' OFF ', None)):
+            with self.subTest(value=value):
+                self.assertEqual(self.threshold(value), expected)
@@ -0,0 +1,95 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+from types import SimpleNamespace
+
+from django.db import OperationalError, connection
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.test import SimpleTestCase, override_settings
+
+from core import sqlite_tuning
+
+
+class SQLiteTuningTest(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'db.sqlite3')
+        self.connection = DatabaseWrapper(
+            {**connection.settings_dict, 'NAME': self.path}
+        )
+
+    def tearDown(self):
+        self.connection.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def pragma(self, name):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_pragmas_are_applied_on_connect(self):
+        """Новое соединение получает прагмы и повтор при блокировке."""
+        self.connection.ensure_connection()
+        self.assertEqual(self.pragma('journal_mode'), 'wal')
+        self.assertEqual(self.pragma('busy_timeout'), 5000)
+        self.assertEqual(self.pragma('synchronous'), 1)
+        self.assertEqual(self.pragma('temp_store'), 2)
+        self.connection.close()
+        self.connection.ensure_connection()
+        self.assertEqual(
+            self.connection.execute_wrappers.count(sqlite_tuning.busy_retry),
+            1,
+        )
+
+    def test_replaced_file_fails_health_check(self):
+        """Соединение с подмененным файлом базы считается сломанным."""
+        self.connection.ensure_connection()
+        self.assertTrue(sqlite_tuning.is_healthy(self.connection))
+        replacement = os.path.join(self.directory, 'restored.sqlite3')
+        sqlite3.connect(replacement).close()
+        os.replace(replacement, self.path)
+        self.assertFalse(sqlite_tuning.is_healthy(self.connection))
+
+
+@override_settings(SQLITE_BUSY_BACKOFF=0, SQLITE_BUSY_RETRIES=3)
+class BusyRetryTest(SimpleTestCase):
+    def execute_failing(self, times, message='database is locked'):
+        calls = []
+
+        def execute(sql, params, many, context):
+            calls.append(sql)
+            if len(calls) <= times:
+                raise OperationalError(message)
+            return 'ok'
+        return execute, calls
+
+    def retry(self, execute, in_atomic_block=False):
+        context = {
+            'connection': SimpleNamespace(in_atomic_block=in_atomic_block)
+        }
+        return sqlite_tuning.busy_retry(execute, 'SQL', (), False, context)
+
+    def test_busy_error_is_retried(self):
+        """Блокировка вне транзакции повторяется."""
+        execute, calls = self.execute_failing(2)
+        self.assertEqual(self.retry(execute), 'ok')
+        self.assertEqual(len(calls), 3)
+
+    def test_retries_are_bounded(self):
+        """После SQLITE_BUSY_RETRIES повторов ошибка пробрасывается."""
+        execute, calls = self.execute_failing(10)
+        with self.assertRaises(OperationalError):
+            self.retry(execute)
+        self.assertEqual(len(calls), 4)
+
+    def test_no_retry_inside_transaction_or_for_other_errors(self):
+        """В транзакции и для других ошибок повтора нет."""
+        for execute, calls, in_atomic_block in (
+            (*self.execute_failing(1), True),
+            (*self.execute_failing(1, 'no such table: x'), False),
+        ):
+            with self.subTest(in_atomic_block=in_atomic_block):
+                with self.assertRaises(OperationalError):
+                    self.retry(execute, in_atomic_block)
+                self.assertEqual(len(calls), 1)
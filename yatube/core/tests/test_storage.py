@@ -0,0 +1,47 @@
+import os
+import shutil
+import tempfile
+
+from django.core.files.base import ContentFile
+from django.test import TestCase
+
+from core.storage import ContentAddressedStorage
+
+
+class ContentAddressedStorageTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.storage = ContentAddressedStorage(location=self.directory)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_name_is_sharded_content_hash(self):
+        """Имя файла - хеш содержимого во вложенных каталогах."""
+        name = self.storage.save('posts/Photo.JPG', ContentFile(b'image'))
+        directory, first, second, filename = name.split('/')
+        self.assertEqual(directory, 'posts')
+        self.assertTrue(filename.endswith('.jpg'))
+        self.assertEqual(first + second, filename[:4])
+        self.assertTrue(self.storage.is_content_name(name))
+        self.assertFalse(self.storage.is_content_name('posts/Photo.JPG'))
+
+    def test_duplicates_share_one_file(self):
+        """Одинаковые файлы хранятся один раз, со счетчиком ссылок."""
+        first = self.storage.save('posts/a.jpg', ContentFile(b'same'))
+        second = self.storage.save('posts/b.jpg', ContentFile(b'same'))
+        self.assertEqual(first, second)
+        self.assertEqual(self.storage.references(first), 2)
+        self.storage.delete(first)
+        self.assertTrue(self.storage.exists(first))
+        self.storage.delete(first)
+        self.assertFalse(self.storage.exists(first))
+        self.assertEqual(self.storage.references(first), 0)
+
+    def test_untracked_files_are_deleted_at_once(self):
+        """Файлы без учета ссылок удаляются первым же вызовом delete."""
+        os.makedirs(os.path.join(self.directory, 'posts'))
+        with open(os.path.join(self.directory, 'posts', 'old.jpg'), 'wb'):
+            pass
+        self.storage.delete('posts/old.jpg')
+        self.assertFalse(self.storage.exists('posts/old.jpg'))
@@ -0,0 +1,18 @@
+from django.test import SimpleTestCase
+from sorl.thumbnail.images import ImageFile
+
+from core.thumbnail_backend import ThumbnailBackend, format_supported
+
+
+class ThumbnailBackendTest(SimpleTestCase):
+    def test_avif_thumbnails_get_avif_extension(self):
+        """Миниатюры в формате AVIF сохраняются с расширением .avif."""
+        name = ThumbnailBackend()._get_thumbnail_filename(
+            ImageFile('posts/image.jpg'), '480x170', {'format': 'AVIF'}
+        )
+        self.assertTrue(name.endswith('.avif'))
+
+    def test_unknown_formats_are_not_supported(self):
+        """Формат без расширения не считается поддерживаемым."""
+        self.assertTrue(format_supported('WEBP'))
+        self.assertFalse(format_supported('TIFF'))
@@ -0,0 +1,72 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from core.thumbnail_kvstore import TieredKVStore
+
+
+@override_settings(THUMBNAIL_LRU_SIZE=2, THUMBNAIL_LRU_TIMEOUT=60)
+class TieredKVStoreTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.store = TieredKVStore()
+
+    def test_values_are_served_from_process_memory(self):
+        """Повторное чтение не обращается ни к кешу, ни к базе."""
+        self.store._set_raw('key', 'value')
+        cache.clear()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.store._get_raw('key'), 'value')
+
+    def test_least_recently_used_values_are_evicted(self):
+        """Сверх THUMBNAIL_LRU_SIZE вытесняются давно читанные значения."""
+        for key in ('first', 'second', 'third'):
+            self.store._set_raw(key, key)
+        self.assertIsNone(self.store._recall('first'))
+        self.assertEqual(self.store._recall('third'), 'third')
+
+    def test_prefetch_loads_page_in_one_query(self):
+        """prefetch читает отсутствующие в кеше ключи одним запросом."""
+        KVStoreModel.objects.bulk_create(
+            [KVStoreModel(key=f'key{i}', value=f'value{i}') for i in range(2)]
+        )
+        with self.assertNumQueries(1):
+            self.store.prefetch(['key0', 'key1', 'missing'])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.store._get_raw('key0'), 'value0')
+            self.assertEqual(self.store._get_raw('key1'), 'value1')
+            self.assertIsNone(self.store._get_raw('missing'))
+
+    def test_delete_in_other_process_resets_memory(self):
+        """Удаление ключа другим процессом сбрасывает локальный словарь."""
+        self.store.prefetch([])
+        self.store._set_raw('key', 'value')
+        TieredKVStore()._delete_raw('key')
+        self.assertIsNone(self.store._get_raw('key'))
+
+    def test_generation_is_checked_once_per_request(self):
+        """В запросе поколение сверяется при первом чтении без prefetch."""
+        self.store._set_raw('key', 'value')
+        self.store.forget_misses()
+        TieredKVStore()._delete_raw('key')
+        self.assertIsNone(self.store._get_raw('key'))
+        self.store._set_raw('key', 'value')
+        TieredKVStore()._delete_raw('key')
+        self.assertEqual(self.store._get_raw('key'), 'value')
+        self.store.forget_misses()
+        self.assertIsNone(self.store._get_raw('key'))
+
+    def test_missing_value_is_not_cached(self):
+        """Отсутствие ключа не запоминается: его может записать пул."""
+        self.assertIsNone(self.store._get_raw('pending'))
+        KVStoreModel.objects.create(key='pending', value='value')
+        self.assertEqual(self.store._get_raw('pending'), 'value')
+
+    def test_prefetch_misses_last_until_next_request(self):
+        """Промахи prefetch помнятся только до конца запроса."""
+        self.store.prefetch(['pending'])
+        KVStoreModel.objects.create(key='pending', value='value')
+        with self.assertNumQueries(0):
+            self.assertIsNone(self.store._get_raw('pending'))
+        self.store.forget_misses()
+        self.assertEqual(self.store._get_raw('pending'), 'value')
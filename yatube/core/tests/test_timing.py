@@ -0,0 +1,37 @@
+from django.contrib.auth import get_user_model
+from django.template import Context, Template
+from django.test import TestCase
+
+from core.timing import Timings
+
+User = get_user_model()
+
+
+class TimingsTest(TestCase):
+    def test_nested_blocks_count_queries_and_rendering(self):
+        """Вложенные замеры оба видят запросы и время отрисовки."""
+        template = Template('{% for user in users %}{{ user }}{% endfor %}')
+        with Timings().watching() as outer:
+            with Timings().watching() as inner:
+                template.render(Context({'users': User.objects.all()}))
+            User.objects.count()
+        self.assertEqual(inner.queries, 1)
+        self.assertEqual(outer.queries, 2)
+        self.assertGreater(inner.render_seconds, 0)
+        self.assertEqual(outer.render_seconds, inner.render_seconds)
+        self.assertLessEqual(inner.db_seconds, outer.db_seconds)
+
+    def test_subclass_sees_every_query(self):
+        """executed получает SQL каждого запроса."""
+        class Recorder(Timings):
+            def __init__(self):
+                super().__init__()
+                self.sql = []
+
+            def executed(self, sql, params, many):
+                self.sql.append(sql)
+
+        with Recorder().watching() as recorder:
+            User.objects.exists()
+        [sql] = recorder.sql
+        self.assertIn('auth_user', sql)
@@ -0,0 +1,22 @@
+from PIL import Image
+from sorl.thumbnail import base
+from sorl.thumbnail.conf import settings
+from sorl.thumbnail.helpers import serialize, tokey
+
+EXTENSIONS = {**base.EXTENSIONS, 'AVIF': 'avif'}
+
+
+def format_supported(format_):
+    """Проверяет, что установленный Pillow умеет сохранять формат."""
+    Image.init()
+    return format_ in EXTENSIONS and format_ in Image.SAVE
+
+
+class ThumbnailBackend(base.ThumbnailBackend):
+    """Бэкенд sorl-thumbnail, знающий расширение файлов AVIF."""
+
+    def _get_thumbnail_filename(self, source, geometry_string, options):
+        key = tokey(source.key, geometry_string, serialize(options))
+        path = f'{key[:2]}/{key[2:4]}/{key}'
+        extension = EXTENSIONS[options['format']]
+        return f'{settings.THUMBNAIL_PREFIX}{path}.{extension}'
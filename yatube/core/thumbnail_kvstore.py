@@ -0,0 +1,165 @@
+"""Многоуровневое хранилище ключей sorl-thumbnail.
+
+Каждое значение ищется сначала в LRU-словаре процесса, затем в общем
+кеше и только потом в таблице thumbnail_kvstore. Метод prefetch
+загружает ключи всех миниатюр страницы одним запросом к кешу и одним
+запросом к базе.
+
+Локальные словари разных процессов сбрасываются через счетчик
+поколений в общем кеше: удаление ключей увеличивает счетчик, а
+процесс, заметив новое поколение, очищает свой словарь. В запросе
+поколение сверяется один раз - при prefetch или первом чтении ключа;
+вне запросов (команды, процессы пула) - при каждом чтении.
+Дополнительно записи словаря живут не дольше THUMBNAIL_LRU_TIMEOUT.
+
+Промахи не кешируются ни в словаре, ни в общем кеше: недостающий
+вариант вот-вот создаст процесс пула, и запомненное отсутствие прятало
+бы его из srcset. Только ключи, которых prefetch не нашел, помнятся до
+конца текущего запроса потока, чтобы разметка страницы не искала их в
+базе по одному.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.kvstores.cached_db_kvstore import EMPTY_VALUE, KVStore
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from core import metrics
+
+GENERATION_KEY = 'thumbnail_kvstore_generation'
+
+
+class TieredKVStore(KVStore):
+    def __init__(self):
+        super().__init__()
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = None
+        self._local = threading.local()
+
+    def _remember(self, key, value):
+        expires = time.monotonic() + settings.THUMBNAIL_LRU_TIMEOUT
+        with self._lock:
+            self._entries[key] = (value, expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > settings.THUMBNAIL_LRU_SIZE:
+                self._entries.popitem(last=False)
+
+    def _recall(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def _forget(self, keys=None):
+        with self._lock:
+            if keys is None:
+                self._entries.clear()
+                return
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def _misses(self):
+        if not hasattr(self._local, 'misses'):
+            self._local.misses = set()
+        return self._local.misses
+
+    def forget_misses(self):
+        self._local.misses = set()
+        self._local.generation_checked = False
+
+    def _sync_generation(self, generation):
+        if generation != self._generation:
+            self._forget()
+            self._generation = generation
+        # Отметка есть только в запросе: ее ставит forget_misses().
+        if hasattr(self._local, 'generation_checked'):
+            self._local.generation_checked = True
+
+    def _check_generation(self):
+        if not getattr(self._local, 'generation_checked', False):
+            self._sync_generation(self.cache.get(GENERATION_KEY))
+
+    def _next_generation(self):
+        try:
+            self.cache.incr(GENERATION_KEY)
+        except ValueError:
+            self.cache.add(GENERATION_KEY, time.time_ns() // 1000, None)
+
+    def _get_raw(self, key):
+        self._check_generation()
+        value = self._recall(key)
+        if value is not None:
+            metrics.inc('yatube_thumbnail_kv_lookups_total', tier='memory')
+            return value
+        if key in self._misses():
+            return None
+        metrics.inc('yatube_thumbnail_kv_lookups_total', tier='shared')
+        value = self.cache.get(key)
+        if value is None or value == EMPTY_VALUE:
+            value = (KVStoreModel.objects.filter(key=key)
+                     .values_list('value', flat=True).first())
+            if value is None:
+                return None
+            self.cache.set(
+                key, value, thumbnail_settings.THUMBNAIL_CACHE_TIMEOUT
+            )
+        self._remember(key, value)
+        return value
+
+    def _set_raw(self, key, value):
+        super()._set_raw(key, value)
+        self._remember(key, value)
+        self._misses().discard(key)
+
+    def _delete_raw(self, *keys):
+        super()._delete_raw(*keys)
+        self._forget(keys)
+        self._next_generation()
+
+    def clear(self, delete_thumbnails=False):
+        super().clear(delete_thumbnails)
+        self._forget()
+        self._next_generation()
+
+    def prefetch(self, keys):
+        """Загружает значения ключей (уже с префиксами) во все уровни."""
+        cached = self.cache.get_many([GENERATION_KEY, *keys])
+        self._sync_generation(cached.pop(GENERATION_KEY, None))
+        missing = [key for key in keys if self._recall(key) is None]
+        if not missing:
+            return
+        found = {
+            key: value for key, value in cached.items()
+            if key in missing and value != EMPTY_VALUE
+        }
+        absent = [key for key in missing if key not in found]
+        if absent:
+            stored = dict(
+                KVStoreModel.objects.filter(key__in=absent)
+                .values_list('key', 'value')
+            )
+            if stored:
+                self.cache.set_many(
+                    stored, thumbnail_settings.THUMBNAIL_CACHE_TIMEOUT
+                )
+            found.update(stored)
+            self._misses().update(key for key in absent if key not in stored)
+        for key, value in found.items():
+            self._remember(key, value)
+
+
+def forget_misses(**kwargs):
+    """В начале запроса забывает промахи prefetch прошлого запроса."""
+    from sorl.thumbnail import default
+    if isinstance(default.kvstore, TieredKVStore):
+        default.kvstore.forget_misses()
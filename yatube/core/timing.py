@@ -0,0 +1,87 @@
+"""Учет запросов к базе и отрисовки шаблонов.
+
+Timings.watching() подключает Timings к execute_wrapper всех соединений
+и на время блока отмечает его активным в потоке. Template.render,
+подмененный instrument_templates(), добавляет время внешних вызовов
+всем активным Timings: вложенные шаблоны ({% include %}) уже входят во
+время внешнего. Блоки могут быть вложенными - например, замер в
+posts.bench вокруг запроса, который учитывает MetricsMiddleware.
+"""
+import contextlib
+import threading
+import time
+
+from django.db import connections
+from django.template import base
+
+_local = threading.local()
+
+
+@contextlib.contextmanager
+def wrapping_connections(wrapper):
+    """Подключает wrapper к execute_wrapper всех соединений."""
+    with contextlib.ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(wrapper))
+        yield wrapper
+
+
+def _active():
+    if not hasattr(_local, 'active'):
+        _local.active = []
+    return _local.active
+
+
+class Timings:
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.render_seconds = 0.0
+        self.rendering = False
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_seconds += time.perf_counter() - started
+            self.executed(sql, params, many)
+
+    def executed(self, sql, params, many):
+        """Вызывается после каждого запроса; подклассы собирают запросы."""
+
+    @contextlib.contextmanager
+    def watching(self):
+        active = _active()
+        with wrapping_connections(self):
+            active.append(self)
+            try:
+                yield self
+            finally:
+                active.remove(self)
+
+
+def instrument_templates():
+    """Подключает учет времени внешних вызовов Template.render."""
+    original = base.Template.render
+    if getattr(original, 'timing_instrumented', False):
+        return
+
+    def render(self, context):
+        outer = [timings for timings in _active() if not timings.rendering]
+        if not outer:
+            return original(self, context)
+        for timings in outer:
+            timings.rendering = True
+        started = time.perf_counter()
+        try:
+            return original(self, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            for timings in outer:
+                timings.render_seconds += elapsed
+                timings.rendering = False
+
+    render.timing_instrumented = True
+    base.Template.render = render
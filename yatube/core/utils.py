@@ -0,0 +1,10 @@
+def batched(iterable, size):
+    """Разбивает iterable на списки по size элементов, последний - короче."""
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
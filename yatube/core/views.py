@@ -1,5 +1,12 @@
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponse
 from django.shortcuts import render
 
+from core import metrics, profiling
+
 
 def csrf_failure(request, reason=''):
     template = 'core/403csrf.html'
@@ -36,3 +43,36 @@ def server_error(request):
         'page_title': page_title,
     }
     return render(request, template, context, status=500)
+
+
+@staff_member_required
+def profiling_report(request):
+    template = 'core/admin/profiling.html'
+    sort = request.GET.get('sort')
+    if sort not in profiling.SORT_KEYS:
+        sort = profiling.SORT_KEYS[0]
+    profiles = profiling.profiles()
+    selected_view = request.GET.get('view', '')
+    selected = request.GET.getlist('profile') or [
+        profile['name'] for profile in profiles
+        if not selected_view or profile['view'] == selected_view
+    ]
+    context = {
+        **admin.site.each_context(request),
+        'title': 'Профилирование',
+        'histograms': profiling.histograms(),
+        'profiles': profiles,
+        'views': sorted({profile['view'] for profile in profiles}),
+        'selected_view': selected_view,
+        'selected': selected,
+        'sort': sort,
+        'sort_keys': profiling.SORT_KEYS,
+        'functions': profiling.hot_functions(selected, sort),
+    }
+    return render(request, template, context)
+
+
+def metrics_export(request):
+    if request.META.get('REMOTE_ADDR') not in settings.METRICS_ALLOWED_IPS:
+        raise PermissionDenied
+    return HttpResponse(metrics.render(), content_type=metrics.CONTENT_TYPE)
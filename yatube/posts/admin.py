@@ -1,4 +1,5 @@
 from django.contrib import admin
+from posts import search
 from posts.models import Comment, Follow, Group, Post
 
 
@@ -11,10 +12,28 @@ class PostAdmin(admin.ModelAdmin):
         'group',
     )
     list_editable = ('group',)
+    list_select_related = ('author', 'group')
     search_fields = ('text',)
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
 
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        field = super().formfield_for_foreignkey(db_field, request, **kwargs)
+        if db_field.name == 'group':
+            # Поле группы редактируется в каждой строке списка: без общего
+            # списка вариантов каждая строка заново читает все группы.
+            choices = getattr(request, '_group_choices', None)
+            if choices is None:
+                choices = list(field.choices)
+                request._group_choices = choices
+            field.choices = choices
+        return field
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        return queryset.filter(id__in=search.matching_ids(search_term)), False
+
 
 class GroupAdmin(admin.ModelAdmin):
     list_display = (
@@ -31,6 +50,7 @@ class CommentAdmin(admin.ModelAdmin):
         'created',
         'post',
     )
+    list_select_related = ('author', 'post')
     search_fields = ('text',)
     list_filter = ('created',)
 
@@ -40,7 +60,8 @@ class FollowAdmin(admin.ModelAdmin):
         'user',
         'author',
     )
-    search_fields = ('user', 'author')
+    list_select_related = ('user', 'author')
+    search_fields = ('user__username', 'author__username')
 
 
 admin.site.register(Post, PostAdmin)
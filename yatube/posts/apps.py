@@ -1,5 +1,11 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
 
 
 class PostsConfig(AppConfig):
     name = 'posts'
+
+    def ready(self):
+        import posts.signals  # noqa: F401
+        from posts import sharding
+        connection_created.connect(sharding.attach_default)
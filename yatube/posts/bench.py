@@ -0,0 +1,148 @@
+"""Замеры производительности страниц с постами.
+
+Каждая страница запрашивается тестовым клиентом; для лент с
+пагинацией - на нескольких глубинах, куда клиент доходит по курсорам
+"дальше". Для каждого запроса записываются полное время, число
+запросов к базе, их суммарное время и время рендеринга шаблонов.
+Время рендеринга включает запросы, которые выполняются из шаблонов.
+"""
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import Count
+from django.test import Client
+from django.urls import reverse
+from posts.models import Group, Post, UserStats
+
+from core.timing import Timings
+
+User = get_user_model()
+
+METRICS = ('wall_ms', 'queries', 'db_ms', 'render_ms')
+
+# Разница меньше этой не считается регрессией, как бы ни вырос процент.
+NOISE_MS = 1.0
+
+
+def measure(client, url, data=None):
+    """Выполняет GET и возвращает ответ и собранные метрики."""
+    with Timings().watching() as timings:
+        started = time.perf_counter()
+        response = client.get(url, data)
+        wall = time.perf_counter() - started
+    return response, {
+        'wall_ms': wall * 1000,
+        'queries': timings.queries,
+        'db_ms': timings.db_seconds * 1000,
+        'render_ms': timings.render_seconds * 1000,
+    }
+
+
+def targets():
+    """Выбирает для каждой страницы самый тяжелый вариант в текущих данных.
+
+    Возвращает пары (имя, url, пользователь для входа или None,
+    есть ли пагинация).
+    """
+    result = [('index', reverse('posts:index'), None, True)]
+    group = (Group.objects.annotate(total=Count('posts'))
+             .order_by('-total').first())
+    if group is not None:
+        result.append((
+            'group_posts',
+            reverse('posts:group_list', args=(group.slug,)),
+            None,
+            True,
+        ))
+    author = UserStats.objects.order_by('-posts_count').first()
+    if author is not None:
+        result.append((
+            'profile',
+            reverse('posts:profile', args=(author.user.username,)),
+            None,
+            True,
+        ))
+    reader = UserStats.objects.order_by('-following_count').first()
+    if reader is not None and reader.following_count:
+        result.append((
+            'follow_index', reverse('posts:follow_index'), reader.user, True
+        ))
+    post = (Post.objects.annotate(total=Count('comments'))
+            .order_by('-total').first())
+    if post is not None:
+        result.append((
+            'post_detail',
+            reverse('posts:post_detail', args=(post.id,)),
+            None,
+            False,
+        ))
+    return result
+
+
+def run(depths, repeat, warm=False):
+    """Замеряет страницы на текущих данных, возвращает строки результата."""
+    depths = sorted(set(depths))
+    results = []
+    for view, url, user, paginated in targets():
+        client = Client()
+        if user is not None:
+            client.force_login(user)
+        view_depths = depths if paginated else [1]
+        samples = {depth: [] for depth in view_depths}
+        for _ in range(repeat):
+            cursor = None
+            for depth in range(1, view_depths[-1] + 1):
+                if not warm:
+                    cache.clear()
+                data = {'cursor': cursor} if cursor else None
+                response, metrics = measure(client, url, data)
+                if depth in samples:
+                    samples[depth].append(metrics)
+                page = (response.context or {}).get('page_obj')
+                cursor = getattr(page, 'next_cursor', None)
+                if cursor is None:
+                    break
+        for depth, runs in samples.items():
+            if not runs:
+                continue
+            results.append({
+                'view': view,
+                'depth': depth,
+                **{
+                    metric: statistics.median(run[metric] for run in runs)
+                    for metric in METRICS
+                },
+            })
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Возвращает строки, которые заметно хуже базовых.
+
+    Строки сопоставляются по (view, size, depth). Регрессия - больше
+    запросов к базе или рост времени больше чем на threshold (доля)
+    и больше чем на NOISE_MS.
+    """
+    def key(row):
+        return row['view'], row['size'], row['depth']
+
+    base_rows = {key(row): row for row in baseline}
+    regressions = []
+    for row in results:
+        old = base_rows.get(key(row))
+        if old is None:
+            continue
+        reasons = []
+        if row['queries'] > old['queries']:
+            reasons.append(f"queries {old['queries']} -> {row['queries']}")
+        for metric in ('wall_ms', 'db_ms', 'render_ms'):
+            if (row[metric] > old[metric] * (1 + threshold)
+                    and row[metric] - old[metric] > NOISE_MS):
+                reasons.append(
+                    f'{metric} {old[metric]:.1f} -> {row[metric]:.1f}'
+                )
+        if reasons:
+            regressions.append((row, reasons))
+    return regressions
@@ -0,0 +1,114 @@
+"""Условные GET-запросы для лент и страницы поста.
+
+ETag и Last-Modified вычисляются по версиям областей из feed_cache,
+поэтому ответ 304 отдается без запроса страницы и без рендеринга шаблона.
+ETag учитывает пользователя, а дата не может: Last-Modified отдается
+только гостям, иначе копия страницы, полученная до входа или выхода,
+подтверждалась бы по If-Modified-Since.
+"""
+import hashlib
+from functools import wraps
+
+from django.contrib.auth import get_user_model
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+from posts import feed_cache, sharding
+from posts.models import Group, Post
+
+User = get_user_model()
+
+
+def _validators(request, scopes_func, args, kwargs):
+    if not hasattr(request, '_feed_validators'):
+        scopes = scopes_func(request, *args, **kwargs)
+        request._feed_validators = (
+            None if scopes is None else feed_cache.validators(*scopes)
+        )
+    return request._feed_validators
+
+
+def conditional_page(scopes_func):
+    """Добавляет к view проверку If-None-Match и If-Modified-Since.
+
+    scopes_func(request, *args, **kwargs) возвращает области feed_cache,
+    от которых зависит страница, или None, если объекта нет.
+    """
+    def etag_func(request, *args, **kwargs):
+        validators = _validators(request, scopes_func, args, kwargs)
+        if validators is None:
+            return None
+        versions, _ = validators
+        raw = ':'.join([
+            request.path,
+            str(request.user.id),
+            request.GET.get('cursor', ''),
+            *map(str, versions),
+        ])
+        return hashlib.md5(raw.encode()).hexdigest()
+
+    def last_modified_func(request, *args, **kwargs):
+        if request.user.is_authenticated:
+            return None
+        validators = _validators(request, scopes_func, args, kwargs)
+        if validators is None:
+            return None
+        _, last_modified = validators
+        return last_modified
+
+    def decorator(view):
+        conditional_view = condition(
+            etag_func=etag_func,
+            last_modified_func=last_modified_func,
+        )(view)
+        # Страницы зависят от пользователя, поэтому браузер должен
+        # каждый раз перепроверять их, а общие кеши не должны их хранить.
+        return wraps(view)(
+            cache_control(private=True, no_cache=True)(conditional_view)
+        )
+    return decorator
+
+
+def _viewer_scopes(request):
+    if request.user.is_authenticated:
+        return [feed_cache.follower_scope(request.user.id)]
+    return []
+
+
+def index_scopes(request):
+    return [feed_cache.POSTS]
+
+
+def group_scopes(request, slug):
+    group_id = (Group.objects.filter(slug=slug)
+                .values_list('id', flat=True).first())
+    if group_id is None:
+        return None
+    return [feed_cache.group_scope(group_id), feed_cache.USERS]
+
+
+def profile_scopes(request, username):
+    author_id = (User.objects.filter(username=username)
+                 .values_list('id', flat=True).first())
+    if author_id is None:
+        return None
+    return [
+        feed_cache.author_scope(author_id),
+        feed_cache.follower_scope(author_id),
+        feed_cache.GROUPS,
+        *_viewer_scopes(request),
+    ]
+
+
+def post_scopes(request, post_id):
+    for source in sharding.sources(Post.objects.filter(id=post_id)):
+        author_id = source.values_list('author_id', flat=True).first()
+        if author_id is not None:
+            break
+    else:
+        return None
+    return [
+        feed_cache.post_scope(post_id),
+        feed_cache.author_scope(author_id),
+        feed_cache.GROUPS,
+        feed_cache.USERS,
+    ]
@@ -0,0 +1,129 @@
+"""Потоковая выгрузка постов, комментариев и подписок.
+
+Таблицы читаются диапазонами по первичному ключу (id > последнего
+выгруженного), каждый диапазон - через iterator(), поэтому в памяти
+держится не больше одной порции строк при любом объеме данных. Посты и
+комментарии с шардов читаются с каждой базы и сливаются по id. Записи
+выгружаются в формате, который понимает import_posts.
+"""
+import csv
+import heapq
+import json
+from operator import itemgetter
+
+from posts import sharding
+from posts.models import Comment, Follow, Post
+
+POSTS = 'posts'
+COMMENTS = 'comments'
+FOLLOWS = 'follows'
+
+SOURCES = {
+    POSTS: (
+        'post',
+        Post.objects,
+        'author',
+        {
+            'id': 'id',
+            'text': 'text',
+            'author': 'author__username',
+            'group': 'group__slug',
+            'pub_date': 'pub_date',
+            'image': 'image',
+        },
+    ),
+    COMMENTS: (
+        'comment',
+        Comment.objects,
+        'author',
+        {
+            'id': 'id',
+            'post': 'post_id',
+            'author': 'author__username',
+            'text': 'text',
+            'created': 'created',
+        },
+    ),
+    FOLLOWS: (
+        'follow',
+        Follow.objects,
+        'user',
+        {
+            'id': 'id',
+            'user': 'user__username',
+            'author': 'author__username',
+        },
+    ),
+}
+
+CSV_FIELDS = (
+    'type', 'id', 'post', 'user', 'author', 'group', 'text', 'pub_date',
+    'created', 'image',
+)
+
+
+def keyset(queryset, fields, chunk_size):
+    """Выдает строки queryset порциями по возрастанию id."""
+    last_id = 0
+    while True:
+        chunk = (
+            queryset.filter(id__gt=last_id)
+            .order_by('id')
+            .values(*fields)[:chunk_size]
+        )
+        count = 0
+        for row in chunk.iterator(chunk_size=chunk_size):
+            count += 1
+            last_id = row['id']
+            yield row
+        if count < chunk_size:
+            return
+
+
+def records(kinds, user=None, chunk_size=2000):
+    """Выдает записи выбранных типов, для user - только его собственные."""
+    for kind in kinds:
+        record_type, manager, owner, columns = SOURCES[kind]
+        queryset = manager.all()
+        if user is not None:
+            queryset = queryset.filter(**{owner: user})
+        if queryset.model in sharding.SHARDED_MODELS:
+            sources = sharding.sources(queryset)
+        else:
+            sources = [queryset]
+        rows = heapq.merge(
+            *(keyset(source, columns.values(), chunk_size)
+              for source in sources),
+            key=itemgetter('id'),
+        )
+        for row in rows:
+            record = {'type': record_type}
+            for column, field in columns.items():
+                value = row[field]
+                if hasattr(value, 'isoformat'):
+                    value = value.isoformat()
+                record[column] = value
+            yield record
+
+
+def jsonl_lines(records):
+    for record in records:
+        yield json.dumps(record, ensure_ascii=False) + '\n'
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def csv_lines(records):
+    writer = csv.DictWriter(_Echo(), CSV_FIELDS, restval='')
+    yield writer.writeheader()
+    for record in records:
+        yield writer.writerow(record)
+
+
+FORMATS = {
+    'jsonl': (jsonl_lines, 'application/x-ndjson'),
+    'csv': (csv_lines, 'text/csv'),
+}
@@ -0,0 +1,178 @@
+"""Материализованная лента подписок.
+
+Посты обычных авторов раскладываются по лентам подписчиков в момент
+публикации (fan-out on write), поэтому чтение ленты сводится к одной
+выборке FeedEntry по индексу (user, pub_date). Посты популярных или
+слишком активных авторов не раскладываются, а подмешиваются при чтении.
+"""
+from datetime import timedelta
+from itertools import chain
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F
+from django.utils import timezone
+from posts import sharding
+from posts.models import FeedEntry, FeedPullAuthor, Follow, Post
+from posts.paginator import CursorPaginator
+
+from core.utils import batched
+
+FEED_ORDERING = ('-pub_date', '-post_id')
+
+
+def is_pull_author(author_id):
+    return FeedPullAuthor.objects.filter(author_id=author_id).exists()
+
+
+def needs_pull(author_id):
+    """Проверяет, что автора выгоднее подмешивать в ленты при чтении."""
+    followers = Follow.objects.filter(author_id=author_id).count()
+    if followers >= settings.FEED_PULL_MIN_FOLLOWERS:
+        return True
+    daily_posts = sharding.author_posts(author_id).filter(
+        author_id=author_id,
+        pub_date__gte=timezone.now() - timedelta(days=1),
+    ).count()
+    return daily_posts >= settings.FEED_PULL_MIN_DAILY_POSTS
+
+
+def pull_author_ids():
+    """Возвращает всех авторов, которых выгоднее подмешивать при чтении."""
+    popular = (Follow.objects.values('author_id')
+               .annotate(followers=Count('id'))
+               .filter(followers__gte=settings.FEED_PULL_MIN_FOLLOWERS)
+               .values_list('author_id', flat=True))
+    recent = Post.objects.filter(
+        pub_date__gte=timezone.now() - timedelta(days=1)
+    )
+    prolific = set()
+    for source in sharding.sources(recent):
+        prolific.update(
+            source.order_by()
+            .values('author_id')
+            .annotate(posts=Count('id'))
+            .filter(posts__gte=settings.FEED_PULL_MIN_DAILY_POSTS)
+            .values_list('author_id', flat=True)
+        )
+    return set(popular) | prolific
+
+
+def fan_out(post):
+    """Добавляет новый пост в ленты всех подписчиков автора."""
+    if is_pull_author(post.author_id):
+        return
+    if needs_pull(post.author_id):
+        FeedPullAuthor.objects.get_or_create(author_id=post.author_id)
+        return
+    followers = (Follow.objects.filter(author_id=post.author_id)
+                 .values_list('user_id', flat=True).iterator())
+    with transaction.atomic():
+        for user_ids in batched(followers, settings.FEED_FANOUT_BATCH_SIZE):
+            FeedEntry.objects.bulk_create(
+                [
+                    FeedEntry(
+                        user_id=user_id,
+                        post_id=post.id,
+                        author_id=post.author_id,
+                        pub_date=post.pub_date,
+                    ) for user_id in user_ids
+                ],
+                ignore_conflicts=True,
+            )
+
+
+def backfill(user_id, author_id, depth=None):
+    """Добавляет в ленту пользователя последние посты автора."""
+    if is_pull_author(author_id):
+        return
+    depth = depth or settings.FEED_BACKFILL_SIZE
+    posts = (sharding.author_posts(author_id).filter(author_id=author_id)
+             .order_by('-pub_date', '-id')
+             .values_list('id', 'pub_date')[:depth])
+    FeedEntry.objects.bulk_create(
+        [
+            FeedEntry(
+                user_id=user_id,
+                post_id=post_id,
+                author_id=author_id,
+                pub_date=pub_date,
+            ) for post_id, pub_date in posts
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def remove_author(user_id, author_id):
+    """Удаляет посты автора из ленты пользователя после отписки."""
+    FeedEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def remove_post(post_id):
+    """Удаляет пост из лент подписчиков."""
+    FeedEntry.objects.filter(post_id=post_id).delete()
+
+
+def rebuild(user_id, depth=None):
+    """Пересобирает ленту пользователя с нуля."""
+    depth = depth or settings.FEED_BACKFILL_SIZE
+    followed = Post.objects.filter(
+        author__following__user_id=user_id,
+        author__feed_pull__isnull=True,
+    )
+    posts = sorted(
+        chain.from_iterable(
+            source.order_by('-pub_date', '-id')
+            .values_list('id', 'author_id', 'pub_date')[:depth]
+            for source in sharding.sources(followed)
+        ),
+        key=lambda row: (row[2], row[0]),
+        reverse=True,
+    )[:depth]
+    with transaction.atomic():
+        FeedEntry.objects.filter(user_id=user_id).delete()
+        FeedEntry.objects.bulk_create(
+            [
+                FeedEntry(
+                    user_id=user_id,
+                    post_id=post_id,
+                    author_id=author_id,
+                    pub_date=pub_date,
+                ) for post_id, author_id, pub_date in posts
+            ],
+            batch_size=settings.FEED_FANOUT_BATCH_SIZE,
+        )
+
+
+def _load_posts(rows):
+    posts = {}
+    queryset = Post.objects.select_related('group', 'author')
+    for source in sharding.sources(queryset):
+        missing = [row.post_id for row in rows if row.post_id not in posts]
+        if not missing:
+            break
+        posts.update(source.in_bulk(missing))
+    return [posts[row.post_id] for row in rows if row.post_id in posts]
+
+
+def follow_feed_paginator(user, per_page):
+    """Пагинатор ленты: материализованные записи плюс pull-авторы."""
+    sources = [
+        FeedEntry.objects.filter(user=user).only('post_id', 'pub_date'),
+    ]
+    pull_authors = list(
+        Follow.objects.filter(user=user, author__feed_pull__isnull=False)
+        .values_list('author_id', flat=True)
+    )
+    if pull_authors:
+        sources.extend(sharding.sources(
+            Post.objects.filter(author_id__in=pull_authors)
+            .annotate(post_id=F('id'))
+            .only('id', 'pub_date')
+        ))
+    return CursorPaginator(
+        sources,
+        per_page,
+        ordering=FEED_ORDERING,
+        transform=_load_posts,
+    )
@@ -0,0 +1,99 @@
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.cache import cache
+
+POSTS = 'posts'
+GROUPS = 'groups'
+USERS = 'users'
+
+KEY_PREFIX = 'feed_version'
+MODIFIED_PREFIX = 'feed_modified'
+
+
+def group_scope(group_id):
+    return f'group:{group_id}'
+
+
+def author_scope(author_id):
+    return f'author:{author_id}'
+
+
+def follower_scope(user_id):
+    return f'follower:{user_id}'
+
+
+def post_scope(post_id):
+    return f'post:{post_id}'
+
+
+def _key(scope):
+    return f'{KEY_PREFIX}:{scope}'
+
+
+def _modified_key(scope):
+    return f'{MODIFIED_PREFIX}:{scope}'
+
+
+def _initial_version():
+    # Версия после вытеснения ключа не должна совпасть со старой,
+    # иначе снова станут видны устаревшие фрагменты.
+    return time.time_ns() // 1000
+
+
+def _read(scopes, with_modified=False):
+    keys = [_key(scope) for scope in scopes]
+    if with_modified:
+        keys += [_modified_key(scope) for scope in scopes]
+    values = cache.get_many(keys)
+    for scope in scopes:
+        key = _key(scope)
+        if key not in values:
+            cache.add(key, _initial_version(), None)
+            cache.add(_modified_key(scope), time.time(), None)
+            values.update(cache.get_many([key, _modified_key(scope)]))
+    return values
+
+
+def get_versions(*scopes):
+    """Возвращает текущие версии областей одним запросом к кешу."""
+    values = _read(scopes)
+    return tuple(values[_key(scope)] for scope in scopes)
+
+
+def validators(*scopes):
+    """Возвращает версии областей и время их последнего изменения.
+
+    Время неизвестно (None), если какая-то область не менялась с момента
+    запуска кеша: тогда проверять можно только по версиям.
+    """
+    values = _read(scopes, with_modified=True)
+    versions = tuple(values[_key(scope)] for scope in scopes)
+    modified = [values.get(_modified_key(scope)) for scope in scopes]
+    if None in modified:
+        return versions, None
+    return versions, datetime.fromtimestamp(max(modified), tz=timezone.utc)
+
+
+def bump(*scopes):
+    """Увеличивает версии областей, делая их фрагменты устаревшими."""
+    scopes = set(scopes)
+    for scope in scopes:
+        key = _key(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, _initial_version(), None)
+    now = time.time()
+    cache.set_many(
+        {_modified_key(scope): now for scope in scopes}, None
+    )
+
+
+def fragment_context(*scopes):
+    """Контекст для тега {% cache %}: время жизни и составная версия."""
+    return {
+        'cache_timeout': settings.FRAGMENT_CACHE_TIMEOUT,
+        'cache_version': '.'.join(map(str, get_versions(*scopes))),
+    }
@@ -1,11 +1,28 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
+from posts import uploads
 from posts.models import Comment, Post
 
 
+class PostImageField(forms.ImageField):
+    def to_python(self, data):
+        # Размер и заголовок проверяем до того, как Django откроет файл.
+        if isinstance(data, UploadedFile):
+            uploads.check(data)
+        return super().to_python(data)
+
+
 class PostForm(forms.ModelForm):
     class Meta:
         model = Post
         fields = ('text', 'group', 'image',)
+        field_classes = {'image': PostImageField}
+
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        if isinstance(image, UploadedFile):
+            return uploads.process(image)
+        return image
 
 
 class CommentForm(forms.ModelForm):
@@ -0,0 +1,364 @@
+"""Массовый импорт постов, комментариев и подписок.
+
+Записи читаются потоком из JSONL или CSV и вставляются через bulk_create
+порциями, по транзакции на порцию. Авторы и группы ищутся в словарях,
+загруженных один раз в начале. Сигналы при bulk_create не срабатывают,
+поэтому счетчики пользователей пересчитываются после импорта, а ленты
+подписок нужно пересобрать командой rebuild_feeds. При шардировании
+импорт не запускается. Авторы, затронутые
+до прерывания, сохраняются в контрольной точке вместе со счетчиками.
+Картинки постов должны уже лежать в хранилище: на каждый вставленный
+пост картинке добавляется ссылка в той же транзакции.
+
+Формат записи поста: type=post, id (необязательно), text, author
+(username), group (slug), pub_date (ISO 8601), image. Комментария:
+type=comment, id, post (id поста), author, text, created. Подписки:
+type=follow, user (username подписчика), author; id подписки не
+сохраняется, уже существующая подписка считается пропущенной.
+"""
+import collections
+import contextlib
+import csv
+import json
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from posts import feed_cache, sharding, stats
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+POST = 'post'
+COMMENT = 'comment'
+FOLLOW = 'follow'
+
+RELAXED_PRAGMAS = {
+    'synchronous': 'OFF',
+    'temp_store': 'MEMORY',
+    'cache_size': -256 * 1024,
+}
+
+RECONCILE_CHUNK_SIZE = 500
+
+
+class InvalidRecord(Exception):
+    pass
+
+
+def read_jsonl(file):
+    for line in file:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            yield None
+
+
+def read_csv(file):
+    for row in csv.DictReader(file):
+        yield {key: value or None for key, value in row.items()}
+
+
+READERS = {
+    'jsonl': read_jsonl,
+    'csv': read_csv,
+}
+
+
+@contextlib.contextmanager
+def relaxed_pragmas():
+    """Ослабляет гарантии SQLite на время импорта.
+
+    При synchronous = OFF сбой питания может потерять последние порции,
+    но импорт продолжается с контрольной точки. Внутри транзакции
+    SQLite не дает менять synchronous, поэтому там прагмы не трогаются.
+    """
+    if connection.vendor != 'sqlite' or connection.in_atomic_block:
+        yield
+        return
+    with connection.cursor() as cursor:
+        saved = {}
+        for pragma, value in RELAXED_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {pragma}')
+            saved[pragma] = cursor.fetchone()[0]
+            cursor.execute(f'PRAGMA {pragma} = {value}')
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            for pragma, value in saved.items():
+                cursor.execute(f'PRAGMA {pragma} = {value}')
+
+
+@contextlib.contextmanager
+def explicit_dates():
+    """Отключает auto_now_add, чтобы сохранить даты из источника."""
+    fields = [
+        Post._meta.get_field('pub_date'),
+        Comment._meta.get_field('created'),
+    ]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def _date(value):
+    if not value:
+        return timezone.now()
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise InvalidRecord(f'Некорректная дата: {value}')
+    if timezone.is_naive(parsed):
+        return timezone.make_aware(parsed, timezone.utc)
+    return parsed
+
+
+def _id(value, required=False):
+    """Числовой id из записи: в CSV все значения - строки."""
+    if value is None:
+        if required:
+            raise InvalidRecord('Нет id поста')
+        return None
+    if isinstance(value, bool):
+        raise InvalidRecord(f'Некорректный id: {value}')
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise InvalidRecord(f'Некорректный id: {value}')
+
+
+def _new_rows(model, objects):
+    """Объекты, которые bulk_create с ignore_conflicts действительно вставит.
+
+    Конфликтовать может только явно заданный id: с уже существующим
+    постом или комментарием или с повтором в той же порции.
+    """
+    ids = [obj.id for obj in objects if obj.id is not None]
+    existing = set(
+        model.objects.filter(id__in=ids).values_list('id', flat=True)
+    )
+    rows = []
+    for obj in objects:
+        if obj.id is not None:
+            if obj.id in existing:
+                continue
+            existing.add(obj.id)
+        rows.append(obj)
+    return rows
+
+
+class Importer:
+    def __init__(self, create_missing=False):
+        sharding.require_disabled('Импорт')
+        self.create_missing = create_missing
+        self.authors = dict(User.objects.values_list('username', 'id'))
+        self.groups = dict(Group.objects.values_list('slug', 'id'))
+        self.posts = []
+        self.comments = []
+        self.follows = []
+        self.touched_authors = set()
+        self.imported = 0
+        self.skipped = 0
+
+    def progress(self):
+        """Счетчики и затронутые авторы для контрольной точки."""
+        return {
+            'imported': self.imported,
+            'skipped': self.skipped,
+            'authors': sorted(self.touched_authors),
+        }
+
+    def resume(self, progress):
+        """Продолжает счет с контрольной точки, созданной progress()."""
+        self.imported = progress.get('imported', 0)
+        self.skipped = progress.get('skipped', 0)
+        self.touched_authors.update(progress.get('authors', ()))
+
+    def __len__(self):
+        return len(self.posts) + len(self.comments) + len(self.follows)
+
+    def add(self, record):
+        """Проверяет запись и откладывает ее до следующего flush()."""
+        try:
+            if not isinstance(record, dict):
+                raise InvalidRecord('Запись не является объектом')
+            kind = record.get('type') or POST
+            if kind == FOLLOW:
+                if not record.get('user') or not record.get('author'):
+                    raise InvalidRecord('Нет подписчика или автора')
+                if record['user'] == record['author']:
+                    raise InvalidRecord('Подписка на самого себя')
+                self.follows.append(record)
+                return
+            if not record.get('text') or not record.get('author'):
+                raise InvalidRecord('Нет текста или автора')
+            record['id'] = _id(record.get('id'))
+            if kind == POST:
+                record['pub_date'] = _date(record.get('pub_date'))
+                self.posts.append(record)
+            elif kind == COMMENT:
+                record['post'] = _id(record.get('post'), required=True)
+                record['created'] = _date(record.get('created'))
+                self.comments.append(record)
+            else:
+                raise InvalidRecord(f'Неизвестный тип записи: {kind}')
+        except InvalidRecord:
+            self.skipped += 1
+
+    def _resolve_authors(self, usernames):
+        missing = {
+            username for username in usernames
+            if username not in self.authors
+        }
+        if missing and self.create_missing:
+            User.objects.bulk_create(
+                [
+                    User(username=username, password=make_password(None))
+                    for username in missing
+                ],
+                ignore_conflicts=True,
+            )
+            self.authors.update(
+                User.objects.filter(username__in=missing)
+                .values_list('username', 'id')
+            )
+
+    def _resolve_groups(self, records):
+        missing = {
+            record['group'] for record in records
+            if record.get('group') and record['group'] not in self.groups
+        }
+        if missing and self.create_missing:
+            Group.objects.bulk_create(
+                [
+                    Group(title=slug, slug=slug, description='')
+                    for slug in missing
+                ],
+                ignore_conflicts=True,
+            )
+            self.groups.update(
+                Group.objects.filter(slug__in=missing)
+                .values_list('slug', 'id')
+            )
+
+    def _build_posts(self):
+        posts = []
+        for record in self.posts:
+            author_id = self.authors.get(record['author'])
+            group = record.get('group')
+            if author_id is None or (group and group not in self.groups):
+                self.skipped += 1
+                continue
+            posts.append(Post(
+                id=record['id'],
+                text=record['text'],
+                author_id=author_id,
+                group_id=self.groups.get(group),
+                pub_date=record['pub_date'],
+                image=record.get('image') or '',
+            ))
+            self.touched_authors.add(author_id)
+        return posts
+
+    def _build_comments(self):
+        existing = set(
+            Post.objects.filter(
+                id__in={record['post'] for record in self.comments}
+            ).values_list('id', flat=True)
+        )
+        comments = []
+        for record in self.comments:
+            author_id = self.authors.get(record['author'])
+            if author_id is None or record['post'] not in existing:
+                self.skipped += 1
+                continue
+            comments.append(Comment(
+                id=record['id'],
+                post_id=record['post'],
+                author_id=author_id,
+                text=record['text'],
+                created=record['created'],
+            ))
+        return comments
+
+    def _build_follows(self):
+        """Новые подписки: существующие и повторы считаются пропущенными."""
+        pairs = []
+        for record in self.follows:
+            user_id = self.authors.get(record['user'])
+            author_id = self.authors.get(record['author'])
+            if user_id is None or author_id is None:
+                self.skipped += 1
+                continue
+            pairs.append((user_id, author_id))
+        existing = set(
+            Follow.objects.filter(
+                user_id__in={user_id for user_id, _ in pairs},
+                author_id__in={author_id for _, author_id in pairs},
+            ).values_list('user_id', 'author_id')
+        )
+        follows = []
+        for pair in pairs:
+            if pair in existing:
+                self.skipped += 1
+                continue
+            existing.add(pair)
+            follows.append(Follow(user_id=pair[0], author_id=pair[1]))
+            self.touched_authors.update(pair)
+        return follows
+
+    @staticmethod
+    def _reference_images(posts):
+        # bulk_create не вызывает storage.save(), который ставит ссылку.
+        # Файлы, которых нет в хранилище, не учитываются, как и
+        # загруженные до появления учета ссылок.
+        storage = Post._meta.get_field('image').storage
+        uses = collections.Counter(post.image.name for post in posts)
+        for name, count in uses.items():
+            if name and storage.exists(name):
+                storage.add_reference(name, storage.size(name), count)
+
+    def flush(self):
+        """Вставляет отложенные записи одной транзакцией.
+
+        Размер отдельного INSERT выбирает Django по лимитам базы. Записи
+        с уже занятым id не вставляются и считаются пропущенными.
+        """
+        with transaction.atomic():
+            usernames = [
+                record['author']
+                for record in self.posts + self.comments + self.follows
+            ]
+            usernames += [record['user'] for record in self.follows]
+            self._resolve_authors(usernames)
+            self._resolve_groups(self.posts)
+            built_posts = self._build_posts()
+            posts = _new_rows(Post, built_posts)
+            Post.objects.bulk_create(posts, ignore_conflicts=True)
+            self._reference_images(posts)
+            built_comments = self._build_comments()
+            comments = _new_rows(Comment, built_comments)
+            Comment.objects.bulk_create(comments, ignore_conflicts=True)
+            follows = self._build_follows()
+            Follow.objects.bulk_create(follows, ignore_conflicts=True)
+        self.imported += len(posts) + len(comments) + len(follows)
+        self.skipped += (
+            len(built_posts) - len(posts) + len(built_comments) - len(comments)
+        )
+        self.posts, self.comments, self.follows = [], [], []
+
+    def finish(self):
+        """Пересчитывает счетчики авторов и сбрасывает кеш фрагментов."""
+        authors = list(self.touched_authors)
+        for start in range(0, len(authors), RECONCILE_CHUNK_SIZE):
+            stats.reconcile(authors[start:start + RECONCILE_CHUNK_SIZE])
+        feed_cache.bump(feed_cache.POSTS, feed_cache.GROUPS, feed_cache.USERS)
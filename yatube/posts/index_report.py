@@ -0,0 +1,158 @@
+"""Планы запросов горячих страниц.
+
+Страницы из posts.bench.targets запрашиваются тестовым клиентом на
+текущих данных (первая и вторая страница лент, чтобы попал и запрос с
+условием курсора). Каждое уникальное чтение выполняется повторно для
+замера и разбирается через EXPLAIN QUERY PLAN. Полное сканирование
+таблицы и сортировка во временном B-дереве отмечаются как проблемы.
+
+Для сравнения "до" замеры повторяются с удаленными COMPOSITE_INDEXES
+внутри транзакции, которая затем откатывается: в SQLite DDL
+транзакционный, и индексы возвращаются без пересоздания. На время
+такого замера запись в базу заблокирована.
+"""
+import contextlib
+import statistics
+import time
+
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from posts import bench
+
+from core.query_budget import fingerprint
+from core.slow_queries import explain
+from core.timing import Timings
+
+COMPOSITE_INDEXES = (
+    'post_author_pub_date_idx',
+    'post_group_pub_date_idx',
+    'comment_post_created_idx',
+    'follow_author_user_idx',
+)
+
+READS = ('SELECT', 'WITH')
+
+# Кеш в памяти процесса: иначе фрагменты из общего кеша прячут запросы,
+# а очищать общий кеш ради отчета нельзя.
+REPORT_SETTINGS = {
+    'CACHES': {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'index-report',
+        },
+    },
+    'METRICS_ENABLED': False,
+    'SLOW_QUERY_THRESHOLD_MS': None,
+}
+
+
+def problems(plan):
+    """Строки плана с полным сканированием таблицы или сортировкой."""
+    found = []
+    for detail in plan or ():
+        full_scan = (
+            detail.startswith('SCAN ')
+            and ' USING ' not in detail
+            and 'VIRTUAL TABLE' not in detail
+            and 'CONSTANT ROW' not in detail
+        )
+        if full_scan or detail.startswith('USE TEMP B-TREE'):
+            found.append(detail)
+    return found
+
+
+class Reads(Timings):
+    """Уникальные чтения по отпечатку SQL с параметрами первого вызова."""
+
+    def __init__(self):
+        super().__init__()
+        self.reads = {}
+
+    def executed(self, sql, params, many):
+        if not many and sql.lstrip().upper().startswith(READS):
+            self.reads.setdefault(fingerprint(sql), (sql, params))
+
+
+def capture(url, user=None, paginated=False):
+    """Уникальные чтения страницы (и второй страницы ленты) с параметрами."""
+    captured = Reads()
+    client = Client()
+    if user is not None:
+        client.force_login(user)
+    with override_settings(**REPORT_SETTINGS):
+        with captured.watching():
+            response = client.get(url)
+            page = (response.context or {}).get('page_obj')
+            cursor = getattr(page, 'next_cursor', None)
+            if paginated and cursor:
+                client.get(url, {'cursor': cursor})
+    client.logout()
+    return list(captured.reads.values())
+
+
+def timing(sql, params, repeat):
+    """Медиана времени выполнения запроса с выборкой всех строк, мс."""
+    samples = []
+    cursor = connection.create_cursor()
+    try:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            cursor.execute(sql, params)
+            cursor.fetchall()
+            samples.append((time.perf_counter() - started) * 1000)
+    finally:
+        cursor.close()
+    return statistics.median(samples)
+
+
+def analyze(queries, repeat, marker=None):
+    rows = []
+    for sql, params in queries:
+        # sqlite3 кеширует подготовленные запросы по тексту, а EXPLAIN
+        # из кеша не перестраивается после DROP INDEX; комментарий
+        # делает текст другим.
+        explained = sql if marker is None else f'{sql} /* {marker} */'
+        plan = explain(connection, explained, params)
+        if plan is None:
+            continue
+        rows.append({
+            'sql': fingerprint(sql),
+            'plan': plan,
+            'problems': problems(plan),
+            'ms': timing(sql, params, repeat),
+        })
+    return rows
+
+
+@contextlib.contextmanager
+def without_indexes(names):
+    """Удаляет индексы на время блока и возвращает их откатом транзакции."""
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            for name in names:
+                cursor.execute(
+                    f'DROP INDEX IF EXISTS {connection.ops.quote_name(name)}'
+                )
+        yield
+        transaction.set_rollback(True)
+
+
+def report(repeat=5, compare=False):
+    """Строки отчета по страницам из bench.targets."""
+    pages = []
+    for view, url, user, paginated in bench.targets():
+        queries = capture(url, user, paginated)
+        rows = analyze(queries, repeat)
+        if compare:
+            with without_indexes(COMPOSITE_INDEXES):
+                before = {
+                    row['sql']: row
+                    for row in analyze(queries, repeat, 'without indexes')
+                }
+            for row in rows:
+                old = before.get(row['sql'])
+                if old is not None:
+                    row['before_ms'] = old['ms']
+                    row['before_plan'] = old['plan']
+        pages.append({'view': view, 'url': url, 'queries': rows})
+    return pages
@@ -0,0 +1,156 @@
+import json
+import os
+import platform
+import shutil
+import tempfile
+from datetime import datetime
+from io import StringIO
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (override_settings, setup_test_environment,
+                               teardown_test_environment)
+from posts import bench
+from posts.models import Group, Post
+from posts.seeding import Seeder
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет главную, группу, профиль, ленту подписок и пост на '
+        'синтетических данных нескольких объемов во временной базе и '
+        'сравнивает результат с сохраненным.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            type=int,
+            nargs='+',
+            default=[1000, 10000],
+            help='Количества постов, на которых проводятся замеры',
+        )
+        parser.add_argument(
+            '--depths',
+            type=int,
+            nargs='+',
+            default=[1, 5, 20],
+            help='Номера страниц лент, которые замеряются',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Сколько раз повторять замер; берется медиана',
+        )
+        parser.add_argument(
+            '--warm',
+            action='store_true',
+            help='Не очищать кеш перед каждым запросом',
+        )
+        parser.add_argument(
+            '--output',
+            default='bench.json',
+            help='Куда записать результаты в JSON',
+        )
+        parser.add_argument(
+            '--baseline',
+            help='Результаты прошлого запуска для сравнения',
+        )
+        parser.add_argument(
+            '--threshold',
+            type=float,
+            default=0.2,
+            help='Допустимый рост времени относительно базового, доля',
+        )
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline']) as file:
+                baseline = json.load(file)['results']
+
+        results = self.run(options)
+        with open(options['output'], 'w') as file:
+            json.dump({
+                'created': datetime.now().isoformat(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'repeat': options['repeat'],
+                'warm': options['warm'],
+                'results': results,
+            }, file, indent=2)
+        self.stdout.write(f'Результаты записаны в {options["output"]}')
+
+        if baseline is None:
+            return
+        regressions = bench.compare(results, baseline, options['threshold'])
+        for row, reasons in regressions:
+            self.stdout.write(self.style.ERROR(
+                f'{row["view"]} size={row["size"]} depth={row["depth"]}: '
+                + ', '.join(reasons)
+            ))
+        if regressions:
+            raise CommandError(f'Найдено регрессий: {len(regressions)}')
+        self.stdout.write(self.style.SUCCESS('Регрессий нет'))
+
+    def run(self, options):
+        setup_test_environment(debug=False)
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        cache_dir = tempfile.mkdtemp()
+        caches = {
+            'default': {
+                **settings.CACHES['default'],
+                'LOCATION': os.path.join(cache_dir, 'cache.sqlite3'),
+            },
+        }
+        try:
+            with override_settings(CACHES=caches):
+                return self.measure(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+            shutil.rmtree(cache_dir, ignore_errors=True)
+
+    def measure(self, options):
+        seeder = Seeder(prefix='bench', seed=options['seed'])
+        results = []
+        for size in sorted(options['sizes']):
+            self.seed(seeder, size)
+            self.stdout.write(
+                f'{"view":<14}{"size":>8}{"depth":>6}{"wall ms":>10}'
+                f'{"queries":>9}{"db ms":>9}{"render ms":>11}'
+            )
+            for row in bench.run(options['depths'], options['repeat'],
+                                 options['warm']):
+                row = {'size': size, **row}
+                results.append(row)
+                self.stdout.write(
+                    f'{row["view"]:<14}{size:>8}{row["depth"]:>6}'
+                    f'{row["wall_ms"]:>10.1f}{row["queries"]:>9}'
+                    f'{row["db_ms"]:>9.1f}{row["render_ms"]:>11.1f}'
+                )
+        return results
+
+    def seed(self, seeder, size):
+        """Догоняет данные до size постов, сохраняя пропорции."""
+        missing = size - Post.objects.count()
+        if missing <= 0:
+            return
+        users = max(size // 50, 10)
+        user_ids = seeder.users(users - User.objects.count())
+        group_ids = seeder.groups(max(size // 1000, 3) - Group.objects.count())
+        seeder.follows(len(user_ids) * 5, user_ids)
+        first, last = seeder.posts(missing, user_ids, group_ids)
+        seeder.comments(missing, user_ids, first, last)
+        seeder.finish(user_ids)
+        call_command('rebuild_feeds', stdout=StringIO())
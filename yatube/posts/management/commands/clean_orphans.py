@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from posts import sharding
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет посты и комментарии удаленных пользователей и записи '
+        'лент удаленных постов, отвязывает посты от удаленных групп. '
+        'Ограничений внешних ключей у этих связей в базе нет, и строки, '
+        'удаленные мимо ORM, оставляют таких сирот.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Сколько постов из лент проверять за один проход',
+        )
+
+    def handle(self, *args, **options):
+        for alias in settings.POST_SHARDS:
+            if not sharding.is_migrated(alias):
+                raise CommandError(
+                    f'На {alias} нет таблиц постов: выполните '
+                    f'migrate --database {alias}.'
+                )
+        posts, comments, entries, detached = sharding.clean_orphans(
+            options['batch_size']
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Удалено постов: {posts}, комментариев: {comments}, '
+            f'записей лент: {entries}; отвязано от групп постов: {detached}'
+        ))
@@ -0,0 +1,93 @@
+import json
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from posts import media_gc
+
+
+class Command(BaseCommand):
+    help = (
+        'Ищет и удаляет картинки и миниатюры, на которые не ссылается ни '
+        'один пост. Прерванный проход продолжается с места остановки.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--delete',
+            action='store_true',
+            help='Удалять найденные файлы, а не только выводить отчет',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Сколько файлов или записей проверять за один запрос',
+        )
+        parser.add_argument(
+            '--grace',
+            type=int,
+            default=60 * 60,
+            help='Не трогать файлы моложе стольких секунд',
+        )
+        parser.add_argument(
+            '--reset',
+            action='store_true',
+            help='Начать проход заново, забыв сохраненную позицию',
+        )
+
+    def handle(self, *args, **options):
+        self.state_file = settings.MEDIA_GC_STATE_FILE
+        state = {} if options['reset'] else self.load_state()
+        if state and state.get('delete') != options['delete']:
+            # Позиция отчета не годится для удаления и наоборот:
+            # пройденные в другом режиме файлы остались бы нетронутыми.
+            self.stdout.write('Сохраненная позиция в другом режиме, '
+                              'начинаем заново')
+            state = {}
+        phases = media_gc.PHASES
+        if state.get('phase') in phases:
+            phases = phases[phases.index(state['phase']):]
+            self.stdout.write(
+                f'Продолжаем с фазы {state["phase"]} после '
+                f'{state.get("after") or "начала"}'
+            )
+        after = state.get('after')
+        for phase in phases:
+            found = 0
+            for position, orphans in media_gc.collect(
+                phase, after, options['batch_size'], options['grace'],
+                options['delete'],
+            ):
+                found += len(orphans)
+                if options['verbosity'] > 1:
+                    for name in orphans:
+                        self.stdout.write(name)
+                self.save_state({
+                    'phase': phase,
+                    'after': position,
+                    'delete': options['delete'],
+                })
+            after = None
+            action = 'Удалено' if options['delete'] else 'Найдено'
+            self.stdout.write(f'{phase}: {action} лишних: {found}')
+        self.clear_state()
+        self.stdout.write(self.style.SUCCESS('Проход завершен'))
+
+    def load_state(self):
+        try:
+            with open(self.state_file) as file:
+                return json.load(file)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def save_state(self, state):
+        os.makedirs(os.path.dirname(self.state_file), exist_ok=True)
+        temporary = f'{self.state_file}.tmp'
+        with open(temporary, 'w') as file:
+            json.dump(state, file)
+        os.replace(temporary, self.state_file)
+
+    def clear_state(self):
+        if os.path.exists(self.state_file):
+            os.remove(self.state_file)
@@ -0,0 +1,69 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from posts import exporter
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает посты, комментарии и подписки в JSONL или CSV, '
+        'не загружая таблицы в память целиком.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'kinds',
+            nargs='*',
+            help=(
+                'Что выгружать: ' + ', '.join(exporter.SOURCES)
+                + '; по умолчанию все'
+            ),
+        )
+        parser.add_argument(
+            '--format',
+            choices=sorted(exporter.FORMATS),
+            default='jsonl',
+            help='Формат выгрузки',
+        )
+        parser.add_argument(
+            '--output',
+            help='Файл для выгрузки; по умолчанию стандартный вывод',
+        )
+        parser.add_argument(
+            '--author',
+            help='Выгрузить только данные пользователя с этим username',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=2000,
+            help='Сколько строк читать из базы за один запрос',
+        )
+
+    def handle(self, *args, **options):
+        kinds = options['kinds'] or list(exporter.SOURCES)
+        unknown = set(kinds) - set(exporter.SOURCES)
+        if unknown:
+            raise CommandError(f'Неизвестный тип данных: {unknown.pop()}')
+        user = None
+        if options['author']:
+            try:
+                user = User.objects.get(username=options['author'])
+            except User.DoesNotExist:
+                raise CommandError(
+                    f'Пользователь {options["author"]} не найден'
+                )
+        records = exporter.records(
+            kinds,
+            user=user,
+            chunk_size=options['chunk_size'],
+        )
+        lines, _ = exporter.FORMATS[options['format']]
+        if options['output']:
+            with open(options['output'], 'w', newline='',
+                      encoding='utf-8') as file:
+                file.writelines(lines(records))
+        else:
+            for line in lines(records):
+                self.stdout.write(line, ending='')
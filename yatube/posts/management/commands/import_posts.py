@@ -0,0 +1,99 @@
+import itertools
+import json
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from posts import importer, sharding
+
+
+class Command(BaseCommand):
+    help = (
+        'Импортирует посты, комментарии и подписки из файла JSONL или CSV '
+        'порциями через bulk_create. Прерванный импорт продолжается с '
+        'контрольной точки.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл с записями')
+        parser.add_argument(
+            '--format',
+            choices=sorted(importer.READERS),
+            help='Формат файла; по умолчанию определяется по расширению',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Сколько записей вставлять за одну транзакцию',
+        )
+        parser.add_argument(
+            '--create-missing',
+            action='store_true',
+            help='Создавать отсутствующих авторов и группы',
+        )
+        parser.add_argument(
+            '--restart',
+            action='store_true',
+            help='Начать импорт сначала, игнорируя контрольную точку',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or os.path.splitext(path)[1][1:]
+        if file_format not in importer.READERS:
+            raise CommandError(f'Неизвестный формат файла: {file_format}')
+        self.checkpoint = f'{path}.checkpoint'
+        checkpoint = {} if options['restart'] else self.load_checkpoint()
+        done = checkpoint.get('records', 0)
+        if done:
+            self.stdout.write(f'Продолжаем после записи {done}')
+
+        batch_size = options['batch_size']
+        try:
+            records_importer = importer.Importer(options['create_missing'])
+        except sharding.ShardingEnabled as error:
+            raise CommandError(error)
+        records_importer.resume(checkpoint)
+        self.imported_before = records_importer.imported
+        started = time.monotonic()
+        with open(path, newline='', encoding='utf-8') as file, \
+                importer.relaxed_pragmas(), importer.explicit_dates():
+            records = importer.READERS[file_format](file)
+            position = done
+            for record in itertools.islice(records, done, None):
+                records_importer.add(record)
+                position += 1
+                if len(records_importer) >= batch_size:
+                    self.flush(records_importer, position, started)
+            self.flush(records_importer, position, started)
+        records_importer.finish()
+        os.remove(self.checkpoint)
+        self.stdout.write(self.style.SUCCESS(
+            f'Импортировано записей: {records_importer.imported}, '
+            f'пропущено: {records_importer.skipped}. '
+            'Пересоберите ленты командой rebuild_feeds.'
+        ))
+
+    def flush(self, records_importer, position, started):
+        records_importer.flush()
+        self.save_checkpoint(position, records_importer.progress())
+        elapsed = max(time.monotonic() - started, 1e-6)
+        imported = records_importer.imported - self.imported_before
+        self.stdout.write(
+            f'Записей: {position}, {imported / elapsed:.0f} в секунду'
+        )
+
+    def load_checkpoint(self):
+        try:
+            with open(self.checkpoint) as file:
+                checkpoint = json.load(file)
+        except (FileNotFoundError, ValueError):
+            return {}
+        return checkpoint if isinstance(checkpoint, dict) else {}
+
+    def save_checkpoint(self, position, progress):
+        temporary = f'{self.checkpoint}.tmp'
+        with open(temporary, 'w') as file:
+            json.dump({'records': position, **progress}, file)
+        os.replace(temporary, self.checkpoint)
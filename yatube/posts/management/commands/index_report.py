@@ -0,0 +1,72 @@
+from django.core.management.base import BaseCommand
+from django.test.utils import setup_test_environment, teardown_test_environment
+from posts import index_report
+
+SQL_SHOWN = 160
+
+
+class Command(BaseCommand):
+    help = (
+        'Повторяет запросы главной, группы, профиля, ленты подписок и '
+        'поста на текущих данных, показывает планы и отмечает полные '
+        'сканирования таблиц.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Сколько раз выполнять каждый запрос; берется медиана',
+        )
+        parser.add_argument(
+            '--compare',
+            action='store_true',
+            help=(
+                'Замерить запросы и без составных индексов (удаляются в '
+                'транзакции с откатом, запись в базу на это время '
+                'заблокирована)'
+            ),
+        )
+
+    def handle(self, *args, **options):
+        # Тестовое окружение нужно клиенту: хост testserver и
+        # response.context для перехода на вторую страницу.
+        setup_test_environment(debug=False)
+        try:
+            pages = index_report.report(options['repeat'], options['compare'])
+        finally:
+            teardown_test_environment()
+
+        total = 0
+        for page in pages:
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'{page["view"]} {page["url"]}: '
+                f'запросов {len(page["queries"])}'
+            ))
+            for row in page['queries']:
+                total += bool(row['problems'])
+                sql = row['sql']
+                if len(sql) > SQL_SHOWN:
+                    sql = sql[:SQL_SHOWN] + '...'
+                timing = f'{row["ms"]:8.2f} мс'
+                if 'before_ms' in row:
+                    timing += (
+                        f' (без составных индексов {row["before_ms"]:.2f})'
+                    )
+                self.stdout.write(f'  {timing}  {sql}')
+                for detail in row['plan']:
+                    if detail in row['problems']:
+                        self.stdout.write(
+                            self.style.WARNING(f'    ! {detail}')
+                        )
+                    else:
+                        self.stdout.write(f'      {detail}')
+                before_plan = row.get('before_plan', row['plan'])
+                if before_plan != row['plan']:
+                    self.stdout.write('    без составных индексов:')
+                    for detail in before_plan:
+                        self.stdout.write(f'      {detail}')
+        message = f'Запросов с полным сканированием или сортировкой: {total}'
+        style = self.style.WARNING if total else self.style.SUCCESS
+        self.stdout.write(style(message))
@@ -0,0 +1,61 @@
+from concurrent.futures import as_completed
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from posts import thumbnails
+from posts.models import Post
+
+from core.utils import batched
+
+
+class Command(BaseCommand):
+    help = (
+        'Создает миниатюры всех размеров для уже загруженных картинок '
+        'постов в несколько процессов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=settings.THUMBNAIL_WORKERS,
+            help='Количество процессов; 0 - генерировать в текущем',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=200,
+            help='Сколько картинок отправлять в пул за один раз',
+        )
+
+    def handle(self, *args, **options):
+        names = (Post.objects.exclude(image='').order_by()
+                 .values_list('image', flat=True).distinct().iterator())
+        self.done = self.failed = 0
+        if options['workers']:
+            with thumbnails.create_pool(options['workers']) as pool:
+                for chunk in batched(names, options['chunk_size']):
+                    futures = {
+                        pool.submit(thumbnails.generate, name): name
+                        for name in chunk
+                    }
+                    for future in as_completed(futures):
+                        self.report(futures[future], future.exception())
+        else:
+            for name in names:
+                try:
+                    thumbnails.generate(name)
+                except Exception as error:
+                    self.report(name, error)
+                else:
+                    self.report(name, None)
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано картинок: {self.done}, с ошибками: {self.failed}'
+        ))
+
+    def report(self, name, error):
+        if error is None:
+            self.done += 1
+            return
+        self.failed += 1
+        self.stderr.write(f'{name}: {error}')
@@ -0,0 +1,57 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from posts import feed
+from posts.models import FeedPullAuthor, Follow
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересобирает материализованные ленты подписок и список авторов, '
+        'чьи посты подмешиваются в ленты при чтении.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'usernames',
+            nargs='*',
+            help='Пересобрать ленты только этих пользователей',
+        )
+        parser.add_argument(
+            '--depth',
+            type=int,
+            default=settings.FEED_BACKFILL_SIZE,
+            help='Сколько последних постов хранить в каждой ленте',
+        )
+        parser.add_argument(
+            '--skip-pull',
+            action='store_true',
+            help='Не пересчитывать список pull-авторов',
+        )
+
+    def handle(self, *args, **options):
+        if not options['skip_pull']:
+            self.refresh_pull_authors()
+        users = User.objects.all()
+        if options['usernames']:
+            users = users.filter(username__in=options['usernames'])
+        else:
+            users = users.filter(
+                id__in=Follow.objects.values('user_id')
+            )
+        rebuilt = 0
+        for user_id in users.values_list('id', flat=True).iterator():
+            feed.rebuild(user_id, depth=options['depth'])
+            rebuilt += 1
+        self.stdout.write(self.style.SUCCESS(f'Пересобрано лент: {rebuilt}'))
+
+    def refresh_pull_authors(self):
+        pull = feed.pull_author_ids()
+        FeedPullAuthor.objects.exclude(author_id__in=pull).delete()
+        FeedPullAuthor.objects.bulk_create(
+            [FeedPullAuthor(author_id=author_id) for author_id in pull],
+            ignore_conflicts=True,
+        )
+        self.stdout.write(f'Pull-авторов: {len(pull)}')
@@ -0,0 +1,36 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from posts import stats
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Сверяет денормализованные счетчики постов и подписок '
+        'с реальными данными и исправляет расхождения.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Сколько пользователей сверять за один проход',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        user_ids = User.objects.order_by('id').values_list('id', flat=True)
+        checked = fixed = 0
+        last_id = 0
+        while True:
+            batch = list(user_ids.filter(id__gt=last_id)[:batch_size])
+            if not batch:
+                break
+            fixed += stats.reconcile(batch)
+            checked += len(batch)
+            last_id = batch[-1]
+        self.stdout.write(self.style.SUCCESS(
+            f'Проверено пользователей: {checked}, исправлено: {fixed}'
+        ))
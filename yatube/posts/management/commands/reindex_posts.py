@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from posts import search
+
+
+class Command(BaseCommand):
+    help = (
+        'Перестраивает полнотекстовый индекс постов в default и на '
+        'каждом шарде, читая таблицу постов порциями.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=2000,
+            help='Сколько постов индексировать за одну транзакцию',
+        )
+
+    def handle(self, *args, **options):
+        indexed = 0
+        for alias in settings.POST_SHARDS:
+            def progress(count):
+                self.stdout.write(f'{alias}: проиндексировано постов: {count}')
+
+            indexed += search.reindex(
+                options['chunk_size'], progress=progress, using=alias
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Индекс перестроен, постов: {indexed}'
+        ))
@@ -0,0 +1,104 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from posts import sharding
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит авторов с их постами и комментариями между шардами '
+        'POST_SHARDS без остановки сайта: по умолчанию - всех авторов, '
+        'которые лежат не на своем шарде по хешу.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--author',
+            action='append',
+            dest='authors',
+            default=[],
+            help='Перенести только этого автора (можно повторять)',
+        )
+        parser.add_argument(
+            '--to',
+            help='Шард для авторов из --author вместо шарда по хешу',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать, кто и куда переедет',
+        )
+
+    def handle(self, *args, **options):
+        if not sharding.enabled():
+            raise CommandError(
+                'Шардирование выключено: задайте DB_POST_SHARDS.'
+            )
+        target = options['to']
+        if target is not None and target not in settings.POST_SHARDS:
+            raise CommandError(
+                f'Неизвестный шард {target}, есть: '
+                f'{", ".join(settings.POST_SHARDS)}.'
+            )
+        if target is not None and not options['authors']:
+            raise CommandError('--to используется вместе с --author.')
+        for alias in settings.POST_SHARDS:
+            if not sharding.is_migrated(alias):
+                raise CommandError(
+                    f'На {alias} нет таблиц постов: выполните '
+                    f'migrate --database {alias}.'
+                )
+
+        plan = self.plan(options['authors'], target)
+        usernames = dict(
+            User.objects.filter(id__in=[row[0] for row in plan])
+            .values_list('id', 'username')
+        )
+        for author_id, source, destination in plan:
+            line = f'{usernames.get(author_id, author_id)}: {source} -> '
+            line += destination
+            if options['dry_run']:
+                self.stdout.write(line)
+                continue
+            started = time.perf_counter()
+            posts, comments = sharding.move(author_id, destination)
+            elapsed = (time.perf_counter() - started) * 1000
+            self.stdout.write(
+                f'{line}, постов {posts}, комментариев {comments}, '
+                f'{elapsed:.0f} мс'
+            )
+        if options['dry_run']:
+            self.stdout.write(f'К переносу авторов: {len(plan)}')
+            return
+        if plan:
+            time.sleep(settings.POST_SHARD_SWEEP_DELAY)
+        caught_up = 0
+        for author_id, source, _ in plan:
+            caught_up += sum(sharding.sweep(author_id, source))
+        self.stdout.write(self.style.SUCCESS(
+            f'Перенесено авторов: {len(plan)}, '
+            f'догнано строк после переноса: {caught_up}'
+        ))
+
+    @staticmethod
+    def plan(usernames, target):
+        if not usernames:
+            return list(sharding.misplaced())
+        authors = dict(
+            User.objects.filter(username__in=usernames)
+            .values_list('username', 'id')
+        )
+        unknown = sorted(set(usernames) - set(authors))
+        if unknown:
+            raise CommandError(f'Нет пользователей: {", ".join(unknown)}.')
+        plan = []
+        for author_id in authors.values():
+            source = sharding.location(author_id)
+            destination = target or sharding.hashed(author_id)
+            if source != destination:
+                plan.append((author_id, source, destination))
+        return plan
@@ -0,0 +1,98 @@
+from django.core.management.base import BaseCommand, CommandError
+from posts import importer, sharding
+from posts.seeding import Seeder
+
+
+class Command(BaseCommand):
+    help = (
+        'Генерирует синтетических пользователей, группы, посты, комментарии '
+        'и подписки со степенным распределением активности для замеров '
+        'на объемах, близких к боевым.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=50)
+        parser.add_argument('--posts', type=int, default=100000)
+        parser.add_argument('--comments', type=int, default=200000)
+        parser.add_argument('--follows', type=int, default=20000)
+        parser.add_argument(
+            '--images',
+            type=int,
+            default=0,
+            help='Сколько разных картинок создать для постов',
+        )
+        parser.add_argument(
+            '--image-ratio',
+            type=float,
+            default=0.1,
+            help='Доля постов с картинкой, если картинки создаются',
+        )
+        parser.add_argument(
+            '--alpha',
+            type=float,
+            default=1.2,
+            help='Показатель степенного распределения активности',
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=365,
+            help='За сколько последних дней распределять даты',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=10000,
+            help='Сколько записей вставлять за одну транзакцию',
+        )
+        parser.add_argument(
+            '--prefix',
+            default='seed',
+            help='Префикс имен пользователей и адресов групп',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            help='Зерно генератора случайных чисел для повторяемости',
+        )
+
+    def handle(self, *args, **options):
+        if options['alpha'] <= 0:
+            raise CommandError('Показатель --alpha должен быть больше нуля')
+        try:
+            seeder = Seeder(
+                prefix=options['prefix'],
+                alpha=options['alpha'],
+                batch_size=options['batch_size'],
+                seed=options['seed'],
+                progress=self.progress,
+            )
+        except sharding.ShardingEnabled as error:
+            raise CommandError(error)
+        with importer.relaxed_pragmas():
+            user_ids = seeder.users(options['users'])
+            if not user_ids:
+                raise CommandError('Нет пользователей для генерации постов')
+            group_ids = seeder.groups(options['groups'])
+            seeder.follows(options['follows'], user_ids)
+            images = seeder.images(options['images'])
+            first, last = seeder.posts(
+                options['posts'], user_ids, group_ids,
+                images=images,
+                image_ratio=options['image_ratio'],
+                days=options['days'],
+            )
+            seeder.comments(
+                options['comments'], user_ids, first, last,
+                days=options['days'],
+            )
+        seeder.finish(user_ids)
+        self.stdout.write(self.style.SUCCESS(
+            'Данные созданы. Пересоберите ленты командой rebuild_feeds.'
+        ))
+
+    def progress(self, label, done, elapsed):
+        self.stdout.write(
+            f'{label}: {done}, {done / max(elapsed, 1e-6):.0f} в секунду'
+        )
@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand
+from posts import feed_cache, thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит картинки постов, загруженные до появления хранилища '
+        'с адресацией по содержимому, в шардированные каталоги.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только посчитать файлы, которые нужно перенести',
+        )
+
+    def handle(self, *args, **options):
+        storage = Post._meta.get_field('image').storage
+        names = (Post.objects.exclude(image='').order_by()
+                 .values_list('image', flat=True).distinct())
+        legacy = [name for name in names if not storage.is_content_name(name)]
+        if options['dry_run']:
+            self.stdout.write(f'Файлов для переноса: {len(legacy)}')
+            return
+        moved = missing = 0
+        for old_name in legacy:
+            if not storage.exists(old_name):
+                missing += 1
+                self.stderr.write(f'{old_name}: файл не найден')
+                continue
+            posts = Post.objects.filter(image=old_name)
+            references = posts.count()
+            with storage.open(old_name) as content:
+                new_name = storage.save(old_name, content)
+            if references > 1:
+                storage.add_reference(
+                    new_name, storage.size(new_name), references - 1
+                )
+            posts.update(image=new_name)
+            storage.delete(old_name)
+            thumbnails.invalidate(old_name)
+            moved += 1
+        if moved:
+            feed_cache.bump(
+                feed_cache.POSTS, feed_cache.GROUPS, feed_cache.USERS
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Перенесено файлов: {moved}, не найдено: {missing}. '
+            'Миниатюры новых файлов создаст pregenerate_thumbnails.'
+        ))
@@ -0,0 +1,184 @@
+"""Сборка мусора в медиафайлах.
+
+Проход состоит из трех фаз, каждая читает данные порциями и после
+каждой порции сообщает, докуда дошла, чтобы прерванный проход можно
+было продолжить:
+
+* originals - файлы в каталоге картинок постов, на которые не ссылается
+  ни один Post.image;
+* sources - записи sorl-thumbnail о миниатюрах картинок, которых больше
+  нет у постов; вместе с записями удаляются файлы миниатюр;
+* thumbnails - файлы в каталоге миниатюр, о которых sorl не знает.
+
+Файлы моложе grace секунд не трогаются: картинка могла быть только что
+записана транзакцией, которая еще не завершилась. Повторную загрузку
+уже существующей картинки хранилище отмечает, обновляя время изменения
+файла.
+"""
+import os
+import time
+from types import SimpleNamespace
+
+from core.models import StoredFile
+from core.utils import batched
+from posts import sharding, thumbnails
+from posts.models import Post
+from sorl.thumbnail import default
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix, del_prefix
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+PHASES = ('originals', 'sources', 'thumbnails')
+
+
+def walk(root, after=None):
+    """Обходит файлы каталога в порядке сортировки путей.
+
+    Возвращает пути относительно root через '/'. Если передан after,
+    пропускает все пути до него включительно, не заходя в каталоги,
+    которые целиком лежат раньше. В памяти держится только содержимое
+    одного каталога.
+    """
+    after_parts = tuple(after.split('/')) if after else ()
+    yield from _walk(root, (), after_parts)
+
+
+def _walk(path, parts, after_parts):
+    try:
+        entries = sorted(os.scandir(path), key=lambda entry: entry.name)
+    except FileNotFoundError:
+        return
+    for entry in entries:
+        entry_parts = parts + (entry.name,)
+        if entry.is_dir(follow_symlinks=False):
+            if entry_parts < after_parts[:len(entry_parts)]:
+                continue
+            yield from _walk(entry.path, entry_parts, after_parts)
+        elif entry_parts > after_parts:
+            yield '/'.join(entry_parts)
+
+
+def _is_recent(path, grace):
+    try:
+        return os.path.getmtime(path) > time.time() - grace
+    except FileNotFoundError:
+        return True
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _referenced(names):
+    referenced = set()
+    for source in sharding.sources(Post.objects.filter(image__in=names)):
+        referenced.update(source.values_list('image', flat=True))
+    return referenced
+
+
+def collect_originals(after, batch_size, grace, delete):
+    """Ищет картинки постов, на которые не ссылается ни один пост."""
+    field = Post._meta.get_field('image')
+    storage = field.storage
+    directory = field.upload_to.strip('/')
+    paths = walk(storage.path(directory), after)
+    for batch in batched(paths, batch_size):
+        names = [f'{directory}/{path}' for path in batch]
+        referenced = _referenced(names)
+        orphans = [
+            name for name in names
+            if name not in referenced
+            and not _is_recent(storage.path(name), grace)
+        ]
+        if delete and orphans:
+            StoredFile.objects.filter(name__in=orphans).delete()
+            for name in orphans:
+                _remove(storage.path(name))
+                thumbnails.invalidate(name)
+        yield batch[-1], orphans
+
+
+def _sources(keys):
+    """Исходные картинки для ключей списков миниатюр одним запросом.
+
+    Значения читаются прямо из таблицы: проход не заполняет кеши
+    записями, которые сейчас, возможно, будут удалены.
+    """
+    image_keys = {key: add_prefix(del_prefix(key)) for key in keys}
+    values = dict(
+        KVStoreModel.objects.filter(key__in=list(image_keys.values()))
+        .values_list('key', 'value')
+    )
+    sources = {}
+    for key, image_key in image_keys.items():
+        value = values.get(image_key)
+        sources[key] = deserialize_image_file(value) if value else None
+    return sources
+
+
+def collect_sources(after, batch_size, delete):
+    """Ищет записи sorl о миниатюрах картинок, которых нет у постов."""
+    prefix = add_prefix('', identity='thumbnails')
+    while True:
+        keys = KVStoreModel.objects.filter(key__startswith=prefix)
+        if after:
+            keys = keys.filter(key__gt=after)
+        keys = list(
+            keys.order_by('key').values_list('key', flat=True)[:batch_size]
+        )
+        if not keys:
+            return
+        sources = _sources(keys)
+        names = [source.name for source in sources.values() if source]
+        referenced = _referenced(names)
+        orphans = []
+        for key, source in sources.items():
+            if source is not None and source.name in referenced:
+                continue
+            orphans.append(source.name if source else del_prefix(key))
+            if not delete:
+                continue
+            if source is None:
+                source = SimpleNamespace(key=del_prefix(key))
+                default.kvstore.delete_thumbnails(source)
+            else:
+                default.kvstore.delete(source)
+        after = keys[-1]
+        yield after, orphans
+
+
+def collect_thumbnails(after, batch_size, grace, delete):
+    """Ищет файлы миниатюр, которых нет в хранилище ключей sorl."""
+    storage = default.storage
+    directory = thumbnail_settings.THUMBNAIL_PREFIX.strip('/')
+    paths = walk(storage.path(directory), after)
+    for batch in batched(paths, batch_size):
+        keys = {}
+        for path in batch:
+            name = f'{directory}/{path}'
+            keys[add_prefix(ImageFile(name, storage).key)] = name
+        known = set(
+            KVStoreModel.objects.filter(key__in=list(keys))
+            .values_list('key', flat=True)
+        )
+        orphans = [
+            name for key, name in keys.items()
+            if key not in known
+            and not _is_recent(storage.path(name), grace)
+        ]
+        if delete:
+            for name in orphans:
+                _remove(storage.path(name))
+        yield batch[-1], orphans
+
+
+def collect(phase, after, batch_size, grace, delete):
+    if phase == 'originals':
+        return collect_originals(after, batch_size, grace, delete)
+    if phase == 'sources':
+        return collect_sources(after, batch_size, delete)
+    return collect_thumbnails(after, batch_size, grace, delete)
@@ -0,0 +1,57 @@
+# Generated by Django 2.2.16 on 2026-10-18 02:10
+
+from django.db import migrations, models
+import django.db.models.deletion
+import posts.fields
+from posts import search
+
+
+def create_triggers(apps, schema_editor):
+    """Триггеры синхронизации индекса.
+
+    Их же вызывают следующие миграции, которые пересоздают posts_post:
+    SQLite удаляет триггеры вместе со старой таблицей.
+    """
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in search.TRIGGERS:
+        schema_editor.execute(statement)
+
+
+def create_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(search.CREATE_INDEX)
+    create_triggers(apps, schema_editor)
+    schema_editor.execute(search.REBUILD_INDEX)
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in search.DROP_INDEX:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_user_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostSearchIndex',
+            fields=[
+                ('post', models.OneToOneField(db_column='rowid', on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_index', serialize=False, to='posts.Post', verbose_name='Пост')),
+                ('text', posts.fields.SearchTextField(verbose_name='Текст поста')),
+            ],
+            options={
+                'verbose_name': 'Поисковый индекс поста',
+                'verbose_name_plural': 'Поисковый индекс постов',
+                'db_table': 'posts_post_fts',
+                'managed': False,
+            },
+        ),
+        migrations.RunPython(create_index, drop_index),
+    ]
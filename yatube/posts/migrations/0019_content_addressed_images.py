@@ -0,0 +1,27 @@
+# Generated by Django 2.2.16 on 2026-10-18 02:27
+
+from importlib import import_module
+
+import core.storage
+from django.db import migrations, models
+
+# AlterField в SQLite пересоздает таблицу posts_post, и вместе со старой
+# таблицей удаляются триггеры полнотекстового индекса из 0018.
+post_search = import_module('posts.migrations.0018_post_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0018_post_search'),
+    ]
+
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, post_search.create_triggers),
+        migrations.AlterField(
+            model_name='post',
+            name='image',
+            field=models.ImageField(blank=True, help_text='Заглавная картинка к посту', storage=core.storage.ContentAddressedStorage(), upload_to='posts/', verbose_name='Картинка'),
+        ),
+        migrations.RunPython(post_search.create_triggers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 2.2.16 on 2026-10-18 03:15
+
+from importlib import import_module
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+# AlterField в SQLite пересоздает таблицу posts_post, и вместе со старой
+# таблицей удаляются триггеры полнотекстового индекса из 0018.
+post_search = import_module('posts.migrations.0018_post_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('posts', '0021_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuthorShard',
+            fields=[
+                ('author', models.OneToOneField(help_text='Автор, посты и комментарии к постам которого на шарде', on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='shard', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Автор постов')),
+                ('database', models.CharField(help_text='Псевдоним базы из POST_SHARDS', max_length=100, verbose_name='База данных')),
+            ],
+            options={
+                'verbose_name': 'Шард автора',
+                'verbose_name_plural': 'Шарды авторов',
+            },
+        ),
+        migrations.CreateModel(
+            name='ShardSequence',
+            fields=[
+                ('name', models.CharField(help_text='Модель, для которой выдаются идентификаторы', max_length=100, primary_key=True, serialize=False, verbose_name='Модель')),
+                ('last_id', models.BigIntegerField(default=0, verbose_name='Последний выданный идентификатор')),
+            ],
+            options={
+                'verbose_name': 'Последовательность идентификаторов',
+                'verbose_name_plural': 'Последовательности идентификаторов',
+            },
+        ),
+        migrations.AlterField(
+            model_name='comment',
+            name='author',
+            field=models.ForeignKey(db_constraint=False, help_text='Автор сохраняется автоматически', on_delete=django.db.models.deletion.CASCADE, related_name='comments', to=settings.AUTH_USER_MODEL, verbose_name='Автор комментария'),
+        ),
+        migrations.AlterField(
+            model_name='feedentry',
+            name='post',
+            field=models.ForeignKey(db_constraint=False, help_text='Пост из ленты подписок', on_delete=django.db.models.deletion.DO_NOTHING, related_name='feed_entries', to='posts.Post', verbose_name='Пост'),
+        ),
+        migrations.RunPython(migrations.RunPython.noop, post_search.create_triggers),
+        migrations.AlterField(
+            model_name='post',
+            name='author',
+            field=models.ForeignKey(db_constraint=False, help_text='Автор сохраняется автоматически', on_delete=django.db.models.deletion.CASCADE, related_name='posts', to=settings.AUTH_USER_MODEL, verbose_name='Автор поста'),
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='group',
+            field=models.ForeignKey(blank=True, db_constraint=False, help_text='Группа, к которой будет относиться пост', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='posts', to='posts.Group', verbose_name='Группа'),
+        ),
+        migrations.RunPython(post_search.create_triggers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 2.2.16 on 2026-10-18 04:10
+
+from importlib import import_module
+
+from django.db import migrations
+from posts import search
+
+post_search = import_module('posts.migrations.0018_post_search')
+
+
+def create_missing_index(apps, schema_editor):
+    """Индекс на шардах: RunPython без подсказок роутер туда не пускает.
+
+    В default индекс уже создан миграцией 0018, там только проверяются
+    триггеры.
+    """
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        tables = connection.introspection.table_names(cursor)
+    if search.INDEX_TABLE in tables:
+        post_search.create_triggers(apps, schema_editor)
+    else:
+        post_search.create_index(apps, schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0022_sharding'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            create_missing_index,
+            migrations.RunPython.noop,
+            hints={'model_name': 'post'},
+        ),
+    ]
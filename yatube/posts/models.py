@@ -1,9 +1,21 @@
 from django.contrib.auth import get_user_model
 from django.db import models
+from core.storage import ContentAddressedStorage
+from posts.fields import SearchTextField
 
 User = get_user_model()
 
 
+class ShardedQuerySet(models.QuerySet):
+    def create(self, **kwargs):
+        # Без явного using базу выбирает роутер по самому объекту: у
+        # постов и комментариев она зависит от автора.
+        obj = self.model(**kwargs)
+        self._for_write = True
+        obj.save(force_insert=True, using=self._db)
+        return obj
+
+
 class Group(models.Model):
     title = models.CharField(
         verbose_name='Группа',
@@ -43,6 +55,7 @@ class Post(models.Model):
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
+        db_constraint=False,
         related_name='posts',
         verbose_name='Автор поста',
         help_text='Автор сохраняется автоматически'
@@ -50,6 +63,7 @@ class Post(models.Model):
     group = models.ForeignKey(
         Group,
         on_delete=models.SET_NULL,
+        db_constraint=False,
         related_name='posts',
         verbose_name='Группа',
         blank=True,
@@ -59,19 +73,56 @@ class Post(models.Model):
     image = models.ImageField(
         verbose_name='Картинка',
         upload_to='posts/',
+        storage=ContentAddressedStorage(),
         blank=True,
         help_text='Заглавная картинка к посту'
     )
 
+    objects = ShardedQuerySet.as_manager()
+
     class Meta:
         ordering = ('-pub_date',)
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        indexes = [
+            models.Index(fields=['image'], name='post_image_idx'),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_pub_date_idx'
+            ),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_pub_date_idx'
+            ),
+        ]
 
     def __str__(self) -> str:
         return self.text[:30]
 
 
+class PostSearchIndex(models.Model):
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.DO_NOTHING,
+        primary_key=True,
+        db_column='rowid',
+        related_name='search_index',
+        verbose_name='Пост'
+    )
+    text = SearchTextField(
+        verbose_name='Текст поста'
+    )
+
+    class Meta:
+        managed = False
+        db_table = 'posts_post_fts'
+        verbose_name = 'Поисковый индекс поста'
+        verbose_name_plural = 'Поисковый индекс постов'
+
+    def __str__(self) -> str:
+        return f'Индекс поста {self.post_id}'
+
+
 class Comment(models.Model):
     post = models.ForeignKey(
         Post,
@@ -83,6 +134,7 @@ class Comment(models.Model):
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
+        db_constraint=False,
         related_name='comments',
         verbose_name='Автор комментария',
         help_text='Автор сохраняется автоматически'
@@ -98,8 +150,16 @@ class Comment(models.Model):
         help_text='Дата сохраняется автоматически'
     )
 
+    objects = ShardedQuerySet.as_manager()
+
     class Meta:
         ordering = ('created',)
+        indexes = [
+            models.Index(
+                fields=['post', 'created'],
+                name='comment_post_created_idx'
+            ),
+        ]
         verbose_name = 'Комментарий поста'
         verbose_name_plural = 'Комментарии постов'
 
@@ -134,9 +194,158 @@ class Follow(models.Model):
                 name='prevent_self_subscription'
             )
         )
+        indexes = [
+            models.Index(
+                fields=['author', 'user'],
+                name='follow_author_user_idx'
+            ),
+        ]
         verbose_name = 'Подписка на автора'
         verbose_name_plural = 'Подписки на авторов'
 
     def __str__(self) -> str:
         return (f'Пользователь {self.user.username} подписан'
                 f'на автора {self.author.username}')
+
+
+class FeedEntry(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed',
+        verbose_name='Подписчик',
+        help_text='Пользователь, в ленту которого попал пост'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='feed_entries',
+        verbose_name='Пост',
+        help_text='Пост из ленты подписок'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор поста',
+        help_text='Автор поста, нужен для очистки ленты при отписке'
+    )
+    pub_date = models.DateTimeField(
+        verbose_name='Дата создания поста',
+        help_text='Копия даты публикации поста для чтения ленты по индексу'
+    )
+
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'post'),
+                name='unique_feed_entry'
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=('user', '-pub_date', '-post'),
+                name='feed_user_pub_date_idx'
+            ),
+            models.Index(
+                fields=('user', 'author'),
+                name='feed_user_author_idx'
+            ),
+        )
+        verbose_name = 'Запись ленты подписок'
+        verbose_name_plural = 'Записи лент подписок'
+
+    def __str__(self) -> str:
+        return f'Пост {self.post_id} в ленте пользователя {self.user_id}'
+
+
+class FeedPullAuthor(models.Model):
+    author = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='feed_pull',
+        verbose_name='Автор постов',
+        help_text='Посты автора подмешиваются в ленты при чтении'
+    )
+
+    class Meta:
+        verbose_name = 'Автор с чтением ленты по запросу'
+        verbose_name_plural = 'Авторы с чтением ленты по запросу'
+
+    def __str__(self) -> str:
+        return f'Автор {self.author_id}'
+
+
+class UserStats(models.Model):
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Пользователь',
+        help_text='Пользователь, для которого ведется статистика'
+    )
+    posts_count = models.PositiveIntegerField(
+        verbose_name='Количество постов',
+        default=0
+    )
+    followers_count = models.PositiveIntegerField(
+        verbose_name='Количество подписчиков',
+        default=0
+    )
+    following_count = models.PositiveIntegerField(
+        verbose_name='Количество подписок',
+        default=0
+    )
+
+    class Meta:
+        verbose_name = 'Статистика пользователя'
+        verbose_name_plural = 'Статистика пользователей'
+
+    def __str__(self) -> str:
+        return f'Статистика пользователя {self.user_id}'
+
+
+class AuthorShard(models.Model):
+    author = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='shard',
+        verbose_name='Автор постов',
+        help_text='Автор, посты и комментарии к постам которого на шарде'
+    )
+    database = models.CharField(
+        verbose_name='База данных',
+        max_length=100,
+        help_text='Псевдоним базы из POST_SHARDS'
+    )
+
+    class Meta:
+        verbose_name = 'Шард автора'
+        verbose_name_plural = 'Шарды авторов'
+
+    def __str__(self) -> str:
+        return f'Автор {self.author_id} на {self.database}'
+
+
+class ShardSequence(models.Model):
+    name = models.CharField(
+        verbose_name='Модель',
+        max_length=100,
+        primary_key=True,
+        help_text='Модель, для которой выдаются идентификаторы'
+    )
+    last_id = models.BigIntegerField(
+        verbose_name='Последний выданный идентификатор',
+        default=0
+    )
+
+    class Meta:
+        verbose_name = 'Последовательность идентификаторов'
+        verbose_name_plural = 'Последовательности идентификаторов'
+
+    def __str__(self) -> str:
+        return f'{self.name}: {self.last_id}'
@@ -0,0 +1,243 @@
+import base64
+import binascii
+import heapq
+import json
+from datetime import datetime
+
+from django.db import models
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def encode_cursor(direction, values=None):
+    """Упаковывает направление и значения ключа в непрозрачный токен."""
+    if values is not None:
+        values = [
+            {'dt': value.isoformat()} if isinstance(value, datetime)
+            else value
+            for value in values
+        ]
+    payload = json.dumps([direction, values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Распаковывает токен, созданный функцией encode_cursor."""
+    try:
+        padding = '=' * (-len(cursor) % 4)
+        payload = base64.urlsafe_b64decode(cursor + padding)
+        direction, values = json.loads(payload.decode())
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError):
+        raise InvalidCursor(cursor)
+    if direction not in (NEXT, PREVIOUS):
+        raise InvalidCursor(cursor)
+    if values is None:
+        return direction, None
+    if not isinstance(values, list):
+        raise InvalidCursor(cursor)
+    decoded = []
+    for value in values:
+        if isinstance(value, dict):
+            value = parse_datetime(str(value.get('dt')))
+            if value is None:
+                raise InvalidCursor(cursor)
+        decoded.append(value)
+    return direction, decoded
+
+
+def _value_types(field):
+    """Типы значений, которые курсор может передать для поля."""
+    if isinstance(field, models.ForeignKey):
+        field = field.target_field
+    if isinstance(field, models.DateTimeField):
+        return (datetime,)
+    if isinstance(field, (models.AutoField, models.IntegerField)):
+        return (int,)
+    if isinstance(field, models.FloatField):
+        return (int, float)
+    return (str,)
+
+
+class _SortKey:
+    """Ключ сортировки с направлением по каждому полю для heapq.merge."""
+
+    __slots__ = ('values', 'descending')
+
+    def __init__(self, values, descending):
+        self.values = values
+        self.descending = descending
+
+    def __lt__(self, other):
+        for value, other_value, descending in zip(
+                self.values, other.values, self.descending):
+            if value != other_value:
+                if descending:
+                    return value > other_value
+                return value < other_value
+        return False
+
+
+class CursorPage:
+    def __init__(self, object_list, paginator, cursor,
+                 next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.cursor = cursor or ''
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return f'<CursorPage {self.cursor or "first"}>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """Keyset-пагинатор без COUNT(*) и OFFSET.
+
+    Страница выбирается условием по ключу сортировки относительно
+    последней записи предыдущей страницы, поэтому стоимость любой
+    страницы равна стоимости первой. Вместо одного queryset можно
+    передать список: каждый источник читается отдельно, а результаты
+    сливаются по ключу сортировки с удалением дубликатов.
+    Функция transform применяется к записям страницы после того,
+    как по ним рассчитаны курсоры.
+    """
+
+    last_cursor = encode_cursor(PREVIOUS)
+
+    def __init__(self, object_list, per_page, ordering=('-pub_date', '-id'),
+                 transform=None):
+        if isinstance(object_list, (list, tuple)):
+            self.sources = tuple(object_list)
+        else:
+            self.sources = (object_list,)
+        self.per_page = int(per_page)
+        self.ordering = tuple(ordering)
+        self.fields = tuple(field.lstrip('-') for field in self.ordering)
+        self.transform = transform
+
+    def key(self, obj):
+        return tuple(getattr(obj, field) for field in self.fields)
+
+    def _field(self, name):
+        query = self.sources[0].query
+        if name in query.annotations:
+            return query.annotations[name].output_field
+        return query.model._meta.get_field(name)
+
+    def is_valid(self, values):
+        """Подходят ли значения курсора к полям ключа сортировки."""
+        if len(values) != len(self.fields):
+            return False
+        return all(
+            isinstance(value, _value_types(self._field(name)))
+            and not isinstance(value, bool)
+            for name, value in zip(self.fields, values)
+        )
+
+    def _keyset_filter(self, values, direction):
+        condition = Q()
+        for position, ordering in enumerate(self.ordering):
+            descending = ordering.startswith('-')
+            if direction == PREVIOUS:
+                descending = not descending
+            lookup = 'lt' if descending else 'gt'
+            field = self.fields[position]
+            step = Q(**{f'{field}__{lookup}': values[position]})
+            for prefix, value in zip(self.fields[:position], values):
+                step &= Q(**{prefix: value})
+            condition |= step
+        return condition
+
+    def _reversed_ordering(self):
+        return tuple(
+            field[1:] if field.startswith('-') else f'-{field}'
+            for field in self.ordering
+        )
+
+    def fetch(self, queryset, direction, values):
+        """Возвращает до per_page + 1 объектов в направлении direction."""
+        ordering = self.ordering
+        if direction == PREVIOUS:
+            ordering = self._reversed_ordering()
+        queryset = queryset.order_by(*ordering)
+        if values is not None:
+            queryset = queryset.filter(self._keyset_filter(values, direction))
+        return list(queryset[:self.per_page + 1])
+
+    def merge(self, batches, direction):
+        """Сливает упорядоченные выборки источников в одну (k-way merge)."""
+        if len(batches) == 1:
+            return batches[0]
+        ordering = self.ordering
+        if direction == PREVIOUS:
+            ordering = self._reversed_ordering()
+        descending = tuple(field.startswith('-') for field in ordering)
+        rows = heapq.merge(
+            *batches, key=lambda row: _SortKey(self.key(row), descending)
+        )
+        merged = []
+        for row in rows:
+            if merged and self.key(merged[-1]) == self.key(row):
+                continue
+            merged.append(row)
+            if len(merged) > self.per_page:
+                break
+        return merged
+
+    def page(self, cursor=None):
+        direction, values = NEXT, None
+        if cursor:
+            direction, values = decode_cursor(cursor)
+            if values is not None and not self.is_valid(values):
+                raise InvalidCursor(cursor)
+        rows = self.merge(
+            [self.fetch(source, direction, values) for source in self.sources],
+            direction,
+        )
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if direction == PREVIOUS:
+            rows.reverse()
+            has_next, has_previous = values is not None, has_more
+        else:
+            has_next, has_previous = has_more, values is not None
+        next_cursor = previous_cursor = None
+        if rows and has_next:
+            next_cursor = encode_cursor(NEXT, self.key(rows[-1]))
+        if rows and has_previous:
+            previous_cursor = encode_cursor(PREVIOUS, self.key(rows[0]))
+        if self.transform is not None:
+            rows = self.transform(rows)
+        return CursorPage(rows, self, cursor, next_cursor, previous_cursor)
+
+    def get_page(self, cursor=None):
+        """Как page(), но при некорректном токене отдает первую страницу."""
+        try:
+            return self.page(cursor)
+        except InvalidCursor:
+            return self.page()
@@ -0,0 +1,166 @@
+import re
+
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import FloatField
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+from posts import sharding
+from posts.models import Post, PostSearchIndex
+from posts.paginator import CursorPaginator
+
+INDEX_TABLE = PostSearchIndex._meta.db_table
+
+POST_TABLE = Post._meta.db_table
+
+# Тот же SQL выполняют миграции 0018 и следующие, пересоздающие
+# posts_post: SQLite удаляет триггеры вместе со старой таблицей. Индекс
+# есть и на каждом шарде (0023), поэтому RunPython таких миграций нужна
+# подсказка hints={'model_name': 'post'}, иначе роутер пропустит шарды.
+CREATE_INDEX = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {INDEX_TABLE} USING fts5("
+    f"text, content='{POST_TABLE}', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')"
+)
+
+TRIGGERS = (
+    f"CREATE TRIGGER IF NOT EXISTS {INDEX_TABLE}_ai "
+    f"AFTER INSERT ON {POST_TABLE} BEGIN "
+    f"INSERT INTO {INDEX_TABLE}(rowid, text) VALUES (new.id, new.text); "
+    "END",
+    f"CREATE TRIGGER IF NOT EXISTS {INDEX_TABLE}_ad "
+    f"AFTER DELETE ON {POST_TABLE} BEGIN "
+    f"INSERT INTO {INDEX_TABLE}({INDEX_TABLE}, rowid, text) "
+    "VALUES ('delete', old.id, old.text); "
+    "END",
+    f"CREATE TRIGGER IF NOT EXISTS {INDEX_TABLE}_au "
+    f"AFTER UPDATE OF text ON {POST_TABLE} BEGIN "
+    f"INSERT INTO {INDEX_TABLE}({INDEX_TABLE}, rowid, text) "
+    "VALUES ('delete', old.id, old.text); "
+    f"INSERT INTO {INDEX_TABLE}(rowid, text) VALUES (new.id, new.text); "
+    "END",
+)
+
+REBUILD_INDEX = f"INSERT INTO {INDEX_TABLE}({INDEX_TABLE}) VALUES ('rebuild')"
+
+DROP_INDEX = (
+    f"DROP TRIGGER IF EXISTS {INDEX_TABLE}_ai",
+    f"DROP TRIGGER IF EXISTS {INDEX_TABLE}_ad",
+    f"DROP TRIGGER IF EXISTS {INDEX_TABLE}_au",
+    f"DROP TABLE IF EXISTS {INDEX_TABLE}",
+)
+
+MAX_QUERY_TERMS = 10
+
+SNIPPET_TOKENS = 24
+
+HIGHLIGHT_START = '\x02'
+
+HIGHLIGHT_END = '\x03'
+
+
+def install_index(using=DEFAULT_DB_ALIAS):
+    """Создает FTS5-индекс и триггеры синхронизации, если их нет.
+
+    Пересоздание таблицы posts_post в миграциях SQLite удаляет триггеры,
+    поэтому команда переиндексации вызывает эту функцию повторно.
+    """
+    with connections[using].cursor() as cursor:
+        for statement in (CREATE_INDEX, *TRIGGERS):
+            cursor.execute(statement)
+
+
+def build_query(text):
+    """Превращает пользовательский ввод в безопасный запрос FTS5.
+
+    Каждое слово ищется как префикс, все слова должны встретиться в посте.
+    """
+    terms = re.findall(r'\w+', text.lower())[:MAX_QUERY_TERMS]
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def search_posts(text):
+    """Возвращает посты, найденные по тексту, с рангом и сниппетом."""
+    query = build_query(text)
+    snippet = (
+        f"snippet({INDEX_TABLE}, 0, '{HIGHLIGHT_START}', "
+        f"'{HIGHLIGHT_END}', '…', {SNIPPET_TOKENS})"
+    )
+    posts = (Post.objects.select_related('group', 'author')
+             .annotate(rank=RawSQL(f'{INDEX_TABLE}.rank', (),
+                                   output_field=FloatField()),
+                       snippet=RawSQL(snippet, ())))
+    if not query:
+        return posts.none()
+    return posts.filter(search_index__text__match=query)
+
+
+def highlight(snippet):
+    """Экранирует сниппет и заменяет маркеры совпадений на <mark>."""
+    return mark_safe(
+        escape(snippet)
+        .replace(HIGHLIGHT_START, '<mark>')
+        .replace(HIGHLIGHT_END, '</mark>')
+    )
+
+
+def _highlight_page(posts):
+    for post in posts:
+        post.snippet_html = highlight(post.snippet)
+    return posts
+
+
+def search_paginator(text, per_page):
+    """Поиск по всем шардам: у каждого свой индекс.
+
+    Ранги bm25 считаются по статистике своего шарда, поэтому при слиянии
+    сравниваются приблизительно.
+    """
+    return CursorPaginator(
+        sharding.sources(search_posts(text)),
+        per_page,
+        ordering=('rank', 'id'),
+        transform=_highlight_page,
+    )
+
+
+def matching_ids(text):
+    """Подзапрос с id постов, подходящих под текст, для фильтрации."""
+    query = build_query(text)
+    if not query:
+        return PostSearchIndex.objects.none().values('post_id')
+    return PostSearchIndex.objects.filter(text__match=query).values('post_id')
+
+
+def reindex(chunk_size, progress=None, using=DEFAULT_DB_ALIAS):
+    """Перестраивает индекс базы using, читая посты порциями по id."""
+    connection = connections[using]
+    install_index(using)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {INDEX_TABLE}({INDEX_TABLE}) VALUES ('delete-all')"
+        )
+    indexed = 0
+    last_id = 0
+    while True:
+        rows = list(
+            Post.objects.using(using).filter(id__gt=last_id).order_by('id')
+            .values_list('id', 'text')[:chunk_size]
+        )
+        if not rows:
+            break
+        with transaction.atomic(using=using), \
+                connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {INDEX_TABLE}(rowid, text) VALUES (%s, %s)',
+                rows,
+            )
+        indexed += len(rows)
+        last_id = rows[-1][0]
+        if progress is not None:
+            progress(indexed)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {INDEX_TABLE}({INDEX_TABLE}) VALUES ('optimize')"
+        )
+    return indexed
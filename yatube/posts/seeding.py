@@ -0,0 +1,269 @@
+"""Генерация синтетических данных для нагрузочных замеров.
+
+Активность распределена по степенному закону: небольшая доля авторов
+пишет большую часть постов и собирает большую часть подписчиков, а
+комментарии достаются в основном немногим популярным постам. Номер
+элемента выбирается обращением функции распределения ограниченного
+закона Парето, поэтому выборка не требует памяти даже для 10 млн постов.
+
+Записи вставляются пачками в обход save(): посты и комментарии - одним
+executemany, остальное через bulk_create. Сигналы при этом не
+срабатывают: счетчики пользователей пересчитываются в конце, а ленты
+подписок нужно пересобрать командой rebuild_feeds. При шардировании
+генерация не запускается.
+"""
+import random
+import time
+from datetime import timedelta
+from functools import partial
+from io import BytesIO
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+from faker import Faker
+from PIL import Image
+from posts import feed_cache, sharding, stats
+from posts.models import Comment, Follow, Group, Post
+
+from core.utils import batched
+
+User = get_user_model()
+
+# Простое число больше любого числа постов: умножение на него по модулю n
+# переставляет номера, и популярными оказываются не только старые посты.
+SHUFFLE_PRIME = 2_147_483_647
+
+TEXT_POOL_SIZE = 500
+
+RECONCILE_CHUNK_SIZE = 500
+
+
+def power_law_index(n, alpha, rng):
+    """Возвращает номер от 0 до n - 1, вероятность ~ (номер + 1) ** -alpha."""
+    u = rng.random()
+    if alpha == 1:
+        rank = (n + 1) ** u
+    else:
+        power = 1 - alpha
+        rank = (((n + 1) ** power - 1) * u + 1) ** (1 / power)
+    return min(int(rank), n) - 1
+
+
+class Seeder:
+    def __init__(self, prefix='seed', alpha=1.2, batch_size=10000,
+                 seed=None, progress=None):
+        sharding.require_disabled('Генерация данных')
+        self.prefix = prefix
+        self.alpha = alpha
+        self.batch_size = batch_size
+        self.rng = random.Random(seed)
+        self.progress = progress or (lambda label, done, elapsed: None)
+        fake = Faker('ru_RU')
+        fake.seed_instance(seed)
+        self.texts = [
+            fake.sentence(nb_words=12) for _ in range(TEXT_POOL_SIZE)
+        ]
+
+    def text(self, sentences=3):
+        return ' '.join(
+            self.rng.choice(self.texts)
+            for _ in range(self.rng.randint(1, sentences))
+        )
+
+    def _insert(self, label, flush, items):
+        """Вставляет элементы из генератора порциями через flush(batch)."""
+        started = time.monotonic()
+        done = 0
+        for batch in batched(items, self.batch_size):
+            done += self._flush(flush, batch)
+            self.progress(label, done, time.monotonic() - started)
+        return done
+
+    @staticmethod
+    def _flush(flush, batch):
+        with transaction.atomic():
+            flush(batch)
+        return len(batch)
+
+    @staticmethod
+    def _create(model):
+        return partial(model.objects.bulk_create, ignore_conflicts=True)
+
+    @staticmethod
+    def _execute(model, fields):
+        """Готовит вставку кортежей одним executemany без сборки моделей.
+
+        Для десятков миллионов строк основное время bulk_create уходит
+        на создание объектов и компиляцию SQL, а не на саму базу.
+        """
+        quote = connection.ops.quote_name
+        columns = ', '.join(
+            quote(model._meta.get_field(field).column) for field in fields
+        )
+        placeholders = ', '.join(['%s'] * len(fields))
+        sql = (
+            f'INSERT INTO {quote(model._meta.db_table)} ({columns}) '
+            f'VALUES ({placeholders})'
+        )
+
+        def flush(rows):
+            with connection.cursor() as cursor:
+                cursor.executemany(sql, rows)
+
+        return flush
+
+    def users(self, count):
+        password = make_password(None)
+        start = User.objects.filter(
+            username__startswith=f'{self.prefix}_user_'
+        ).count()
+        self._insert('users', self._create(User), (
+            User(username=f'{self.prefix}_user_{start + i}',
+                 password=password)
+            for i in range(count)
+        ))
+        ids = list(
+            User.objects.filter(username__startswith=f'{self.prefix}_user_')
+            .values_list('id', flat=True)
+        )
+        self.rng.shuffle(ids)
+        return ids
+
+    def groups(self, count):
+        start = Group.objects.filter(
+            slug__startswith=f'{self.prefix}-group-'
+        ).count()
+        self._insert('groups', self._create(Group), (
+            Group(title=f'Группа {start + i}',
+                  slug=f'{self.prefix}-group-{start + i}',
+                  description=self.text())
+            for i in range(count)
+        ))
+        ids = list(
+            Group.objects.filter(slug__startswith=f'{self.prefix}-group-')
+            .values_list('id', flat=True)
+        )
+        self.rng.shuffle(ids)
+        return ids
+
+    def follows(self, count, user_ids):
+        """Подписывает случайных пользователей на популярных авторов."""
+        if len(user_ids) < 2:
+            return 0
+
+        def generate():
+            seen = set()
+            for _ in range(count):
+                user_id = self.rng.choice(user_ids)
+                author_id = user_ids[
+                    power_law_index(len(user_ids), self.alpha, self.rng)
+                ]
+                if user_id == author_id or (user_id, author_id) in seen:
+                    continue
+                seen.add((user_id, author_id))
+                yield Follow(user_id=user_id, author_id=author_id)
+
+        return self._insert('follows', self._create(Follow), generate())
+
+    def images(self, count):
+        """Сохраняет count разных картинок и возвращает их имена."""
+        storage = Post._meta.get_field('image').storage
+        upload_to = Post._meta.get_field('image').upload_to
+        names = []
+        for i in range(count):
+            color = tuple(self.rng.randrange(256) for _ in range(3))
+            buffer = BytesIO()
+            Image.new('RGB', (960, 540), color).save(buffer, 'JPEG')
+            names.append(storage.save(
+                f'{upload_to}{self.prefix}_{i}.jpg',
+                ContentFile(buffer.getvalue()),
+            ))
+        return names
+
+    def posts(self, count, user_ids, group_ids, images=(), image_ratio=0,
+              group_ratio=0.7, days=365):
+        """Создает посты и возвращает диапазон их id."""
+        now = timezone.now()
+        seconds = days * 24 * 60 * 60
+        image_uses = dict.fromkeys(images, 0)
+        adapt = connection.ops.adapt_datetimefield_value
+
+        def generate():
+            for _ in range(count):
+                author_id = user_ids[
+                    power_law_index(len(user_ids), self.alpha, self.rng)
+                ]
+                group_id = None
+                if group_ids and self.rng.random() < group_ratio:
+                    group_id = group_ids[
+                        power_law_index(len(group_ids), self.alpha, self.rng)
+                    ]
+                image = ''
+                if images and self.rng.random() < image_ratio:
+                    image = self.rng.choice(images)
+                    image_uses[image] += 1
+                pub_date = now - timedelta(seconds=self.rng.randrange(seconds))
+                yield (
+                    self.text(),
+                    author_id,
+                    group_id,
+                    adapt(pub_date),
+                    image,
+                )
+
+        before = (Post.objects.order_by('-id')
+                  .values_list('id', flat=True).first() or 0)
+        self._insert('posts', self._execute(
+            Post, ('text', 'author', 'group', 'pub_date', 'image')
+        ), generate())
+        self._settle_images(image_uses)
+        created = Post.objects.filter(id__gt=before).aggregate(
+            first=Min('id'), last=Max('id')
+        )
+        if created['first'] is None:
+            return before + 1, before
+        return created['first'], created['last']
+
+    @staticmethod
+    def _settle_images(image_uses):
+        # images() уже поставила на каждую картинку одну ссылку.
+        storage = Post._meta.get_field('image').storage
+        for name, uses in image_uses.items():
+            if uses:
+                storage.add_reference(name, storage.size(name), uses - 1)
+            else:
+                storage.delete(name)
+
+    def comments(self, count, user_ids, first_post, last_post, days=365):
+        """Комментирует в основном небольшую долю популярных постов."""
+        total = last_post - first_post + 1
+        if total <= 0 or not user_ids:
+            return 0
+        now = timezone.now()
+        seconds = days * 24 * 60 * 60
+        adapt = connection.ops.adapt_datetimefield_value
+
+        def generate():
+            for _ in range(count):
+                rank = power_law_index(total, self.alpha, self.rng)
+                created = now - timedelta(seconds=self.rng.randrange(seconds))
+                yield (
+                    first_post + rank * SHUFFLE_PRIME % total,
+                    self.rng.choice(user_ids),
+                    self.text(sentences=2),
+                    adapt(created),
+                )
+
+        return self._insert('comments', self._execute(
+            Comment, ('post', 'author', 'text', 'created')
+        ), generate())
+
+    def finish(self, user_ids):
+        """Пересчитывает счетчики и сбрасывает кеш фрагментов."""
+        for start in range(0, len(user_ids), RECONCILE_CHUNK_SIZE):
+            stats.reconcile(user_ids[start:start + RECONCILE_CHUNK_SIZE])
+        feed_cache.bump(feed_cache.POSTS, feed_cache.GROUPS, feed_cache.USERS)
@@ -0,0 +1,421 @@
+"""Шардирование постов и комментариев по авторам.
+
+Включается настройкой POST_SHARDS (DB_POST_SHARDS=N): кроме default
+посты и комментарии хранятся в базах shard1..shardN-1. Все посты автора
+и комментарии к ним лежат на одной базе, какой именно - записано в
+AuthorShard в default. Новый автор получает шард по хешу author_id
+(rendezvous hashing: при добавлении шарда переезжает только часть
+авторов), а автор, писавший до включения шардирования, остается в
+default, пока его не перенесет команда reshard.
+
+На шардах есть только таблицы постов и комментариев, а default
+подключается к каждому шарду через ATTACH, поэтому JOIN с авторами,
+группами и лентой работают без изменений в запросах. Внешние ключи
+между файлами SQLite проверить не может, поэтому у связей постов и
+комментариев с пользователями и группами и ленты с постами нет
+ограничений в базе - в любой конфигурации, ведь схема у всех баз общая.
+Каскад при удалении через ORM повторяют сигналы; строки, которые он
+пропустил (удаление мимо ORM, очистка шардов в on_commit, прерванная
+падением процесса), удаляет команда clean_orphans.
+
+Идентификаторы постов и комментариев общие для всех шардов: их выдает
+ShardSequence в default порциями по POST_SHARD_ID_BLOCK. Массовая
+загрузка (seed_scale, import_posts) при шардировании не запускается:
+она пишет в default мимо ShardSequence и размещения авторов. Свой
+полнотекстовый индекс есть у каждого шарда, и поиск опрашивает все.
+"""
+import os
+import threading
+import zlib
+from urllib.parse import quote
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connections, transaction
+from django.db.models import F, Max
+from django.http import Http404
+from django.shortcuts import get_object_or_404 as get_single_object_or_404
+from posts.models import (AuthorShard, Comment, FeedEntry, Group, Post,
+                          ShardSequence)
+
+User = get_user_model()
+
+DEFAULT = 'default'
+SHARDED_MODELS = (Post, Comment)
+SHARED_SCHEMA = 'shared'
+
+AUTHOR_POSTS = 'author_id = %s'
+AUTHOR_COMMENTS = (
+    'post_id IN (SELECT id FROM main.posts_post WHERE author_id = %s)'
+)
+
+_blocks = {}
+_blocks_lock = threading.Lock()
+
+
+class ShardingEnabled(Exception):
+    pass
+
+
+def enabled():
+    return len(settings.POST_SHARDS) > 1
+
+
+def require_disabled(tool):
+    """Останавливает массовую загрузку, пишущую в default напрямую.
+
+    id из AUTOINCREMENT default могут быть уже заняты постами шардов, а
+    посты автора с шарда оказались бы на двух базах.
+    """
+    if enabled():
+        raise ShardingEnabled(
+            f'{tool} не работает с шардированием (POST_SHARDS).'
+        )
+
+
+def hashed(author_id):
+    """Шард автора по хешу: у каждого шарда свой вес, берется больший."""
+    return max(
+        settings.POST_SHARDS,
+        key=lambda alias: zlib.crc32(f'{alias}:{author_id}'.encode()),
+    )
+
+
+def _directory(author_id):
+    return (AuthorShard.objects.using(DEFAULT)
+            .filter(author_id=author_id)
+            .values_list('database', flat=True).first())
+
+
+def location(author_id):
+    """База, на которой сейчас лежат посты автора."""
+    return _directory(author_id) or DEFAULT
+
+
+def author_location(author):
+    """location() для пользователя, загруженного с select_related('shard')."""
+    if not User.shard.is_cached(author):
+        return location(author.pk)
+    try:
+        return author.shard.database
+    except AuthorShard.DoesNotExist:
+        return DEFAULT
+
+
+def placement(author_id):
+    """База для нового поста автора; первый пост закрепляет за ним шард."""
+    database = _directory(author_id)
+    if database is not None:
+        return database
+    legacy = Post.objects.using(DEFAULT).filter(author_id=author_id).exists()
+    shard, _ = AuthorShard.objects.using(DEFAULT).get_or_create(
+        author_id=author_id,
+        defaults={'database': DEFAULT if legacy else hashed(author_id)},
+    )
+    return shard.database
+
+
+def post_location(comment):
+    """База поста комментария: комментарии лежат рядом с постом."""
+    if Comment.post.is_cached(comment):
+        return comment.post._state.db or DEFAULT
+    for source in sources(Post.objects.filter(id=comment.post_id)):
+        if source.exists():
+            return source.db
+    return DEFAULT
+
+
+def sources(queryset):
+    """Копии queryset для каждого шарда; без шардирования - он сам.
+
+    Результат передается в CursorPaginator, который сливает выборки
+    шардов по ключу сортировки.
+    """
+    if not enabled():
+        return [queryset]
+    return [queryset.using(alias) for alias in settings.POST_SHARDS]
+
+
+def author_posts(author_id):
+    """Посты автора с той базы, где они лежат."""
+    if not enabled():
+        return Post.objects.all()
+    return Post.objects.using(location(author_id))
+
+
+def get_object_or_404(queryset, **lookups):
+    """Как django.shortcuts.get_object_or_404, но ищет на всех шардах."""
+    if not enabled():
+        return get_single_object_or_404(queryset, **lookups)
+    model = queryset.model
+    for source in sources(queryset):
+        try:
+            return source.get(**lookups)
+        except model.DoesNotExist:
+            continue
+    raise Http404(f'No {model._meta.object_name} matches the given query.')
+
+
+def _max_id(model):
+    return max(
+        source.aggregate(last=Max('id'))['last'] or 0
+        for source in sources(model.objects.all())
+    )
+
+
+def _reserve(model):
+    """Забирает у ShardSequence порцию идентификаторов модели."""
+    name = model._meta.label_lower
+    size = settings.POST_SHARD_ID_BLOCK
+    sequences = ShardSequence.objects.using(DEFAULT)
+    with transaction.atomic(using=DEFAULT):
+        # UPDATE сразу берет блокировку записи, поэтому порции разных
+        # процессов не пересекаются, даже пока строки еще нет.
+        if not sequences.filter(name=name).update(last_id=F('last_id') + size):
+            sequences.create(name=name, last_id=_max_id(model) + size)
+        last = sequences.get(name=name).last_id
+    return last - size + 1, last
+
+
+def next_id(model):
+    """Следующий идентификатор модели, общий для всех шардов."""
+    name = model._meta.label_lower
+    with _blocks_lock:
+        pid, value, last = _blocks.get(name, (None, 0, -1))
+        if pid != os.getpid() or value > last:
+            pid = os.getpid()
+            value, last = _reserve(model)
+        _blocks[name] = (pid, value + 1, last)
+    return value
+
+
+def attach_default(sender, connection, **kwargs):
+    """Подключает default к соединению с шардом только для чтения.
+
+    Запись в default через соединение шарда держала бы блокировку
+    default до конца транзакции шарда, и обработчики сигналов, которые
+    пишут в default своим соединением, ждали бы ее до ошибки.
+    """
+    alias = connection.alias
+    if alias == DEFAULT or alias not in settings.POST_SHARDS:
+        return
+    name = connections[DEFAULT].settings_dict['NAME']
+    if not name.startswith('file:'):
+        name = f'file:{quote(os.path.abspath(name))}?mode=ro'
+    connection.connection.execute(
+        f'ATTACH DATABASE ? AS {SHARED_SCHEMA}', [name]
+    )
+
+
+def is_migrated(alias):
+    with connections[alias].cursor() as cursor:
+        tables = connections[alias].introspection.table_names(cursor)
+    return Post._meta.db_table in tables
+
+
+def delete_author(author_id):
+    """Удаляет посты и комментарии пользователя с шардов.
+
+    Каскад при удалении пользователя доходит только до default.
+    """
+    for alias in settings.POST_SHARDS:
+        if alias == DEFAULT:
+            continue
+        Comment.objects.using(alias).filter(author_id=author_id).delete()
+        Post.objects.using(alias).filter(author_id=author_id).delete()
+
+
+def detach_group(group_id):
+    """Убирает удаленную группу у постов на шардах."""
+    for alias in settings.POST_SHARDS:
+        if alias != DEFAULT:
+            Post.objects.using(alias).filter(group_id=group_id).update(
+                group=None
+            )
+
+
+def _existing_posts(post_ids):
+    found = set()
+    for source in sources(Post.objects.filter(id__in=post_ids)):
+        found.update(source.values_list('id', flat=True))
+    return found
+
+
+def clean_orphans(batch_size=1000):
+    """Делает то, что сделали бы ограничения внешних ключей.
+
+    Удаляет посты и комментарии удаленных пользователей и записи лент
+    удаленных постов, у постов удаленных групп сбрасывает группу.
+    Возвращает количество удаленных постов, комментариев, записей лент
+    и отвязанных от групп постов.
+    """
+    users = User.objects.values('id')
+    posts = comments = detached = 0
+    for alias in settings.POST_SHARDS:
+        # На шарде подзапросы к пользователям и группам читают default
+        # через ATTACH.
+        detached += (
+            Post.objects.using(alias)
+            .filter(group_id__isnull=False)
+            .exclude(group_id__in=Group.objects.values('id'))
+            .update(group=None)
+        )
+        _, deleted = (Comment.objects.using(alias)
+                      .exclude(author_id__in=users).delete())
+        comments += deleted.get(Comment._meta.label, 0)
+        _, deleted = (Post.objects.using(alias)
+                      .exclude(author_id__in=users).delete())
+        posts += deleted.get(Post._meta.label, 0)
+        comments += deleted.get(Comment._meta.label, 0)
+    entries = 0
+    post_ids = (FeedEntry.objects.order_by('post_id')
+                .values_list('post_id', flat=True).distinct())
+    last_id = 0
+    while True:
+        batch = list(post_ids.filter(post_id__gt=last_id)[:batch_size])
+        if not batch:
+            break
+        missing = set(batch) - _existing_posts(batch)
+        if missing:
+            orphaned = FeedEntry.objects.filter(post_id__in=missing)
+            entries += orphaned.delete()[0]
+        last_id = batch[-1]
+    return posts, comments, entries, detached
+
+
+def _columns(model):
+    return [field.column for field in model._meta.concrete_fields]
+
+
+def _select(cursor, model, where, params):
+    columns = ', '.join(_columns(model))
+    cursor.execute(
+        f'SELECT {columns} FROM main.{model._meta.db_table} WHERE {where}',
+        params,
+    )
+    return cursor.fetchall()
+
+
+def _replace(cursor, model, rows):
+    table = f'main.{model._meta.db_table}'
+    columns = _columns(model)
+    pk = columns.index(model._meta.pk.column)
+    cursor.executemany(
+        f'DELETE FROM {table} WHERE {columns[pk]} = %s',
+        [(row[pk],) for row in rows],
+    )
+    cursor.executemany(
+        f'INSERT INTO {table} ({", ".join(columns)}) '
+        f'VALUES ({", ".join(["%s"] * len(columns))})',
+        rows,
+    )
+
+
+def transfer(author_id, source, target):
+    """Копирует посты автора и комментарии к ним с source на target.
+
+    Первый запрос транзакции на source пишет и сразу берет блокировку
+    записи: пока строки копируются, на source никто не пишет, а чтения
+    видят старые строки до COMMIT. AuthorShard переключается до того,
+    как строки удаляются с source. Комментарий к посту, который
+    переносится в этот момент, не запишется: его транзакция дождется
+    удаления поста и получит ошибку FOREIGN KEY на source.
+    """
+    with transaction.atomic(using=source), \
+            connections[source].cursor() as cursor:
+        cursor.execute('UPDATE main.posts_post SET id = id WHERE 0')
+        posts = _select(cursor, Post, AUTHOR_POSTS, [author_id])
+        comments = _select(cursor, Comment, AUTHOR_COMMENTS, [author_id])
+        with transaction.atomic(using=target), \
+                connections[target].cursor() as target_cursor:
+            _replace(target_cursor, Post, posts)
+            _replace(target_cursor, Comment, comments)
+        AuthorShard.objects.using(DEFAULT).update_or_create(
+            author_id=author_id, defaults={'database': target}
+        )
+        cursor.execute(
+            f'DELETE FROM main.posts_comment WHERE {AUTHOR_COMMENTS}',
+            [author_id],
+        )
+        cursor.execute(
+            f'DELETE FROM main.posts_post WHERE {AUTHOR_POSTS}', [author_id]
+        )
+    return len(posts), len(comments)
+
+
+def move(author_id, target):
+    """Переносит автора на target без остановки сайта.
+
+    Возвращает количество перенесенных постов и комментариев.
+    """
+    source = location(author_id)
+    if source == target:
+        return 0, 0
+    return transfer(author_id, source, target)
+
+
+def sweep(author_id, source):
+    """Догоняет строки, записанные на source после переноса автора.
+
+    Запись, которая выбрала базу до переключения AuthorShard и ждала
+    блокировку source, добавляет строку туда уже после переноса.
+    Вызывается через POST_SHARD_SWEEP_DELAY секунд после move().
+    """
+    target = location(author_id)
+    if target == source or not Post.objects.using(source).filter(
+            author_id=author_id).exists():
+        return 0, 0
+    return transfer(author_id, source, target)
+
+
+def misplaced():
+    """Авторы не на своем шарде по хешу: (author_id, откуда, куда)."""
+    authors = dict.fromkeys(
+        Post.objects.using(DEFAULT).order_by()
+        .values_list('author_id', flat=True).distinct(),
+        DEFAULT,
+    )
+    authors.update(
+        AuthorShard.objects.using(DEFAULT).values_list('author_id', 'database')
+    )
+    for author_id, source in sorted(authors.items()):
+        target = hashed(author_id)
+        if source != target:
+            yield author_id, source, target
+
+
+class ShardRouter:
+    def db_for_read(self, model, **hints):
+        if not enabled():
+            return None
+        instance = hints.get('instance')
+        if model not in SHARDED_MODELS:
+            # Автор и группа поста с шарда читаются из default.
+            return DEFAULT if isinstance(instance, SHARDED_MODELS) else None
+        if isinstance(instance, SHARDED_MODELS):
+            return instance._state.db
+        if isinstance(instance, User) and model is Post:
+            return author_location(instance)
+        return None
+
+    def db_for_write(self, model, **hints):
+        if not enabled() or model not in SHARDED_MODELS:
+            return None
+        instance = hints.get('instance')
+        if isinstance(instance, User) and model is Post:
+            return author_location(instance)
+        if not isinstance(instance, SHARDED_MODELS):
+            return None
+        if not instance._state.adding:
+            return instance._state.db
+        if isinstance(instance, Post):
+            return placement(instance.author_id)
+        return post_location(instance)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True if enabled() else None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == DEFAULT or db not in settings.POST_SHARDS:
+            return None
+        return app_label == 'posts' and model_name in ('post', 'comment')
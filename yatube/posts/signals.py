@@ -0,0 +1,181 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import (post_delete, post_init, post_save,
+                                      pre_save)
+from django.dispatch import receiver
+from posts import feed, feed_cache, sharding, stats, thumbnails
+from posts.models import Comment, Follow, Group, Post, UserStats
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=User)
+def create_user_stats(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        UserStats.objects.get_or_create(user=instance)
+
+
+@receiver(post_delete, sender=User)
+def delete_sharded_posts(sender, instance, **kwargs):
+    if sharding.enabled():
+        author_id = instance.id
+        transaction.on_commit(lambda: sharding.delete_author(author_id))
+
+
+@receiver(post_delete, sender=Group)
+def detach_sharded_posts(sender, instance, **kwargs):
+    if sharding.enabled():
+        group_id = instance.id
+        transaction.on_commit(lambda: sharding.detach_group(group_id))
+
+
+@receiver(pre_save, sender=Post)
+@receiver(pre_save, sender=Comment)
+def assign_sharded_id(sender, instance, raw=False, **kwargs):
+    if instance.pk is None and not raw and sharding.enabled():
+        instance.pk = sharding.next_id(sender)
+
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        feed.fan_out(instance)
+
+
+@receiver(post_save, sender=Post)
+def count_new_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        stats.bump(instance.author_id, posts_count=1)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    stats.bump(instance.author_id, posts_count=-1)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_feed(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        feed.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Follow)
+def count_new_follow(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        stats.bump(instance.author_id, followers_count=1)
+        stats.bump(instance.user_id, following_count=1)
+
+
+@receiver(post_delete, sender=Post)
+def clear_post_from_feeds(sender, instance, **kwargs):
+    feed.remove_post(instance.id)
+
+
+@receiver(post_delete, sender=Follow)
+def clear_feed(sender, instance, **kwargs):
+    feed.remove_author(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def count_deleted_follow(sender, instance, **kwargs):
+    stats.bump(instance.author_id, followers_count=-1)
+    stats.bump(instance.user_id, following_count=-1)
+
+
+@receiver(post_init, sender=Post)
+def remember_loaded_fields(sender, instance, **kwargs):
+    # Отложенные поля (.only()) не читаем, чтобы не вызвать лишний запрос.
+    instance._loaded_group_id = instance.__dict__.get('group_id')
+    instance._loaded_image = str(instance.__dict__.get('image') or '')
+
+
+@receiver(pre_save, sender=Post)
+def remember_upload(sender, instance, **kwargs):
+    # Новый файл хранилище сохранит позже, в pre_save поля.
+    instance._image_uploaded = (
+        bool(instance.image) and not instance.image._committed
+    )
+
+
+@receiver(post_save, sender=Post)
+def refresh_thumbnails(sender, instance, raw=False, **kwargs):
+    name, old_name = instance.image.name or '', instance._loaded_image
+    if raw:
+        return
+    if name == old_name:
+        # Та же картинка загружена заново: хранилище добавило ссылку,
+        # а пост по-прежнему ссылается на файл один раз.
+        if name and instance._image_uploaded:
+            Post._meta.get_field('image').storage.delete(name)
+        return
+    instance._loaded_image = name
+    if old_name:
+        transaction.on_commit(lambda: release_image(old_name))
+    if name:
+        transaction.on_commit(lambda: thumbnails.schedule(name))
+
+
+@receiver(post_delete, sender=Post)
+def drop_thumbnails(sender, instance, **kwargs):
+    name = instance.image.name
+    if name:
+        transaction.on_commit(lambda: release_image(name))
+
+
+def release_image(name):
+    """Снимает ссылку поста на файл картинки и чистит ее миниатюры."""
+    Post._meta.get_field('image').storage.delete(name)
+    thumbnails.invalidate(name)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_fragments(sender, instance, **kwargs):
+    scopes = [
+        feed_cache.POSTS,
+        feed_cache.author_scope(instance.author_id),
+        feed_cache.post_scope(instance.id),
+    ]
+    for group_id in {instance.group_id, instance._loaded_group_id}:
+        if group_id is not None:
+            scopes.append(feed_cache.group_scope(group_id))
+    instance._loaded_group_id = instance.group_id
+    feed_cache.bump(*scopes)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_group_fragments(sender, instance, **kwargs):
+    feed_cache.bump(
+        feed_cache.POSTS,
+        feed_cache.GROUPS,
+        feed_cache.group_scope(instance.id),
+    )
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_fragments(sender, instance, update_fields=None,
+                              **kwargs):
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    feed_cache.bump(
+        feed_cache.POSTS,
+        feed_cache.USERS,
+        feed_cache.author_scope(instance.id),
+    )
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_follow_fragments(sender, instance, **kwargs):
+    feed_cache.bump(
+        feed_cache.follower_scope(instance.user_id),
+        feed_cache.follower_scope(instance.author_id),
+    )
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comment_pages(sender, instance, **kwargs):
+    feed_cache.bump(feed_cache.post_scope(instance.post_id))
@@ -0,0 +1,84 @@
+from collections import Counter
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count, F
+from posts import sharding
+from posts.models import Follow, Post, UserStats
+
+User = get_user_model()
+
+STATS_FIELDS = ('posts_count', 'followers_count', 'following_count')
+
+
+def bump(user_id, **deltas):
+    """Атомарно изменяет счетчики пользователя на заданные величины.
+
+    Счетчик, который ушел бы ниже нуля, уже разошелся с данными (их
+    меняют загрузка и перенос шардов без сигналов), поэтому вместо
+    изменения статистика пересчитывается.
+    """
+    enough = {
+        f'{field}__gte': -delta for field, delta in deltas.items() if delta < 0
+    }
+    updated = UserStats.objects.filter(user_id=user_id, **enough).update(
+        **{field: F(field) + delta for field, delta in deltas.items()}
+    )
+    if updated:
+        return
+    if (all(delta > 0 for delta in deltas.values())
+            or UserStats.objects.filter(user_id=user_id).exists()):
+        reconcile([user_id])
+
+
+def stats_for(user):
+    """Возвращает статистику пользователя, создавая ее при отсутствии."""
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        reconcile([user.id])
+        return UserStats.objects.get(user_id=user.id)
+
+
+def _counts(field, queryset, user_ids):
+    return dict(
+        queryset.filter(**{f'{field}__in': user_ids})
+        .order_by()
+        .values(field)
+        .annotate(total=Count('id'))
+        .values_list(field, 'total')
+    )
+
+
+def reconcile(user_ids):
+    """Пересчитывает счетчики пользователей по реальным данным.
+
+    Возвращает количество записей, которые пришлось создать или исправить.
+    """
+    user_ids = list(user_ids)
+    posts = Counter()
+    for source in sharding.sources(Post.objects.all()):
+        posts.update(_counts('author_id', source, user_ids))
+    followers = _counts('author_id', Follow.objects, user_ids)
+    following = _counts('user_id', Follow.objects, user_ids)
+    with transaction.atomic():
+        existing = UserStats.objects.select_for_update().in_bulk(user_ids)
+        missing, drifted = [], []
+        for user_id in user_ids:
+            actual = {
+                'posts_count': posts.get(user_id, 0),
+                'followers_count': followers.get(user_id, 0),
+                'following_count': following.get(user_id, 0),
+            }
+            stats = existing.get(user_id)
+            if stats is None:
+                missing.append(UserStats(user_id=user_id, **actual))
+                continue
+            if any(getattr(stats, field) != value
+                   for field, value in actual.items()):
+                for field, value in actual.items():
+                    setattr(stats, field, value)
+                drifted.append(stats)
+        UserStats.objects.bulk_create(missing, ignore_conflicts=True)
+        UserStats.objects.bulk_update(drifted, STATS_FIELDS)
+    return len(missing) + len(drifted)
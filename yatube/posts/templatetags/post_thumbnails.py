@@ -0,0 +1,20 @@
+from django import template
+from posts import thumbnails
+from posts.models import Post
+
+register = template.Library()
+
+
+@register.simple_tag
+def prefetch_thumbnails(posts):
+    if isinstance(posts, Post):
+        posts = [posts]
+    thumbnails.prefetch(posts)
+    return ''
+
+
+@register.inclusion_tag('posts/includes/picture.html')
+def post_picture(image, crop='center'):
+    if not image:
+        return {}
+    return thumbnails.picture(image, crop)
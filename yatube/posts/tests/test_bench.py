@@ -0,0 +1,63 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from posts import bench
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class BenchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.posts = [
+            Post.objects.create(
+                text=f'Пост {i}', author=cls.author, group=cls.group
+            )
+            for i in range(25)
+        ]
+        Comment.objects.create(
+            post=cls.posts[0], author=cls.reader, text='Комментарий'
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_run_measures_every_view_and_depth(self):
+        """Каждая страница замеряется на всех достижимых глубинах."""
+        rows = bench.run(depths=[1, 2, 50], repeat=1)
+        measured = {(row['view'], row['depth']) for row in rows}
+        for view in ('index', 'group_posts', 'profile', 'follow_index'):
+            with self.subTest(view=view):
+                self.assertIn((view, 1), measured)
+                self.assertIn((view, 2), measured)
+                self.assertNotIn((view, 50), measured)
+        self.assertIn(('post_detail', 1), measured)
+        for row in rows:
+            self.assertGreater(row['queries'], 0)
+            self.assertGreaterEqual(row['wall_ms'], row['render_ms'])
+
+    def test_compare_flags_only_significant_regressions(self):
+        """Регрессией считается рост запросов или заметный рост времени."""
+        def row(view, wall_ms, queries):
+            return {'view': view, 'size': 10, 'depth': 1, 'wall_ms': wall_ms,
+                    'queries': queries, 'db_ms': 0, 'render_ms': 0}
+
+        baseline = [row('index', 10, 3), row('profile', 10, 3),
+                    row('follow_index', 1, 3)]
+        results = [row('index', 20, 3), row('profile', 10, 4),
+                   row('follow_index', 1.5, 3), row('post_detail', 99, 9)]
+        regressions = bench.compare(results, baseline, threshold=0.2)
+        self.assertEqual(
+            [result['view'] for result, _ in regressions],
+            ['index', 'profile'],
+        )
@@ -0,0 +1,113 @@
+import csv
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+from posts import exporter
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ExportTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.posts = [
+            Post.objects.create(
+                text=f'Пост {i}', author=cls.author, group=cls.group
+            )
+            for i in range(5)
+        ]
+        Post.objects.create(text='Чужой пост', author=cls.reader)
+        Comment.objects.create(
+            post=cls.posts[0], author=cls.reader, text='Комментарий'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def test_keyset_visits_every_row_once(self):
+        """Диапазоны по id проходят все строки без повторов."""
+        ids = [
+            row['id']
+            for row in exporter.keyset(Post.objects.all(), ['id'], 2)
+        ]
+        self.assertEqual(
+            ids, list(Post.objects.order_by('id').values_list('id', flat=True))
+        )
+
+    def test_command_exports_jsonl_for_import(self):
+        """JSONL содержит все типы записей в формате импорта."""
+        out = StringIO()
+        call_command('export_data', '--chunk-size', '2', stdout=out)
+        records = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual(
+            [record['type'] for record in records],
+            ['post'] * 6 + ['comment', 'follow'],
+        )
+        self.assertEqual(records[0]['author'], 'auth')
+        self.assertEqual(records[0]['group'], 'test-slug')
+        self.assertEqual(records[6]['post'], self.posts[0].id)
+        self.assertEqual(records[7]['user'], 'reader')
+
+    def test_export_imports_back(self):
+        """Выгрузка загружается обратно через import_posts целиком."""
+        path = tempfile.mktemp(suffix='.jsonl')
+        self.addCleanup(os.remove, path)
+        call_command('export_data', '--output', path)
+        Post.objects.all().delete()
+        Follow.objects.all().delete()
+        out = StringIO()
+        call_command('import_posts', path, stdout=out)
+        self.assertIn('Импортировано записей: 8, пропущено: 0',
+                      out.getvalue())
+        self.assertEqual(Post.objects.count(), 6)
+        self.assertTrue(Comment.objects.filter(post=self.posts[0]).exists())
+        self.assertTrue(
+            Follow.objects.filter(user=self.reader, author=self.author)
+            .exists()
+        )
+
+    def test_command_writes_csv_for_author(self):
+        """CSV для автора содержит только его записи."""
+        path = tempfile.mktemp(suffix='.csv')
+        self.addCleanup(os.remove, path)
+        call_command(
+            'export_data', 'posts', 'comments', '--format', 'csv',
+            '--author', 'reader', '--output', path,
+        )
+        with open(path, newline='', encoding='utf-8') as file:
+            rows = list(csv.DictReader(file))
+        self.assertEqual(
+            [(row['type'], row['text']) for row in rows],
+            [('post', 'Чужой пост'), ('comment', 'Комментарий')],
+        )
+
+    def test_profile_export_streams_own_data(self):
+        """Автор скачивает свои данные, чужие данные недоступны."""
+        client = Client()
+        client.force_login(self.author)
+        url = reverse('posts:profile_export', args=('auth', 'jsonl'))
+        response = client.get(url)
+        self.assertTrue(response.streaming)
+        self.assertIn('auth.jsonl', response['Content-Disposition'])
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 5)
+
+        other = reverse('posts:profile_export', args=('reader', 'csv'))
+        self.assertRedirects(
+            client.get(other), reverse('posts:profile', args=('reader',))
+        )
+        bad = reverse('posts:profile_export', args=('auth', 'xml'))
+        self.assertEqual(client.get(bad).status_code, 404)
@@ -0,0 +1,104 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from posts import feed
+from posts.models import FeedEntry, FeedPullAuthor, Follow, Post
+
+User = get_user_model()
+
+
+class FollowFeedTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        cls.popular_author = User.objects.create_user(username='popular')
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='Test user')
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        Follow.objects.create(user=self.user, author=FollowFeedTest.author)
+
+    def get_feed(self):
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        return list(response.context['page_obj'])
+
+    def test_new_post_is_fanned_out_to_followers(self):
+        """Проверка раскладки нового поста по лентам подписчиков."""
+        post = Post.objects.create(
+            text='Тестовый текст поста',
+            author=FollowFeedTest.author,
+        )
+        self.assertTrue(
+            FeedEntry.objects.filter(user=self.user, post=post).exists(),
+            'Новый пост не попал в ленту подписчика',
+        )
+        self.assertEqual(self.get_feed(), [post])
+
+    def test_unfollow_clears_feed(self):
+        """Проверка очистки ленты после отписки от автора."""
+        Post.objects.create(
+            text='Тестовый текст поста',
+            author=FollowFeedTest.author,
+        )
+        Follow.objects.filter(user=self.user).delete()
+        self.assertFalse(
+            FeedEntry.objects.filter(user=self.user).exists(),
+            'Посты автора остались в ленте после отписки',
+        )
+        self.assertEqual(self.get_feed(), [])
+
+    @override_settings(FEED_PULL_MIN_FOLLOWERS=1)
+    def test_pull_author_posts_are_merged_on_read(self):
+        """Проверка подмешивания постов pull-автора при чтении ленты."""
+        Follow.objects.create(
+            user=self.user,
+            author=FollowFeedTest.popular_author,
+        )
+        pushed_post = Post.objects.create(
+            text='Пост обычного автора',
+            author=FollowFeedTest.author,
+        )
+        pulled_post = Post.objects.create(
+            text='Пост популярного автора',
+            author=FollowFeedTest.popular_author,
+        )
+        self.assertTrue(
+            FeedPullAuthor.objects.filter(
+                author=FollowFeedTest.popular_author
+            ).exists()
+        )
+        self.assertFalse(
+            FeedEntry.objects.filter(post=pulled_post).exists(),
+            'Пост pull-автора ошибочно разложен по лентам',
+        )
+        self.assertEqual(self.get_feed(), [pulled_post, pushed_post])
+
+    @override_settings(FEED_PULL_MIN_DAILY_POSTS=3)
+    def test_prolific_author_counts_posts_with_different_dates(self):
+        """Посты за сутки с разным временем считаются вместе."""
+        for hours in range(3):
+            post = Post.objects.create(
+                text='Тестовый текст поста',
+                author=FollowFeedTest.author,
+            )
+            Post.objects.filter(id=post.id).update(
+                pub_date=timezone.now() - timedelta(hours=hours)
+            )
+        self.assertIn(FollowFeedTest.author.id, feed.pull_author_ids())
+
+    def test_rebuild_feeds_command_restores_feed(self):
+        """Проверка пересборки лент командой rebuild_feeds."""
+        post = Post.objects.create(
+            text='Тестовый текст поста',
+            author=FollowFeedTest.author,
+        )
+        FeedEntry.objects.all().delete()
+        call_command('rebuild_feeds', stdout=StringIO())
+        self.assertEqual(self.get_feed(), [post])
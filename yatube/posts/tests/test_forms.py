@@ -36,6 +36,9 @@ class PostFormPostTest(TestCase):
             ),
             content_type='image/jpeg',
         )
+        cls.image_name = Post.image.field.storage.content_name(
+            f'posts/{cls.image.name}', cls.image
+        )
 
     def setUp(self):
         self.authorized_author = Client()
@@ -72,7 +75,7 @@ class PostFormPostTest(TestCase):
                 text='Тестовый текст нового поста',
                 group=PostFormPostTest.group,
                 author=PostFormPostTest.author,
-                image=f'posts/{PostFormPostTest.image.name}',
+                image=PostFormPostTest.image_name,
             ).exists(),
             'Новый пост не был добавлен в БД',
         )
@@ -111,7 +114,7 @@ class PostFormPostTest(TestCase):
                 text='Измененный тестовый текст существующего поста',
                 group=PostFormPostTest.group,
                 author=PostFormPostTest.author,
-                image=f'posts/{PostFormPostTest.image.name}',
+                image=PostFormPostTest.image_name,
             ).exists(),
         )
 
@@ -0,0 +1,216 @@
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from posts.models import Comment, Follow, Group, Post, UserStats
+
+User = get_user_model()
+
+
+class ImportPostsCommandTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def write(self, name, content):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(content)
+        return path
+
+    def write_jsonl(self, records):
+        return self.write(
+            'posts.jsonl',
+            '\n'.join(json.dumps(record) for record in records),
+        )
+
+    def run_import(self, path, *args):
+        out = StringIO()
+        call_command('import_posts', path, *args, stdout=out)
+        return out.getvalue()
+
+    def test_jsonl_import_keeps_dates_and_comments(self):
+        """Посты и комментарии импортируются с датами из файла."""
+        path = self.write_jsonl([
+            {'id': 100, 'text': 'Импорт', 'author': 'auth',
+             'group': 'test-slug', 'pub_date': '2020-01-02T03:04:05'},
+            {'type': 'comment', 'post': 100, 'author': 'auth',
+             'text': 'Комментарий', 'created': '2020-01-03T00:00:00'},
+        ])
+        report = self.run_import(path)
+        post = Post.objects.get(id=100)
+        self.assertEqual(post.group, self.group)
+        self.assertEqual(
+            post.pub_date,
+            timezone.make_aware(datetime(2020, 1, 2, 3, 4, 5), timezone.utc),
+        )
+        self.assertEqual(post.comments.get().text, 'Комментарий')
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).posts_count, 1
+        )
+        self.assertIn('Импортировано записей: 2, пропущено: 0', report)
+        self.assertFalse(os.path.exists(f'{path}.checkpoint'))
+
+    def test_unknown_references_are_skipped(self):
+        """Записи с неизвестным автором, группой или постом пропускаются."""
+        path = self.write_jsonl([
+            {'text': 'Чужой', 'author': 'nobody'},
+            {'text': 'Без группы', 'author': 'auth', 'group': 'missing'},
+            {'type': 'comment', 'post': 999, 'author': 'auth', 'text': 'К'},
+            {'text': 'Хороший', 'author': 'auth'},
+        ])
+        self.run_import(path, '--batch-size', '2')
+        self.assertEqual(Post.objects.count(), 1)
+        self.assertFalse(Comment.objects.exists())
+
+    def test_csv_import_creates_missing(self):
+        """CSV с --create-missing создает авторов и группы."""
+        path = self.write(
+            'posts.csv',
+            'text,author,group,pub_date\n'
+            'Первый,newbie,new-group,2021-05-01T10:00:00+03:00\n'
+            'Второй,newbie,,\n',
+        )
+        self.run_import(path, '--create-missing')
+        newbie = User.objects.get(username='newbie')
+        self.assertFalse(newbie.has_usable_password())
+        self.assertEqual(newbie.posts.count(), 2)
+        self.assertTrue(Group.objects.filter(slug='new-group').exists())
+
+    def test_import_resumes_from_checkpoint(self):
+        """Повторный запуск пропускает записи до контрольной точки."""
+        path = self.write_jsonl([
+            {'text': f'Пост {i}', 'author': 'auth'} for i in range(4)
+        ])
+        with open(f'{path}.checkpoint', 'w') as file:
+            json.dump({'records': 3}, file)
+        report = self.run_import(path)
+        self.assertIn('Продолжаем после записи 3', report)
+        self.assertEqual(
+            list(Post.objects.values_list('text', flat=True)), ['Пост 3']
+        )
+
+    def test_resumed_import_reconciles_authors_before_checkpoint(self):
+        """После продолжения пересчитываются и авторы до прерывания."""
+        earlier = User.objects.create_user(username='earlier')
+        Post.objects.bulk_create(
+            [Post(text='Пост до прерывания', author=earlier)]
+        )
+        path = self.write_jsonl([
+            {'text': 'Пост до прерывания', 'author': 'earlier'},
+            {'text': 'Пост после', 'author': 'auth'},
+        ])
+        with open(f'{path}.checkpoint', 'w') as file:
+            json.dump(
+                {'records': 1, 'imported': 1, 'authors': [earlier.id]}, file
+            )
+        report = self.run_import(path)
+        self.assertIn('Импортировано записей: 2, пропущено: 0', report)
+        self.assertEqual(UserStats.objects.get(user=earlier).posts_count, 1)
+
+    def test_conflicting_ids_are_not_counted_as_imported(self):
+        """Записи с занятым id не попадают в число импортированных."""
+        post = Post.objects.create(text='Уже есть', author=self.author)
+        path = self.write_jsonl([
+            {'id': post.id, 'text': 'Повтор', 'author': 'auth'},
+            {'id': post.id + 1, 'text': 'Новый', 'author': 'auth'},
+            {'id': post.id + 1, 'text': 'Повтор в файле', 'author': 'auth'},
+        ])
+        report = self.run_import(path)
+        self.assertIn('Импортировано записей: 1, пропущено: 2', report)
+        self.assertEqual(Post.objects.get(id=post.id).text, 'Уже есть')
+
+    def test_csv_conflicting_ids_are_not_counted_as_imported(self):
+        """id из CSV сравниваются с занятыми как числа."""
+        post = Post.objects.create(text='Уже есть', author=self.author)
+        path = self.write(
+            'posts.csv',
+            'id,text,author\n'
+            f'{post.id},Повтор,auth\n'
+            f'{post.id + 1},Новый,auth\n'
+            f'{post.id + 1},Повтор в файле,auth\n',
+        )
+        report = self.run_import(path)
+        self.assertIn('Импортировано записей: 1, пропущено: 2', report)
+        self.assertEqual(Post.objects.count(), 2)
+
+    def test_non_numeric_ids_are_invalid_records(self):
+        """Записи с нечисловым id пропускаются, а не прерывают импорт."""
+        path = self.write(
+            'posts.csv',
+            'type,id,post,text,author\n'
+            'post,abc,,Плохой id,auth\n'
+            'comment,,xyz,Плохой пост,auth\n'
+            'post,,,Хороший,auth\n',
+        )
+        report = self.run_import(path)
+        self.assertIn('Импортировано записей: 1, пропущено: 2', report)
+        path = self.write_jsonl([
+            {'id': 'abc', 'text': 'Плохой id', 'author': 'auth'},
+            {'id': 7, 'text': 'Хороший', 'author': 'auth'},
+        ])
+        report = self.run_import(path)
+        self.assertIn('Импортировано записей: 1, пропущено: 1', report)
+        self.assertTrue(Post.objects.filter(id=7).exists())
+
+    def test_imported_images_are_referenced(self):
+        """Каждый импортированный пост добавляет ссылку на картинку."""
+        name = 'posts/imported.gif'
+        existing = Post.objects.create(text='Уже есть', author=self.author)
+        path = self.write_jsonl([
+            {'text': 'Первый', 'author': 'auth', 'image': name},
+            {'text': 'Второй', 'author': 'auth', 'image': name},
+            {'id': existing.id, 'text': 'Повтор', 'author': 'auth',
+             'image': name},
+        ])
+        media = os.path.join(self.directory, 'media')
+        os.makedirs(os.path.join(media, 'posts'))
+        with open(os.path.join(media, name), 'wb') as file:
+            file.write(b'GIF89a')
+        with override_settings(MEDIA_ROOT=media):
+            self.run_import(path)
+            storage = Post.image.field.storage
+            self.assertEqual(storage.references(name), 2)
+            Post.objects.filter(image=name).first().delete()
+            self.assertTrue(storage.exists(name))
+
+    def test_follows_are_imported(self):
+        """Подписки импортируются, повторы и подписка на себя пропускаются."""
+        User.objects.create_user(username='reader')
+        path = self.write(
+            'follows.csv',
+            'type,user,author\n'
+            'follow,reader,auth\n'
+            'follow,reader,auth\n'
+            'follow,auth,auth\n'
+            'follow,nobody,auth\n',
+        )
+        report = self.run_import(path)
+        self.assertIn('Импортировано записей: 1, пропущено: 3', report)
+        self.assertTrue(
+            Follow.objects.filter(
+                user__username='reader', author=self.author
+            ).exists()
+        )
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).followers_count, 1
+        )
@@ -0,0 +1,78 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from posts import index_report
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class IndexReportTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        posts = [
+            Post.objects.create(
+                text=f'Пост {i}', author=cls.author, group=cls.group
+            )
+            for i in range(15)
+        ]
+        Comment.objects.create(
+            post=posts[0], author=cls.reader, text='Комментарий'
+        )
+
+    def plans(self, pages, view):
+        [page] = [page for page in pages if page['view'] == view]
+        return [detail for row in page['queries'] for detail in row['plan']]
+
+    def test_feeds_use_composite_indexes(self):
+        """Ленты группы и автора читаются по составным индексам."""
+        pages = index_report.report(repeat=1)
+        for view, index in (('group_posts', 'post_group_pub_date_idx'),
+                            ('profile', 'post_author_pub_date_idx'),
+                            ('post_detail', 'comment_post_created_idx')):
+            with self.subTest(view=view):
+                plans = self.plans(pages, view)
+                self.assertTrue(any(index in detail for detail in plans))
+        for page in pages:
+            for row in page['queries']:
+                with self.subTest(view=page['view'], sql=row['sql']):
+                    self.assertEqual(row['problems'], [])
+
+    def test_compare_restores_indexes(self):
+        """Замер без индексов показывает сортировку, а индексы остаются."""
+        pages = index_report.report(repeat=1, compare=True)
+        before = [
+            detail
+            for page in pages if page['view'] == 'profile'
+            for row in page['queries']
+            for detail in row.get('before_plan', ())
+        ]
+        self.assertIn('USE TEMP B-TREE FOR ORDER BY', before)
+        with connection.cursor() as cursor:
+            existing = {
+                name for name, in cursor.execute(
+                    "SELECT name FROM sqlite_master WHERE type = 'index'"
+                )
+            }
+        self.assertLessEqual(set(index_report.COMPOSITE_INDEXES), existing)
+
+    def test_problems_flags_scans_and_sorts(self):
+        """Полное сканирование и временное B-дерево считаются проблемами."""
+        self.assertEqual(
+            index_report.problems([
+                'SCAN posts_post',
+                'SCAN posts_post USING INDEX posts_post_pub_date',
+                'SCAN posts_post_fts VIRTUAL TABLE INDEX 0:M1',
+                'USE TEMP B-TREE FOR ORDER BY',
+            ]),
+            ['SCAN posts_post', 'USE TEMP B-TREE FOR ORDER BY'],
+        )
@@ -0,0 +1,154 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from posts import media_gc, thumbnails
+from posts.models import Post
+from sorl.thumbnail import default
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+STATE_FILE = os.path.join(TEMP_MEDIA_ROOT, 'state', 'media_gc.json')
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+def touch(*parts):
+    path = os.path.join(TEMP_MEDIA_ROOT, *parts)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as file:
+        file.write(b'x')
+    return path
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0,
+                   MEDIA_GC_STATE_FILE=STATE_FILE)
+class MediaGarbageCollectorTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+
+    def setUp(self):
+        cache.clear()
+
+    def tearDown(self):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def create_post(self, name):
+        post = Post.objects.create(
+            text='Пост с картинкой',
+            author=self.author,
+            image=SimpleUploadedFile(name, SMALL_GIF + name.encode()),
+        )
+        thumbnails.generate(post.image.name)
+        return post
+
+    def collect(self, *args):
+        out = StringIO()
+        call_command('collect_media', '--grace', '0', *args, stdout=out)
+        return out.getvalue()
+
+    def test_walk_is_sorted_and_resumable(self):
+        """Обход идет по порядку и продолжается после сохраненного пути."""
+        for parts in (('b', '2'), ('a', '1'), ('b', '1'), ('c',)):
+            touch('tree', *parts)
+        root = os.path.join(TEMP_MEDIA_ROOT, 'tree')
+        self.assertEqual(
+            list(media_gc.walk(root)), ['a/1', 'b/1', 'b/2', 'c']
+        )
+        self.assertEqual(list(media_gc.walk(root, after='b/1')), ['b/2', 'c'])
+
+    def test_orphans_are_reported_then_deleted(self):
+        """Без --delete команда только считает, с --delete - удаляет."""
+        cache_root = os.path.join(TEMP_MEDIA_ROOT, 'cache')
+        alive = self.create_post('alive.gif')
+        alive_thumbnails = set(media_gc.walk(cache_root))
+        dead = self.create_post('dead.gif')
+        dead_thumbnails = set(media_gc.walk(cache_root)) - alive_thumbnails
+        dead_image = dead.image.path
+        Post.objects.filter(id=dead.id).delete()
+        stray = touch('cache', 'ff', 'ff', 'stray.jpg')
+        legacy = touch('posts', 'legacy.jpg')
+
+        report = self.collect()
+        self.assertIn('originals: Найдено лишних: 2', report)
+        self.assertIn('sources: Найдено лишних: 1', report)
+        self.assertIn('thumbnails: Найдено лишних: 1', report)
+        self.assertTrue(os.path.exists(legacy))
+
+        self.collect('--delete')
+        for path in (legacy, dead_image, stray):
+            self.assertFalse(os.path.exists(path))
+        self.assertTrue(os.path.exists(alive.image.path))
+        self.assertEqual(set(media_gc.walk(cache_root)), alive_thumbnails)
+        self.assertTrue(dead_thumbnails)
+        self.assertIn('thumbnails: Найдено лишних: 0', self.collect())
+
+    def test_reupload_protects_old_file(self):
+        """Повторная загрузка старого файла защищает его на время grace."""
+        storage = Post.image.field.storage
+        name = storage.save('posts/old.gif', ContentFile(SMALL_GIF))
+        path = storage.path(name)
+        os.utime(path, (0, 0))
+        storage.save('posts/again.gif', ContentFile(SMALL_GIF))
+        call_command(
+            'collect_media', '--grace', '60', '--delete', stdout=StringIO()
+        )
+        self.assertTrue(os.path.exists(path))
+
+    def test_interrupted_run_resumes_from_saved_phase(self):
+        """Сохраненная позиция пропускает уже пройденные фазы."""
+        legacy = touch('posts', 'legacy.jpg')
+        os.makedirs(os.path.dirname(STATE_FILE))
+        with open(STATE_FILE, 'w') as file:
+            json.dump(
+                {'phase': 'thumbnails', 'after': None, 'delete': True}, file
+            )
+        report = self.collect('--delete')
+        self.assertNotIn('originals', report)
+        self.assertTrue(os.path.exists(legacy))
+        self.assertFalse(os.path.exists(STATE_FILE))
+
+    def test_report_position_is_not_resumed_by_delete(self):
+        """Позиция прохода без --delete не пропускает файлы при удалении."""
+        legacy = touch('posts', 'legacy.jpg')
+        os.makedirs(os.path.dirname(STATE_FILE))
+        with open(STATE_FILE, 'w') as file:
+            json.dump(
+                {'phase': 'thumbnails', 'after': None, 'delete': False}, file
+            )
+        report = self.collect('--delete')
+        self.assertIn('originals: Удалено лишних: 1', report)
+        self.assertFalse(os.path.exists(legacy))
+
+    def test_sources_are_read_in_one_query_per_batch(self):
+        """Записи sorl о картинках читаются порцией, а не по одной."""
+        for name in ('first.gif', 'second.gif', 'third.gif'):
+            Post.objects.filter(
+                id=self.create_post(name).id
+            ).delete()
+        # Как в свежем процессе: ни локального словаря, ни общего кеша.
+        default.kvstore._forget()
+        cache.clear()
+        with self.assertNumQueries(4):
+            batches = list(media_gc.collect_sources(None, 10, False))
+        self.assertEqual(len(batches[0][1]), 3)
@@ -23,6 +23,12 @@ class PostModelPostTest(TestCase):
             'Метод __str__ работает неправильно'
         )
 
+    def test_deferred_post_loads_without_extra_queries(self):
+        """Загрузка постов с .only() не читает отложенные поля."""
+        with self.assertNumQueries(1):
+            posts = list(Post.objects.only('id', 'text'))
+        self.assertEqual(posts, [PostModelPostTest.post])
+
     def test_post_verbose_names(self):
         """Проверка совпадения verbose_name полей модели поста
         с ожидаемым значением."""
@@ -0,0 +1,75 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class QueryBudgetTest(TestCase):
+    """Страницы укладываются в бюджет запросов при любом объеме данных.
+
+    Бюджет проверяет QueryBudgetMiddleware: тестовый раннер включает
+    строгий режим, и превышение роняет запрос.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='admin'
+        )
+        cls.authors = [
+            User.objects.create_user(username=f'author{i}') for i in range(5)
+        ]
+        cls.groups = [
+            Group.objects.create(
+                title=f'Группа {i}', slug=f'group-{i}', description=''
+            )
+            for i in range(3)
+        ]
+        for author in cls.authors:
+            Follow.objects.create(user=cls.admin, author=author)
+            Follow.objects.create(user=author, author=cls.admin)
+        cls.posts = [
+            Post.objects.create(
+                text=f'Пост {i}',
+                author=cls.authors[i % 5] if i else cls.admin,
+                group=cls.groups[i % 3],
+            )
+            for i in range(15)
+        ]
+        for author in cls.authors:
+            Comment.objects.create(
+                post=cls.posts[0], author=author, text='Комментарий'
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.admin)
+
+    def test_budgeted_pages(self):
+        """Все страницы с бюджетом открываются без превышения."""
+        pages = {
+            'posts:index': (),
+            'posts:search': (),
+            'posts:group_list': (self.groups[0].slug,),
+            'posts:profile': (self.authors[1].username,),
+            'posts:follow_index': (),
+            'posts:post_detail': (self.posts[0].id,),
+            'posts:post_create': (),
+            'posts:post_edit': (self.posts[0].id,),
+            'admin:posts_post_changelist': (),
+            'admin:posts_comment_changelist': (),
+            'admin:posts_follow_changelist': (),
+        }
+        self.assertEqual(set(pages), set(settings.QUERY_BUDGETS))
+        for name, args in pages.items():
+            with self.subTest(name=name):
+                response = self.client.get(
+                    reverse(name, args=args), {'q': 'Пост'}
+                )
+                self.assertEqual(response.status_code, 200)
@@ -0,0 +1,100 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.urls import reverse
+from posts.models import Post
+
+User = get_user_model()
+
+
+class PostSearchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        cls.admin = User.objects.create_superuser(
+            username='admin',
+            email='admin@example.com',
+            password='password',
+        )
+        cls.cats_post = Post.objects.create(
+            text='Кошки любят <спать> на солнце',
+            author=cls.author,
+        )
+        cls.dogs_post = Post.objects.create(
+            text='Собаки любят гулять',
+            author=cls.author,
+        )
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def search(self, query, **params):
+        response = self.guest_client.get(
+            reverse('posts:search'), {'q': query, **params}
+        )
+        return response.context['page_obj']
+
+    def test_search_finds_posts_by_word_prefix(self):
+        """Проверка поиска постов по началу слова."""
+        self.assertEqual(list(self.search('кош')), [PostSearchTest.cats_post])
+        self.assertEqual(
+            set(self.search('любят')),
+            {PostSearchTest.cats_post, PostSearchTest.dogs_post},
+        )
+        self.assertEqual(list(self.search('"')), [])
+
+    def test_search_snippet_is_escaped_and_highlighted(self):
+        """Проверка экранирования и подсветки сниппета."""
+        post = self.search('солнце')[0]
+        self.assertIn('<mark>солнце</mark>', post.snippet_html)
+        self.assertIn('&lt;спать&gt;', post.snippet_html)
+
+    def test_index_follows_post_changes(self):
+        """Проверка синхронизации индекса при изменении и удалении."""
+        post = Post.objects.create(text='Попугай Кеша', author=self.author)
+        post.text = 'Попугай Жако'
+        post.save()
+        self.assertEqual(list(self.search('кеша')), [])
+        self.assertEqual(list(self.search('жако')), [post])
+        post.delete()
+        self.assertEqual(list(self.search('жако')), [])
+
+    def test_search_pages_by_cursor(self):
+        """Проверка постраничной выдачи результатов поиска."""
+        posts = {
+            Post.objects.create(text=f'Морковь {number}', author=self.author)
+            for number in range(15)
+        }
+        first_page = self.search('морковь')
+        second_page = self.search('морковь', cursor=first_page.next_cursor)
+        self.assertEqual(set(first_page) | set(second_page), posts)
+        self.assertFalse(second_page.has_next())
+
+    def test_admin_search_uses_index(self):
+        """Проверка поиска в админке через полнотекстовый индекс."""
+        admin_client = Client()
+        admin_client.force_login(PostSearchTest.admin)
+        response = admin_client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'собак'}
+        )
+        self.assertEqual(
+            list(response.context['cl'].result_list),
+            [PostSearchTest.dogs_post],
+        )
+
+    def test_reindex_posts_command_rebuilds_index(self):
+        """Проверка перестроения индекса командой reindex_posts."""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO posts_post_fts(posts_post_fts) "
+                "VALUES ('delete-all')"
+            )
+        self.assertEqual(list(self.search('собаки')), [])
+        call_command('reindex_posts', chunk_size=1, stdout=StringIO())
+        self.assertEqual(
+            list(self.search('собаки')), [PostSearchTest.dogs_post]
+        )
@@ -0,0 +1,40 @@
+import random
+from collections import Counter
+from io import StringIO
+
+from django.core.management import call_command
+from django.db.models import F
+from django.test import TestCase
+from posts.models import Comment, Follow, Group, Post, UserStats
+from posts.seeding import power_law_index
+
+
+class SeedScaleTest(TestCase):
+    def test_power_law_index_is_skewed_and_bounded(self):
+        """Первые номера выпадают намного чаще последних."""
+        rng = random.Random(1)
+        counts = Counter(
+            power_law_index(100, 1.2, rng) for _ in range(10000)
+        )
+        self.assertTrue(set(counts) <= set(range(100)))
+        self.assertGreater(counts[0], 10 * counts[50])
+
+    def test_command_creates_requested_volumes(self):
+        """Команда создает записи и пересчитывает счетчики авторов."""
+        call_command(
+            'seed_scale', '--users', '20', '--groups', '3', '--posts', '200',
+            '--comments', '100', '--follows', '50', '--batch-size', '64',
+            '--seed', '1', stdout=StringIO(),
+        )
+        self.assertEqual(Group.objects.count(), 3)
+        self.assertEqual(Post.objects.count(), 200)
+        self.assertEqual(Comment.objects.count(), 100)
+        self.assertTrue(Follow.objects.exists())
+        self.assertFalse(
+            Follow.objects.filter(user_id=F('author_id')).exists()
+        )
+        top = UserStats.objects.order_by('-posts_count').first()
+        self.assertEqual(
+            top.posts_count, Post.objects.filter(author=top.user).count()
+        )
+        self.assertGreater(top.posts_count, 200 / 20)
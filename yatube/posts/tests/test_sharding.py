@@ -0,0 +1,229 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.db import connection, connections
+from django.test import (Client, TestCase, TransactionTestCase,
+                         override_settings)
+from django.urls import reverse
+from posts import exporter, sharding
+from posts.models import (AuthorShard, Comment, FeedEntry, Follow, Group,
+                          Post, UserStats)
+
+User = get_user_model()
+
+SHARD = 'shard1'
+SHARDS = ['default', SHARD]
+SHARD_DIR = tempfile.mkdtemp()
+
+
+def setUpModule():
+    # Раннер запускает TestCase раньше TransactionTestCase, и модуль
+    # поднимается дважды: каталог мог удалить первый tearDownModule.
+    os.makedirs(SHARD_DIR, exist_ok=True)
+    connections.databases[SHARD] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(SHARD_DIR, 'shard1.sqlite3'),
+    }
+    connections.ensure_defaults(SHARD)
+    connections.prepare_test_settings(SHARD)
+    with override_settings(POST_SHARDS=SHARDS):
+        call_command('migrate', database=SHARD, verbosity=0)
+
+
+def tearDownModule():
+    connections[SHARD].close()
+    del connections[SHARD]
+    del connections.databases[SHARD]
+    shutil.rmtree(SHARD_DIR, ignore_errors=True)
+
+
+@override_settings(POST_SHARDS=SHARDS, POST_SHARD_SWEEP_DELAY=0)
+class ShardingTest(TransactionTestCase):
+    databases = {'default', SHARD}
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='auth')
+        self.user = User.objects.create_user(username='Test user')
+        self.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def create_post(self, text, author=None, shard=SHARD):
+        with mock.patch('posts.sharding.hashed', return_value=shard):
+            return Post.objects.create(
+                text=text, author=author or self.author, group=self.group
+            )
+
+    @staticmethod
+    def texts(alias):
+        return set(Post.objects.using(alias).values_list('text', flat=True))
+
+    def test_new_author_is_placed_on_hashed_shard(self):
+        """Посты нового автора и комментарии к ним пишутся на его шард."""
+        post = self.create_post('Пост на шарде')
+        self.client.post(
+            reverse('posts:add_comment', kwargs={'post_id': post.id}),
+            data={'text': 'Комментарий'},
+        )
+        self.assertEqual(post._state.db, SHARD)
+        self.assertEqual(self.texts(SHARD), {'Пост на шарде'})
+        self.assertEqual(self.texts('default'), set())
+        self.assertEqual(
+            Comment.objects.using(SHARD).get().post_id, post.id
+        )
+        self.assertEqual(
+            AuthorShard.objects.get(author=self.author).database, SHARD
+        )
+
+    def test_legacy_author_stays_on_default(self):
+        """Автор с постами до шардирования продолжает писать в default."""
+        with override_settings(POST_SHARDS=['default']):
+            Post.objects.create(text='Старый пост', author=self.author)
+        self.create_post('Новый пост')
+        self.assertEqual(self.texts('default'), {'Старый пост', 'Новый пост'})
+        self.assertEqual(sharding.location(self.author.id), 'default')
+
+    def test_pages_merge_posts_from_all_shards(self):
+        """Главная, группа и профиль собирают посты со всех шардов."""
+        other = User.objects.create_user(username='other')
+        first = self.create_post('Пост из default', other, 'default')
+        second = self.create_post('Пост с шарда')
+        self.assertNotEqual(first.id, second.id)
+        pages = (
+            (reverse('posts:index'), [second, first]),
+            (reverse('posts:group_list', kwargs={'slug': 'test-slug'}),
+             [second, first]),
+            (reverse('posts:profile', kwargs={'username': 'auth'}), [second]),
+        )
+        for url, expected in pages:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(list(response.context['page_obj']), expected)
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': second.id})
+        )
+        self.assertEqual(response.context['post'], second)
+
+    def test_move_and_sweep(self):
+        """Перенос автора переносит комментарии, sweep догоняет остатки."""
+        post = self.create_post('Пост')
+        Comment.objects.create(post=post, author=self.user, text='Коммент')
+        self.assertEqual(sharding.move(self.author.id, 'default'), (1, 1))
+        self.assertEqual(sharding.location(self.author.id), 'default')
+        self.assertEqual(self.texts(SHARD), set())
+        self.assertEqual(Comment.objects.using('default').count(), 1)
+
+        Post.objects.using(SHARD).create(text='Опоздавший', author=self.author)
+        self.assertEqual(sharding.sweep(self.author.id, SHARD), (1, 0))
+        self.assertEqual(self.texts('default'), {'Пост', 'Опоздавший'})
+        self.assertEqual(self.texts(SHARD), set())
+
+    def test_reshard_moves_misplaced_authors(self):
+        """reshard переносит авторов, лежащих не на своем шарде."""
+        with override_settings(POST_SHARDS=['default']):
+            Post.objects.create(text='Старый пост', author=self.author)
+        out = StringIO()
+        with mock.patch('posts.sharding.hashed', return_value=SHARD):
+            call_command('reshard', stdout=out)
+            self.assertEqual(list(sharding.misplaced()), [])
+        self.assertIn('Перенесено авторов: 1', out.getvalue())
+        self.assertEqual(self.texts(SHARD), {'Старый пост'})
+
+    def test_deleting_author_cleans_shards(self):
+        """Удаление пользователя удаляет его посты с шардов."""
+        self.create_post('Пост')
+        self.author.delete()
+        self.assertEqual(self.texts(SHARD), set())
+
+    def test_clean_orphans_finishes_interrupted_cleanup(self):
+        """clean_orphans удаляет посты, которые не убрал on_commit."""
+        self.create_post('Пост')
+        with mock.patch('posts.sharding.delete_author'):
+            self.author.delete()
+        self.assertEqual(self.texts(SHARD), {'Пост'})
+        out = StringIO()
+        call_command('clean_orphans', stdout=out)
+        self.assertIn('Удалено постов: 1', out.getvalue())
+        self.assertEqual(self.texts(SHARD), set())
+
+    def test_export_includes_shards(self):
+        """Выгрузка собирает посты и комментарии со всех шардов по id."""
+        other = User.objects.create_user(username='other')
+        first = self.create_post('Пост из default', other, 'default')
+        second = self.create_post('Пост с шарда')
+        Comment.objects.create(post=second, author=other, text='Коммент')
+        records = list(exporter.records([exporter.POSTS, exporter.COMMENTS]))
+        self.assertEqual(
+            [(record['type'], record['id']) for record in records],
+            [('post', first.id), ('post', second.id),
+             ('comment', Comment.objects.using(SHARD).get().id)],
+        )
+        own = exporter.records([exporter.COMMENTS], user=other)
+        self.assertEqual([record['text'] for record in own], ['Коммент'])
+
+    def test_search_finds_posts_on_every_shard(self):
+        """Поиск находит посты с каждого шарда, в том числе после reindex."""
+        other = User.objects.create_user(username='other')
+        first = self.create_post('Пингвин в default', other, 'default')
+        second = self.create_post('Пингвин на шарде')
+        url = reverse('posts:search')
+        for _ in range(2):
+            response = self.client.get(url, {'q': 'пингвин'})
+            self.assertEqual(
+                {post.id for post in response.context['page_obj']},
+                {first.id, second.id},
+            )
+            call_command('reindex_posts', stdout=StringIO())
+
+    def test_bulk_tools_refuse_to_run(self):
+        """Импорт и генерация данных не запускаются при шардировании."""
+        path = os.path.join(SHARD_DIR, 'posts.jsonl')
+        with open(path, 'w') as file:
+            file.write('{"text": "Пост", "author": "auth"}\n')
+        for name, args in (('import_posts', [path]),
+                           ('seed_scale', ['--posts', '1'])):
+            with self.subTest(command=name):
+                with self.assertRaisesMessage(CommandError, 'шардированием'):
+                    call_command(name, *args, stdout=StringIO())
+        self.assertEqual(self.texts('default'), set())
+
+
+class OrphanCleanupTest(TestCase):
+    def raw_delete(self, table, pk):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {table} WHERE id = %s', [pk])
+
+    def test_rows_deleted_past_orm_are_cleaned(self):
+        """Без шардов clean_orphans доделывает каскад за удалением мимо ORM."""
+        gone = User.objects.create_user(username='gone')
+        author = User.objects.create_user(username='auth')
+        reader = User.objects.create_user(username='reader')
+        group = Group.objects.create(title='Группа', slug='group')
+        Follow.objects.create(user=reader, author=author)
+        Post.objects.create(text='Пост ушедшего', author=gone)
+        kept = Post.objects.create(text='Пост', author=author, group=group)
+        removed = Post.objects.create(text='Удаленный пост', author=author)
+        Comment.objects.create(post=kept, author=gone, text='Комментарий')
+        UserStats.objects.filter(user=gone).delete()
+        self.raw_delete('auth_user', gone.id)
+        self.raw_delete('posts_group', group.id)
+        self.raw_delete('posts_post', removed.id)
+
+        self.assertEqual(sharding.clean_orphans(), (1, 1, 1, 1))
+        self.assertEqual(list(Post.objects.all()), [kept])
+        self.assertFalse(Comment.objects.exists())
+        self.assertEqual(
+            list(FeedEntry.objects.values_list('post_id', flat=True)),
+            [kept.id],
+        )
+        kept.refresh_from_db()
+        self.assertIsNone(kept.group_id)
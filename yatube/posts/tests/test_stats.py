@@ -0,0 +1,101 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from posts import stats
+from posts.models import Follow, Post, UserStats
+
+User = get_user_model()
+
+
+class UserStatsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        cls.follower = User.objects.create_user(username='follower')
+
+    def get_stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def test_post_signals_update_posts_count(self):
+        """Проверка пересчета количества постов при создании и удалении."""
+        post = Post.objects.create(
+            text='Тестовый текст поста',
+            author=UserStatsTest.author,
+        )
+        self.assertEqual(self.get_stats(UserStatsTest.author).posts_count, 1)
+        post.delete()
+        self.assertEqual(self.get_stats(UserStatsTest.author).posts_count, 0)
+
+    def test_delete_with_drifted_counter_reconciles(self):
+        """Удаление при обнуленном счетчике пересчитывает статистику."""
+        posts = [
+            Post.objects.create(
+                text='Тестовый текст поста',
+                author=UserStatsTest.author,
+            )
+            for _ in range(2)
+        ]
+        UserStats.objects.filter(user=UserStatsTest.author).update(
+            posts_count=0
+        )
+        posts[0].delete()
+        self.assertEqual(self.get_stats(UserStatsTest.author).posts_count, 1)
+
+    def test_follow_signals_update_subscription_counts(self):
+        """Проверка пересчета подписок и подписчиков."""
+        follow = Follow.objects.create(
+            user=UserStatsTest.follower,
+            author=UserStatsTest.author,
+        )
+        author_stats = self.get_stats(UserStatsTest.author)
+        follower_stats = self.get_stats(UserStatsTest.follower)
+        self.assertEqual(author_stats.followers_count, 1)
+        self.assertEqual(follower_stats.following_count, 1)
+        follow.delete()
+        self.assertEqual(
+            self.get_stats(UserStatsTest.author).followers_count, 0
+        )
+        self.assertEqual(
+            self.get_stats(UserStatsTest.follower).following_count, 0
+        )
+
+    def test_reconcile_stats_command_repairs_drift(self):
+        """Проверка исправления расхождений командой reconcile_stats."""
+        Post.objects.create(
+            text='Тестовый текст поста',
+            author=UserStatsTest.author,
+        )
+        UserStats.objects.filter(user=UserStatsTest.author).update(
+            posts_count=42,
+            followers_count=7,
+        )
+        UserStats.objects.filter(user=UserStatsTest.follower).delete()
+        call_command('reconcile_stats', stdout=StringIO())
+        author_stats = self.get_stats(UserStatsTest.author)
+        self.assertEqual(author_stats.posts_count, 1)
+        self.assertEqual(author_stats.followers_count, 0)
+        self.assertTrue(
+            UserStats.objects.filter(user=UserStatsTest.follower).exists(),
+            'Отсутствующая статистика не была создана',
+        )
+
+    def test_reconcile_counts_posts_with_different_dates(self):
+        """Посты автора с разными датами считаются вместе."""
+        for days in range(3):
+            post = Post.objects.create(
+                text='Тестовый текст поста',
+                author=UserStatsTest.author,
+            )
+            Post.objects.filter(id=post.id).update(
+                pub_date=timezone.now() - timedelta(days=days)
+            )
+        UserStats.objects.filter(user=UserStatsTest.author).update(
+            posts_count=0
+        )
+        stats.reconcile([UserStatsTest.author.id])
+        self.assertEqual(self.get_stats(UserStatsTest.author).posts_count, 3)
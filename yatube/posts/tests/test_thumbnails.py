@@ -0,0 +1,178 @@
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from posts import thumbnails
+from posts.models import Post
+from sorl.thumbnail import default
+from sorl.thumbnail.images import ImageFile
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+def run_immediately(func):
+    func()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class ThumbnailsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def create_post(self, name='small.gif'):
+        # Одинаковые файлы хранилище сохраняет один раз, поэтому
+        # содержимое каждой картинки уникально.
+        content = SMALL_GIF + name.encode()
+        return Post.objects.create(
+            text='Пост с картинкой',
+            author=self.author,
+            image=SimpleUploadedFile(name, content, 'image/gif'),
+        )
+
+    def thumbnails_of(self, post):
+        keys = default.kvstore._get(
+            ImageFile(post.image).key, identity='thumbnails'
+        )
+        return [default.kvstore._get(key) for key in keys or []]
+
+    def test_generate_creates_all_configured_thumbnails(self):
+        """generate создает миниатюры всех размеров и форматов."""
+        post = self.create_post()
+        thumbnails.generate(post.image.name)
+        created = self.thumbnails_of(post)
+        self.assertEqual(len(created), len(thumbnails.variants()))
+        for thumbnail in created:
+            self.assertTrue(thumbnail.exists())
+
+    @mock.patch('posts.signals.transaction.on_commit', run_immediately)
+    def test_saving_post_schedules_thumbnails(self):
+        """Сохранение поста с картинкой запускает генерацию миниатюр."""
+        with mock.patch.object(thumbnails, 'schedule') as schedule:
+            post = self.create_post()
+            schedule.assert_called_once_with(post.image.name)
+            post.text = 'Новый текст'
+            post.save()
+            schedule.assert_called_once()
+
+    @mock.patch('posts.signals.transaction.on_commit', run_immediately)
+    def test_post_without_image_is_skipped(self):
+        """Пост без картинки не отправляется в пул."""
+        with mock.patch.object(thumbnails, 'schedule') as schedule:
+            Post.objects.create(text='Без картинки', author=self.author)
+        schedule.assert_not_called()
+
+    def test_command_backfills_existing_images(self):
+        """Команда создает миниатюры для уже загруженных картинок."""
+        posts = [self.create_post(f'image_{i}.gif') for i in range(3)]
+        out = StringIO()
+        call_command('pregenerate_thumbnails', '--workers', '0', stdout=out)
+        self.assertIn('Обработано картинок: 3', out.getvalue())
+        for post in posts:
+            self.assertEqual(
+                len(self.thumbnails_of(post)), len(thumbnails.variants())
+            )
+
+    def test_prefetched_keys_match_template_lookups(self):
+        """Ключи prefetch совпадают с ключами, которые ищет шаблон."""
+        post = self.create_post()
+        thumbnails.generate(post.image.name)
+        for key in thumbnails.thumbnail_keys(post.image.name):
+            self.assertIsNotNone(default.kvstore._get_raw(key))
+
+    def test_invalidate_removes_thumbnails_of_unused_image(self):
+        """Миниатюры удаляются, когда картинку не использует ни один пост."""
+        post = self.create_post()
+        name = post.image.name
+        thumbnails.generate(name)
+        created = self.thumbnails_of(post)
+        thumbnails.invalidate(name)
+        self.assertEqual(len(self.thumbnails_of(post)), len(created))
+        post.delete()
+        thumbnails.invalidate(name)
+        self.assertEqual(self.thumbnails_of(post), [])
+        for thumbnail in created:
+            self.assertFalse(thumbnail.exists())
+
+    @mock.patch('posts.signals.transaction.on_commit', run_immediately)
+    def test_replacing_image_invalidates_old_thumbnails(self):
+        """Замена картинки поста сбрасывает миниатюры старой картинки."""
+        post = self.create_post()
+        old_name = post.image.name
+        with mock.patch.object(thumbnails, 'invalidate') as invalidate:
+            post.image = SimpleUploadedFile(
+                'new.gif', SMALL_GIF + b'new', 'image/gif'
+            )
+            post.save()
+            invalidate.assert_called_once_with(old_name)
+            post.delete()
+            invalidate.assert_called_with(post.image.name)
+
+    def test_variants_cover_widths_and_modern_formats(self):
+        """Варианты есть для каждой ширины в исходном формате и WebP."""
+        with mock.patch.object(
+            thumbnails, 'modern_formats', return_value=['WEBP']
+        ):
+            variants = thumbnails.variants(crops=['center'])
+        self.assertEqual(
+            len(variants), len(settings.POST_IMAGE_WIDTHS) * 2
+        )
+        self.assertIn(
+            ('480x170', {'crop': 'center', 'upscale': True,
+                         'format': 'WEBP'}),
+            variants,
+        )
+
+    def test_picture_lists_only_generated_variants(self):
+        """До генерации в разметке нет srcset, после - есть WebP."""
+        post = self.create_post()
+        picture = thumbnails.picture(post.image, 'center')
+        self.assertEqual(picture['sources'], [])
+        thumbnails.generate(post.image.name)
+        picture = thumbnails.picture(post.image, 'center')
+        self.assertIn('480w', picture['srcset'])
+        self.assertIn('image/webp', [s['type'] for s in picture['sources']])
+        webp = next(
+            s for s in picture['sources'] if s['type'] == 'image/webp'
+        )
+        self.assertEqual(
+            webp['srcset'].count('.webp'), len(settings.POST_IMAGE_WIDTHS)
+        )
+
+    def test_generated_variants_reach_cached_pages(self):
+        """После генерации страница, закешированная раньше, получает srcset."""
+        post = self.create_post('cached_page.gif')
+        client = Client()
+        response = client.get(reverse('posts:index'))
+        self.assertNotIn('480w', response.content.decode())
+        thumbnails.generate(post.image.name)
+        response = client.get(reverse('posts:index'))
+        self.assertIn('480w', response.content.decode())
@@ -0,0 +1,198 @@
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import (
+    Client, TestCase, TransactionTestCase, override_settings,
+)
+from django.urls import reverse
+from PIL import Image
+from posts import uploads
+from posts.models import Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+EXIF_ORIENTATION = 0x0112
+
+
+def make_image(size=(400, 200), image_format='JPEG', orientation=None):
+    image = Image.new('RGB', size, (200, 30, 30))
+    params = {}
+    if orientation is not None:
+        exif = Image.Exif()
+        exif[EXIF_ORIENTATION] = orientation
+        params['exif'] = exif.tobytes()
+    buffer = BytesIO()
+    image.save(buffer, image_format, **params)
+    return buffer.getvalue()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0,
+                   POST_IMAGE_WORKERS=0)
+class UploadPipelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    @override_settings(POST_IMAGE_MAX_UPLOAD_SIZE=10)
+    def test_handler_stops_writing_after_limit(self):
+        """Обработчик не пишет на диск байты сверх лимита."""
+        handler = uploads.SizeLimitedUploadHandler()
+        handler.new_file('image', 'big.jpg', 'image/jpeg', None)
+        handler.receive_data_chunk(b'x' * 8, 0)
+        handler.receive_data_chunk(b'x' * 8, 8)
+        upload = handler.file_complete(16)
+        self.assertTrue(upload.oversized)
+        upload.seek(0)
+        self.assertEqual(len(upload.read()), 8)
+
+    def test_check_rejects_by_header(self):
+        """Формат и количество пикселей проверяются по заголовку."""
+        bmp = SimpleUploadedFile('image.bmp', make_image(image_format='BMP'))
+        with self.assertRaises(ValidationError):
+            uploads.check(bmp)
+        text = SimpleUploadedFile('image.jpg', b'not an image')
+        with self.assertRaises(ValidationError):
+            uploads.check(text)
+        jpeg = SimpleUploadedFile('image.jpg', make_image())
+        self.assertEqual(uploads.check(jpeg), 'JPEG')
+        with override_settings(POST_IMAGE_MAX_PIXELS=100):
+            with self.assertRaises(ValidationError):
+                uploads.check(jpeg)
+
+    @override_settings(POST_IMAGE_MAX_DIMENSION=100)
+    def test_process_downscales_and_strips_exif(self):
+        """Картинка поворачивается по EXIF, уменьшается и теряет EXIF."""
+        upload = SimpleUploadedFile(
+            'photo.jpg', make_image(orientation=6), 'image/jpeg'
+        )
+        result = uploads.process(upload)
+        with Image.open(result) as image:
+            self.assertEqual(image.size, (50, 100))
+            self.assertEqual(image.format, 'JPEG')
+            self.assertNotIn(EXIF_ORIENTATION, image.getexif())
+
+    @override_settings(POST_IMAGE_MAX_DIMENSION=100, POST_IMAGE_WORKERS=1)
+    def test_process_runs_in_own_pool(self):
+        """Картинка обрабатывается в пуле загрузок, а не в пуле миниатюр."""
+        upload = SimpleUploadedFile('photo.jpg', make_image(), 'image/jpeg')
+        with mock.patch('posts.thumbnails.submit') as submit:
+            result = uploads.process(upload)
+        submit.assert_not_called()
+        with Image.open(result) as image:
+            self.assertEqual(image.size, (100, 50))
+
+    def test_process_reports_only_image_errors(self):
+        """Битая картинка - ошибка формы, а ошибка в коде - нет."""
+        content = make_image()
+        truncated = content[:len(content) // 2]
+        with self.assertRaises(ValidationError):
+            uploads.process(SimpleUploadedFile('photo.jpg', truncated))
+        upload = SimpleUploadedFile('photo.jpg', make_image())
+        with mock.patch('posts.uploads.normalize', side_effect=ValueError):
+            with self.assertRaises(ValueError):
+                uploads.process(upload)
+
+    @override_settings(POST_IMAGE_MAX_DIMENSION=100)
+    def test_created_post_stores_processed_image(self):
+        """В посте сохраняется уменьшенная картинка."""
+        self.client.post(
+            reverse('posts:post_create'),
+            data={
+                'text': 'Пост с большой картинкой',
+                'image': SimpleUploadedFile('photo.jpg', make_image()),
+            },
+        )
+        post = Post.objects.get(text='Пост с большой картинкой')
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.size, (100, 50))
+
+    @override_settings(POST_IMAGE_MAX_UPLOAD_SIZE=100)
+    def test_oversized_upload_is_rejected_by_form(self):
+        """Слишком большой файл возвращает форму с ошибкой."""
+        response = self.client.post(
+            reverse('posts:post_create'),
+            data={
+                'text': 'Пост с огромной картинкой',
+                'image': SimpleUploadedFile('photo.jpg', make_image()),
+            },
+        )
+        errors = response.context['form'].errors['image']
+        self.assertTrue(errors[0].startswith('Файл больше'))
+        self.assertFalse(
+            Post.objects.filter(text='Пост с огромной картинкой').exists()
+        )
+
+    def test_shard_media_moves_legacy_files(self):
+        """Команда переносит старые файлы в шардированные каталоги."""
+        storage = Post.image.field.storage
+        legacy = 'posts/legacy.jpg'
+        FileSystemStorage().save(legacy, ContentFile(make_image()))
+        posts = [
+            Post.objects.create(text=f'Старый пост {i}', author=self.author,
+                                image=legacy)
+            for i in range(2)
+        ]
+        call_command('shard_media', stdout=StringIO())
+        for post in posts:
+            post.refresh_from_db()
+            self.assertTrue(storage.is_content_name(post.image.name))
+            self.assertTrue(storage.exists(post.image.name))
+        self.assertFalse(storage.exists(legacy))
+        self.assertEqual(storage.references(posts[0].image.name), 2)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class ImageReferencesTest(TransactionTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='auth')
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def test_reuploading_same_image_does_not_leak_references(self):
+        """Повторная загрузка той же картинки не оставляет лишних ссылок."""
+        image = make_image()
+        post = Post.objects.create(
+            text='Пост с картинкой',
+            author=self.author,
+            image=SimpleUploadedFile('photo.jpg', image),
+        )
+        for _ in range(2):
+            self.client.post(
+                reverse('posts:post_edit', kwargs={'post_id': post.id}),
+                data={
+                    'text': 'Пост с картинкой',
+                    'image': SimpleUploadedFile('photo.jpg', image),
+                },
+            )
+        post.refresh_from_db()
+        storage = Post.image.field.storage
+        name = post.image.name
+        self.assertEqual(storage.references(name), 1)
+        post.delete()
+        self.assertFalse(storage.exists(name))
@@ -31,6 +31,7 @@ class PostURLTest(TestCase):
             f'/group/{cls.group.slug}/',
             f'/profile/{cls.author.username}/',
             f'/posts/{cls.post.id}/',
+            '/search/',
         )
         cls.urls_for_authorized_wo_redirection = (
             '/create/',
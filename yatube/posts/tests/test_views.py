@@ -1,5 +1,6 @@
 import shutil
 import tempfile
+from http import HTTPStatus
 
 from django import forms
 from django.conf import settings
@@ -9,6 +10,7 @@ from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 from posts.models import Comment, Follow, Group, Post
+from posts.paginator import NEXT, encode_cursor
 
 from yatube.settings import POSTS_PER_PAGE
 
@@ -471,12 +473,83 @@ class PaginatorPostViewTest(TestCase):
                     POSTS_PER_PAGE,
                     'Неверное кол-во постов на первой странице пажинатора'
                 )
-                response = self.authorized_client.get(reverse_name + '?page=2')
+                next_cursor = response.context['page_obj'].next_cursor
+                response = self.authorized_client.get(
+                    reverse_name, {'cursor': next_cursor}
+                )
                 self.assertEqual(
                     len(response.context['page_obj']),
                     posts_on_last_page,
                     'Неверное кол-во постов на последней странице пажинатора'
                 )
+                self.assertFalse(
+                    response.context['page_obj'].has_next(),
+                    'Пажинатор ошибочно указывает на следующую страницу'
+                )
+
+    def test_cursor_paginator_navigates_back_and_forth(self):
+        """Проверка перехода по курсорам вперед, назад и на
+        последнюю страницу."""
+        index_page = reverse('posts:index')
+        expected_first_page = list(Post.objects.all()[:POSTS_PER_PAGE])
+        response = self.authorized_client.get(index_page)
+        first_page = response.context['page_obj']
+        self.assertEqual(list(first_page), expected_first_page)
+        self.assertFalse(first_page.has_previous())
+
+        response = self.authorized_client.get(
+            index_page, {'cursor': first_page.next_cursor}
+        )
+        second_page = response.context['page_obj']
+        self.assertNotIn(second_page[0], expected_first_page)
+        response = self.authorized_client.get(
+            index_page, {'cursor': second_page.previous_cursor}
+        )
+        self.assertEqual(
+            list(response.context['page_obj']),
+            expected_first_page,
+            'Курсор предыдущей страницы работает неверно'
+        )
+
+        response = self.authorized_client.get(
+            index_page, {'cursor': first_page.paginator.last_cursor}
+        )
+        last_page = response.context['page_obj']
+        self.assertEqual(
+            list(last_page),
+            list(Post.objects.all())[-POSTS_PER_PAGE:],
+            'Курсор последней страницы работает неверно'
+        )
+        self.assertFalse(last_page.has_next())
+
+    def test_invalid_cursor_returns_first_page(self):
+        """Проверка отдачи первой страницы при некорректном курсоре."""
+        response = self.authorized_client.get(
+            reverse('posts:index'), {'cursor': 'не-курсор'}
+        )
+        self.assertEqual(
+            list(response.context['page_obj']),
+            list(Post.objects.all()[:POSTS_PER_PAGE]),
+        )
+
+    def test_cursor_with_wrong_value_types_returns_first_page(self):
+        """Курсор со значениями не того типа не роняет страницу."""
+        post = Post.objects.first()
+        cursors = (
+            encode_cursor(NEXT, [1, 1]),
+            encode_cursor(NEXT, [post.pub_date, post.pub_date]),
+            encode_cursor(NEXT, [post.pub_date, True]),
+            encode_cursor(NEXT, [post.pub_date, '1']),
+        )
+        for cursor in cursors:
+            with self.subTest(cursor=cursor):
+                response = self.authorized_client.get(
+                    reverse('posts:index'), {'cursor': cursor}
+                )
+                self.assertEqual(
+                    list(response.context['page_obj']),
+                    list(Post.objects.all()[:POSTS_PER_PAGE]),
+                )
 
 
 class CachePostViewTest(TestCase):
@@ -497,64 +570,176 @@ class CachePostViewTest(TestCase):
 
         cache.clear()
 
-    def test_index_page_cache_works_correctly(self):
-        """Проверка корректной работы кеширования главной страницы."""
-        index_page = reverse('posts:index')
+    def assert_fragment_cache_works(self, page):
         post = Post.objects.create(
             text='Тестовый текст поста',
             author=CachePostViewTest.author,
             group=CachePostViewTest.group,
         )
-
-        response = self.authorized_client.get(index_page)
+        response = self.authorized_client.get(page)
         saved_content = response.content
-        post.delete()
-        response = self.authorized_client.get(index_page)
-        cached_content = response.content
+
+        Post.objects.filter(id=post.id).update(text='Текст без сигналов')
+        response = self.authorized_client.get(page)
         self.assertEqual(
             saved_content,
-            cached_content,
-            'Кеширование главной страницы не работает'
+            response.content,
+            'Кеширование страницы не работает'
         )
 
-        cache.clear()
-        response = self.authorized_client.get(index_page)
-        cleared_content = response.content
-        self.assertNotEqual(
-            cached_content,
-            cleared_content,
-            'Очистка кеша не удаляет кешированный пост'
+        post.delete()
+        response = self.authorized_client.get(page)
+        self.assertNotIn(
+            'Текст без сигналов',
+            response.content.decode(),
+            'Удаление поста не сбрасывает кеш страницы'
         )
 
-    def test_follow_page_cache_works_correctly(self):
-        """Проверка корректной работы кеширования страницы ленты подписок."""
-        follow_index_page = reverse('posts:follow_index')
-        post = Post.objects.create(
-            text='Тестовый текст поста',
+        Post.objects.create(
+            text='Свежий пост',
             author=CachePostViewTest.author,
             group=CachePostViewTest.group,
         )
+        response = self.authorized_client.get(page)
+        self.assertContains(
+            response,
+            'Свежий пост',
+            msg_prefix='Новый пост не виден сразу после публикации'
+        )
+
+    def test_index_page_cache_works_correctly(self):
+        """Проверка кеширования главной страницы и его сброса
+        при изменении постов."""
+        self.assert_fragment_cache_works(reverse('posts:index'))
+
+    def test_follow_page_cache_works_correctly(self):
+        """Проверка кеширования страницы ленты подписок и его сброса
+        при изменении постов."""
         Follow.objects.create(
             user=self.user,
             author=CachePostViewTest.author,
         )
+        self.assert_fragment_cache_works(reverse('posts:follow_index'))
 
-        response = self.authorized_client.get(follow_index_page)
-        saved_content = response.content
-        post.delete()
-        response = self.authorized_client.get(follow_index_page)
-        cached_content = response.content
-        self.assertEqual(
-            saved_content,
-            cached_content,
-            'Кеширование страницы ленты подписок не работает'
+    def test_group_and_profile_pages_cache_works_correctly(self):
+        """Проверка кеширования страниц группы и профайла и его сброса
+        при изменении постов."""
+        pages = [
+            reverse('posts:group_list', args=[CachePostViewTest.group.slug]),
+            reverse('posts:profile', args=[CachePostViewTest.author.username]),
+        ]
+        for page in pages:
+            with self.subTest(page=page):
+                self.assert_fragment_cache_works(page)
+
+    def test_group_rename_resets_cached_pages(self):
+        """Проверка сброса кеша при переименовании группы."""
+        Post.objects.create(
+            text='Тестовый текст поста',
+            author=CachePostViewTest.author,
+            group=CachePostViewTest.group,
+        )
+        profile_page = reverse(
+            'posts:profile', args=[CachePostViewTest.author.username]
+        )
+        self.authorized_client.get(profile_page)
+        group = CachePostViewTest.group
+        group.title = 'Новое название группы'
+        group.save()
+        response = self.authorized_client.get(profile_page)
+        self.assertContains(response, 'Новое название группы')
+
+
+class ConditionalGetPostViewTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='Test_slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            text='Тестовый текст поста',
+            author=cls.author,
+            group=cls.group,
         )
 
+    def setUp(self):
+        self.guest_client = Client()
         cache.clear()
-        response = self.authorized_client.get(follow_index_page)
-        cleared_content = response.content
-        self.assertNotEqual(
-            saved_content,
-            cleared_content,
-            'Очистка кеша не удаляет кешированный пост'
+        self.pages = [
+            reverse('posts:index'),
+            reverse('posts:group_list',
+                    args=[ConditionalGetPostViewTest.group.slug]),
+            reverse('posts:profile',
+                    args=[ConditionalGetPostViewTest.author.username]),
+            reverse('posts:post_detail',
+                    args=[ConditionalGetPostViewTest.post.id]),
+        ]
+
+    def test_unchanged_pages_return_not_modified(self):
+        """Проверка ответа 304 без рендеринга для неизменных страниц."""
+        for page in self.pages:
+            with self.subTest(page=page):
+                response = self.guest_client.get(page)
+                etag = response['ETag']
+                response = self.guest_client.get(
+                    page, HTTP_IF_NONE_MATCH=etag
+                )
+                self.assertEqual(
+                    response.status_code,
+                    HTTPStatus.NOT_MODIFIED.value,
+                    'Неизмененная страница отдается целиком'
+                )
+                self.assertTemplateNotUsed(response, 'base.html')
+
+    def test_changed_pages_are_rendered_again(self):
+        """Проверка полного ответа после изменения содержимого."""
+        etags = {
+            page: self.guest_client.get(page)['ETag'] for page in self.pages
+        }
+        post = ConditionalGetPostViewTest.post
+        post.text = 'Измененный текст поста'
+        post.save()
+        for page, etag in etags.items():
+            with self.subTest(page=page):
+                response = self.guest_client.get(
+                    page, HTTP_IF_NONE_MATCH=etag
+                )
+                self.assertEqual(response.status_code, HTTPStatus.OK.value)
+
+    def test_comment_changes_post_detail_etag(self):
+        """Проверка смены ETag страницы поста после комментария."""
+        page = reverse('posts:post_detail',
+                       args=[ConditionalGetPostViewTest.post.id])
+        etag = self.guest_client.get(page)['ETag']
+        Comment.objects.create(
+            text='Тестовый комментарий',
+            author=ConditionalGetPostViewTest.author,
+            post=ConditionalGetPostViewTest.post,
+        )
+        response = self.guest_client.get(page, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK.value)
+
+    def test_if_modified_since_is_supported(self):
+        """Проверка ответа 304 по заголовку If-Modified-Since."""
+        page = reverse('posts:index')
+        last_modified = self.guest_client.get(page)['Last-Modified']
+        response = self.guest_client.get(
+            page, HTTP_IF_MODIFIED_SINCE=last_modified
         )
+        self.assertEqual(
+            response.status_code, HTTPStatus.NOT_MODIFIED.value
+        )
+
+    def test_if_modified_since_does_not_cross_login(self):
+        """Проверка, что копия гостя не подтверждается после входа."""
+        page = reverse('posts:index')
+        last_modified = self.guest_client.get(page)['Last-Modified']
+        client = Client()
+        client.force_login(ConditionalGetPostViewTest.author)
+        response = client.get(page, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, HTTPStatus.OK.value)
+        self.assertFalse(response.has_header('Last-Modified'))
@@ -0,0 +1,245 @@
+"""Заблаговременная генерация миниатюр картинок постов.
+
+Для каждой картинки создаются варианты всех ширин POST_IMAGE_WIDTHS в
+исходном формате миниатюр и в современных форматах POST_IMAGE_FORMATS.
+Генерация идет в пуле процессов после сохранения поста, а тег
+{% post_picture %} выводит в srcset только уже готовые варианты, поэтому
+запрос страницы никогда не режет дополнительные размеры сам.
+
+Модели и sorl-thumbnail импортируются внутри функций: модуль загружается
+процессами пула до вызова django.setup().
+"""
+import functools
+import logging
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+def _setup_worker():
+    # Процессы пула запускаются через spawn и не наследуют ни
+    # настроенный Django, ни открытые родителем соединения с базой.
+    import django
+    django.setup()
+
+
+def geometry(width):
+    base_width, base_height = settings.POST_IMAGE_SIZE
+    return f'{width}x{round(width * base_height / base_width)}'
+
+
+def modern_formats():
+    from core.thumbnail_backend import format_supported
+    return [
+        format_ for format_ in settings.POST_IMAGE_FORMATS
+        if format_supported(format_)
+    ]
+
+
+def variants(crops=None):
+    """Геометрии и опции всех миниатюр одной картинки.
+
+    У вариантов исходного формата опции format нет, чтобы их ключи
+    совпадали с миниатюрами, созданными раньше.
+    """
+    formats = [None, *modern_formats()]
+    result = []
+    for crop in crops or settings.POST_IMAGE_CROPS:
+        for width in settings.POST_IMAGE_WIDTHS:
+            for format_ in formats:
+                options = {'crop': crop, 'upscale': True}
+                if format_ is not None:
+                    options['format'] = format_
+                result.append((geometry(width), options))
+    return result
+
+
+def image_file(name):
+    """Картинка поста для sorl с хранилищем поля Post.image.
+
+    Ключи sorl зависят от класса хранилища, поэтому миниатюры по имени
+    файла должны совпадать с миниатюрами, запрошенными по post.image.
+    """
+    from posts.models import Post
+    from sorl.thumbnail.images import ImageFile
+    return ImageFile(name, Post._meta.get_field('image').storage)
+
+
+def generate(name):
+    """Создает все миниатюры картинки name и возвращает их количество."""
+    from sorl.thumbnail import get_thumbnail
+    created = variants()
+    source = image_file(name)
+    for geometry_string, options in created:
+        get_thumbnail(source, geometry_string, **options)
+    refresh_pages(name)
+    return len(created)
+
+
+def refresh_pages(name):
+    """Сбрасывает кеш страниц с постами картинки name.
+
+    Разметка <picture> лежит во фрагментах {% cache %} и входит в ETag,
+    а готовые варианты появляются уже после отрисовки страниц.
+    """
+    from posts import feed_cache, sharding
+    from posts.models import Post
+    scopes = {feed_cache.POSTS}
+    posts = Post.objects.filter(image=name).values_list(
+        'id', 'author_id', 'group_id'
+    )
+    for source in sharding.sources(posts):
+        for post_id, author_id, group_id in source:
+            scopes.add(feed_cache.post_scope(post_id))
+            scopes.add(feed_cache.author_scope(author_id))
+            if group_id is not None:
+                scopes.add(feed_cache.group_scope(group_id))
+    feed_cache.bump(*scopes)
+
+
+def create_pool(workers=None):
+    return ProcessPoolExecutor(
+        max_workers=workers or settings.THUMBNAIL_WORKERS,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=_setup_worker,
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def _get_pool():
+    return create_pool()
+
+
+def _log_failure(future):
+    error = future.exception()
+    if error is not None:
+        logger.error('Не удалось создать миниатюры', exc_info=error)
+
+
+def submit(func, *args):
+    """Выполняет func в пуле процессов и возвращает Future.
+
+    При THUMBNAIL_WORKERS = 0 функция выполняется сразу в текущем
+    процессе.
+    """
+    if not settings.THUMBNAIL_WORKERS:
+        future = Future()
+        try:
+            future.set_result(func(*args))
+        except Exception as error:
+            future.set_exception(error)
+        return future
+    try:
+        return _get_pool().submit(func, *args)
+    except BrokenProcessPool:
+        _get_pool.cache_clear()
+        return _get_pool().submit(func, *args)
+
+
+def schedule(name):
+    """Отправляет генерацию миниатюр в пул процессов."""
+    submit(generate, name).add_done_callback(_log_failure)
+
+
+def _thumbnail_options(backend, source, options):
+    # Повторяет дополнение опций из ThumbnailBackend.get_thumbnail,
+    # чтобы получить то же имя файла миниатюры, что и тег шаблона.
+    from sorl.thumbnail.conf import defaults, settings as thumbnail_settings
+    options = dict(options)
+    if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(thumbnail_settings, attr)
+        if value != getattr(defaults, attr):
+            options.setdefault(key, value)
+    return options
+
+
+def _thumbnail_file(source, geometry_string, options):
+    from sorl.thumbnail import default
+    from sorl.thumbnail.images import ImageFile
+    options = _thumbnail_options(default.backend, source, options)
+    filename = default.backend._get_thumbnail_filename(
+        source, geometry_string, options
+    )
+    return ImageFile(filename, default.storage)
+
+
+def thumbnail_keys(name):
+    """Ключи хранилища sorl для всех миниатюр картинки name."""
+    from sorl.thumbnail.kvstores.base import add_prefix
+    source = image_file(name)
+    return [
+        add_prefix(_thumbnail_file(source, geometry_string, options).key)
+        for geometry_string, options in variants()
+    ]
+
+
+def picture(image, crop):
+    """Данные для разметки <picture> картинки поста.
+
+    Основная миниатюра берется через get_thumbnail, как раньше делал тег
+    шаблона. Остальные варианты только ищутся в хранилище ключей.
+    """
+    from sorl.thumbnail import default, get_thumbnail
+    from sorl.thumbnail.images import ImageFile
+    base_width = settings.POST_IMAGE_SIZE[0]
+    fallback = get_thumbnail(
+        image, geometry(base_width), crop=crop, upscale=True
+    )
+    source = ImageFile(image)
+    srcsets = {}
+    for geometry_string, options in variants(crops=[crop]):
+        thumbnail = default.kvstore.get(
+            _thumbnail_file(source, geometry_string, options)
+        )
+        if thumbnail is None:
+            continue
+        srcsets.setdefault(options.get('format'), []).append(
+            f'{thumbnail.url} {thumbnail.width}w'
+        )
+    return {
+        'image': fallback,
+        'srcset': ', '.join(srcsets.pop(None, [])),
+        'sources': [
+            {
+                'type': f'image/{format_.lower()}',
+                'srcset': ', '.join(srcsets[format_]),
+            }
+            for format_ in modern_formats() if format_ in srcsets
+        ],
+        'sizes': settings.POST_IMAGE_SIZES,
+    }
+
+
+def prefetch(posts):
+    """Загружает ключи миниатюр всех постов страницы за один проход."""
+    from sorl.thumbnail import default
+    if not hasattr(default.kvstore, 'prefetch'):
+        return
+    keys = []
+    for post in posts:
+        if post.image:
+            keys.extend(thumbnail_keys(post.image.name))
+    if keys:
+        default.kvstore.prefetch(keys)
+
+
+def invalidate(name):
+    """Удаляет миниатюры картинки, если ни один пост ее больше не использует.
+
+    Сам файл картинки не трогаем: за него отвечает хранилище.
+    """
+    from posts import sharding
+    from posts.models import Post
+    from sorl.thumbnail import default
+    queryset = Post.objects.filter(image=name)
+    if any(source.exists() for source in sharding.sources(queryset)):
+        return
+    default.kvstore.delete(image_file(name))
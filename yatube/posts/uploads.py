@@ -0,0 +1,171 @@
+"""Прием картинок постов.
+
+Загрузка всегда пишется во временный файл и обрезается после
+POST_IMAGE_MAX_UPLOAD_SIZE байт. Формат и размеры проверяются по
+заголовку файла, без декодирования пикселей. Затем в собственном пуле
+из POST_IMAGE_WORKERS процессов картинка поворачивается по EXIF,
+уменьшается до POST_IMAGE_MAX_DIMENSION по большей стороне и
+пересохраняется без метаданных; результат небольшой и возвращается из
+процесса пула в памяти. Пул отделен от пула миниатюр: очередь фоновой
+генерации не задерживает ответ на загрузку.
+"""
+import functools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import (SimpleUploadedFile,
+                                            TemporaryUploadedFile)
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.template.defaultfilters import filesizeformat
+from PIL import Image, ImageOps
+
+REENCODED_FORMATS = {
+    'JPEG': 'image/jpeg',
+    'PNG': 'image/png',
+    'WEBP': 'image/webp',
+}
+
+
+class SizeLimitedUploadHandler(TemporaryFileUploadHandler):
+    """Пишет загрузку во временный файл, но не больше лимита.
+
+    Лишние байты дочитываются из запроса и отбрасываются, а файл
+    помечается атрибутом oversized, чтобы форма показала ошибку.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+        self.oversized = False
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > settings.POST_IMAGE_MAX_UPLOAD_SIZE:
+            self.oversized = True
+        if not self.oversized:
+            self.file.write(raw_data)
+
+    def file_complete(self, file_size):
+        file = super().file_complete(file_size)
+        file.oversized = self.oversized
+        return file
+
+
+def check(upload):
+    """Проверяет размер, формат и размеры картинки по заголовку."""
+    if getattr(upload, 'oversized', False):
+        limit = filesizeformat(settings.POST_IMAGE_MAX_UPLOAD_SIZE)
+        raise ValidationError(
+            f'Файл больше {limit}.', code='file_too_large'
+        )
+    upload.seek(0)
+    try:
+        with Image.open(upload) as image:
+            image_format = image.format
+            width, height = image.size
+    except (OSError, Image.DecompressionBombError):
+        raise ValidationError('Файл не похож на картинку.', code='invalid')
+    finally:
+        upload.seek(0)
+    if image_format not in settings.POST_IMAGE_UPLOAD_FORMATS:
+        raise ValidationError(
+            f'Формат {image_format} не поддерживается.', code='format'
+        )
+    if width * height > settings.POST_IMAGE_MAX_PIXELS:
+        raise ValidationError(
+            f'Картинка {width}x{height} слишком большая.', code='pixels'
+        )
+    return image_format
+
+
+def normalize(source, max_dimension, quality):
+    """Пересохраняет картинку без метаданных, уменьшив ее при нужде.
+
+    Выполняется в процессе пула. Возвращает байты результата или None,
+    если картинку нужно сохранить как есть (например, анимацию).
+    """
+    with Image.open(source) as image:
+        image_format = image.format
+        if (image_format not in REENCODED_FORMATS
+                or getattr(image, 'is_animated', False)):
+            return None
+        # Для JPEG декодер сразу уменьшает картинку в 2-8 раз.
+        image.draft(image.mode, (max_dimension, max_dimension))
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+        params = {'optimize': True}
+        if image_format == 'JPEG':
+            if image.mode not in ('RGB', 'L'):
+                image = image.convert('RGB')
+            params.update(quality=quality, progressive=True)
+        elif image_format == 'WEBP':
+            params = {'quality': quality}
+        output = BytesIO()
+        image.save(output, image_format, **params)
+    return output.getvalue()
+
+
+def _on_disk(upload):
+    if hasattr(upload, 'temporary_file_path'):
+        return upload
+    copy = TemporaryUploadedFile(
+        upload.name, upload.content_type, upload.size, None
+    )
+    upload.seek(0)
+    for chunk in upload.chunks():
+        copy.write(chunk)
+    copy.flush()
+    return copy
+
+
+@functools.lru_cache(maxsize=None)
+def _get_pool():
+    return ProcessPoolExecutor(
+        max_workers=settings.POST_IMAGE_WORKERS,
+        mp_context=multiprocessing.get_context('spawn'),
+    )
+
+
+def _normalize(path):
+    """Вызывает normalize в пуле загрузок или сразу, если пул отключен."""
+    args = (
+        path, settings.POST_IMAGE_MAX_DIMENSION, settings.POST_IMAGE_QUALITY
+    )
+    if not settings.POST_IMAGE_WORKERS:
+        return normalize(*args)
+    try:
+        future = _get_pool().submit(normalize, *args)
+    except BrokenProcessPool:
+        _get_pool.cache_clear()
+        future = _get_pool().submit(normalize, *args)
+    try:
+        return future.result(timeout=settings.POST_IMAGE_PROCESS_TIMEOUT)
+    except BrokenProcessPool:
+        _get_pool.cache_clear()
+        raise
+
+
+def process(upload):
+    """Проверяет загрузку и возвращает подготовленный к сохранению файл."""
+    image_format = check(upload)
+    if image_format not in REENCODED_FORMATS:
+        return upload
+    source = _on_disk(upload)
+    try:
+        content = _normalize(source.temporary_file_path())
+    except (OSError, TimeoutError, BrokenProcessPool):
+        raise ValidationError(
+            'Не удалось обработать картинку.', code='invalid'
+        )
+    finally:
+        if source is not upload:
+            source.close()
+    if content is None:
+        return upload
+    return SimpleUploadedFile(
+        upload.name, content, REENCODED_FORMATS[image_format]
+    )
@@ -25,6 +25,11 @@ urlpatterns = [
         views.follow_index,
         name='follow_index'
     ),
+    path(
+        'search/',
+        views.post_search,
+        name='search'
+    ),
     path(
         'group/<slug:slug>/',
         views.group_posts,
@@ -35,6 +40,11 @@ urlpatterns = [
         views.profile,
         name='profile'
     ),
+    path(
+        'profile/<str:username>/export/<str:file_format>/',
+        views.profile_export,
+        name='profile_export'
+    ),
     path(
         'profile/<str:username>/follow/',
         views.profile_follow,
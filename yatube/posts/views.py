@@ -1,34 +1,65 @@
+from urllib.parse import urlencode
+
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.db.models import Exists, OuterRef
+from django.http import Http404, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
+from posts import exporter, feed, feed_cache, search, sharding, stats
+from posts.conditional import (conditional_page, group_scopes, index_scopes,
+                               post_scopes, profile_scopes)
 from posts.forms import CommentForm, PostForm
 from posts.models import Comment, Follow, Group, Post
+from posts.paginator import CursorPaginator
 
 from yatube.settings import POSTS_PER_PAGE
 
 User = get_user_model()
 
 
+def paginate(request, object_list):
+    paginator = CursorPaginator(object_list, POSTS_PER_PAGE)
+    return paginator.get_page(request.GET.get('cursor'))
+
+
+@conditional_page(index_scopes)
 def index(request):
     template = 'posts/index.html'
     page_title = 'Последние обновления на сайте'
 
-    posts = Post.objects.select_related('group', 'author').all()
-    paginator = Paginator(posts, POSTS_PER_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    posts = sharding.sources(
+        Post.objects.select_related('group', 'author').all()
+    )
+    page_obj = paginate(request, posts)
 
     context = {
         'page_title': page_title,
-        'page_obj': page_obj
+        'page_obj': page_obj,
+        **feed_cache.fragment_context(feed_cache.POSTS),
+    }
+    return render(request, template, context)
+
+
+def post_search(request):
+    template = 'posts/search.html'
+    query = request.GET.get('q', '').strip()
+    page_title = f'Поиск: {query}' if query else 'Поиск по постам'
+
+    paginator = search.search_paginator(query, POSTS_PER_PAGE)
+    page_obj = paginator.get_page(request.GET.get('cursor'))
+
+    context = {
+        'page_title': page_title,
+        'page_obj': page_obj,
+        'query': query,
+        'page_query': urlencode({'q': query}) + '&',
     }
     return render(request, template, context)
 
 
 @login_required
 def comment_delete(request, comment_id):
-    comment = get_object_or_404(
+    comment = sharding.get_object_or_404(
         Comment.objects.select_related('post'),
         id=comment_id
     )
@@ -69,59 +100,68 @@ def follow_index(request):
     template = 'posts/follow.html'
     page_title = 'Последние обновления у избранных авторов'
 
-    posts = (Post.objects.select_related('group', 'author').
-             filter(author__following__user=request.user))
-    paginator = Paginator(posts, POSTS_PER_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    paginator = feed.follow_feed_paginator(request.user, POSTS_PER_PAGE)
+    page_obj = paginator.get_page(request.GET.get('cursor'))
 
     context = {
         'page_title': page_title,
-        'page_obj': page_obj
+        'page_obj': page_obj,
+        **feed_cache.fragment_context(
+            feed_cache.POSTS,
+            feed_cache.follower_scope(request.user.id),
+        ),
     }
     return render(request, template, context)
 
 
+@conditional_page(group_scopes)
 def group_posts(request, slug):
     template = 'posts/group_list.html'
     group = get_object_or_404(Group, slug=slug)
     page_title = f'Записи сообщества {group.title}'
 
-    posts = group.posts.select_related('author').all()
-    paginator = Paginator(posts, POSTS_PER_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    posts = sharding.sources(group.posts.select_related('author').all())
+    page_obj = paginate(request, posts)
 
     context = {
         'page_title': page_title,
         'page_obj': page_obj,
-        'group': group
+        'group': group,
+        **feed_cache.fragment_context(
+            feed_cache.group_scope(group.id),
+            feed_cache.USERS,
+        ),
     }
     return render(request, template, context)
 
 
+@conditional_page(profile_scopes)
 def profile(request, username):
     template = 'posts/profile.html'
-    author = get_object_or_404(User, username=username)
+    author = get_object_or_404(
+        User.objects.select_related('stats', 'shard').annotate(
+            is_followed=Exists(Follow.objects.filter(
+                user=request.user.id,
+                author=OuterRef('pk'),
+            ))
+        ),
+        username=username
+    )
     page_title = f'Профайл пользователя @{author.username}'
-    if request.user.is_authenticated:
-        following = Follow.objects.filter(
-            user=request.user.id,
-            author=author,
-        ).exists()
-    else:
-        following = False
 
     posts = author.posts.select_related('group').all()
-    paginator = Paginator(posts, POSTS_PER_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = paginate(request, posts)
 
     context = {
         'page_title': page_title,
         'page_obj': page_obj,
         'author': author,
-        'following': following,
+        'author_stats': stats.stats_for(author),
+        'following': author.is_followed,
+        **feed_cache.fragment_context(
+            feed_cache.author_scope(author.id),
+            feed_cache.GROUPS,
+        ),
     }
     return render(request, template, context)
 
@@ -149,10 +189,28 @@ def profile_unfollow(request, username):
     return redirect('posts:profile', username=username)
 
 
+@login_required
+def profile_export(request, username, file_format):
+    if file_format not in exporter.FORMATS:
+        raise Http404
+    author = get_object_or_404(User, username=username)
+    if request.user != author and not request.user.is_staff:
+        return redirect('posts:profile', username=username)
+
+    lines, content_type = exporter.FORMATS[file_format]
+    records = exporter.records(list(exporter.SOURCES), user=author)
+    response = StreamingHttpResponse(lines(records), content_type=content_type)
+    response['Content-Disposition'] = (
+        f'attachment; filename="{author.username}.{file_format}"'
+    )
+    return response
+
+
+@conditional_page(post_scopes)
 def post_detail(request, post_id):
     template = 'posts/post_detail.html'
-    post = get_object_or_404(
-        Post.objects.select_related('group', 'author'),
+    post = sharding.get_object_or_404(
+        Post.objects.select_related('group', 'author', 'author__stats'),
         id=post_id
     )
     comments = post.comments.select_related('author').all()
@@ -162,6 +220,7 @@ def post_detail(request, post_id):
     context = {
         'page_title': page_title,
         'post': post,
+        'author_stats': stats.stats_for(post.author),
         'comments': comments,
         'form': form
     }
@@ -170,7 +229,7 @@ def post_detail(request, post_id):
 
 @login_required
 def add_comment(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
+    post = sharding.get_object_or_404(Post.objects, id=post_id)
     form = CommentForm(request.POST or None)
     if form.is_valid():
         comment = form.save(commit=False)
@@ -182,7 +241,7 @@ def add_comment(request, post_id):
 
 @login_required
 def post_delete(request, post_id):
-    post = get_object_or_404(
+    post = sharding.get_object_or_404(
         Post.objects.select_related('author'),
         id=post_id
     )
@@ -194,8 +253,8 @@ def post_delete(request, post_id):
 
 @login_required
 def post_edit(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
-    if request.user != post.author:
+    post = sharding.get_object_or_404(Post.objects, id=post_id)
+    if request.user.id != post.author_id:
         return redirect('posts:post_detail', post_id=post_id)
 
     template = 'posts/create_post.html'
@@ -210,7 +269,7 @@ def post_edit(request, post_id):
         return render(request, template, context)
 
     form = PostForm(request.POST, files=request.FILES or None, instance=post)
-    if not form.is_valid:
+    if not form.is_valid():
         context = {
             'page_title': page_title,
             'form': form
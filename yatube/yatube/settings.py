@@ -50,20 +50,27 @@ INSTALLED_APPS = [
     'posts.apps.PostsConfig',
     'users.apps.UsersConfig',
     'sorl.thumbnail',
-    'debug_toolbar',
 ]
 
 MIDDLEWARE = [
+    'core.metrics.MetricsMiddleware',
+    'core.query_budget.QueryBudgetMiddleware',
+    'core.slow_queries.SlowQueryMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.profiling.ProfilingMiddleware',
+    'core.db_router.ReplicaMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'debug_toolbar.middleware.DebugToolbarMiddleware',
 ]
 
+if DEBUG:
+    INSTALLED_APPS += ['debug_toolbar']
+    MIDDLEWARE += ['debug_toolbar.middleware.DebugToolbarMiddleware']
+
 ROOT_URLCONF = 'yatube.urls'
 
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
@@ -95,25 +102,123 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 600)),
     }
 }
 
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    # В WAL режим NORMAL не портит базу при сбое, теряются только
+    # последние транзакции.
+    'synchronous': 'normal',
+    'mmap_size': 256 * 1024 * 1024,
+    # Отрицательное значение - размер в КиБ, а не в страницах.
+    'cache_size': -64 * 1024,
+    'busy_timeout': 5000,
+    'temp_store': 'memory',
+}
+
+# Реплики не переводятся в WAL: их файл целиком подменяет команда
+# replicate, и журнал WAL от прошлой копии не подошел бы к новой.
+SQLITE_REPLICA_PRAGMAS = {
+    'query_only': 1,
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,
+    'busy_timeout': 5000,
+    'temp_store': 'memory',
+}
+
+SQLITE_HEALTH_CHECKS = True
+
+SQLITE_BUSY_RETRIES = 5
+
+SQLITE_BUSY_BACKOFF = 0.05
+
+SQLITE_BUSY_BACKOFF_MAX = 1
+
+# Реплики для чтения: DB_REPLICAS=2 добавляет replica1 и replica2,
+# их наполняет команда replicate.
+DATABASE_REPLICAS = [
+    f'replica{number}'
+    for number in range(1, int(os.getenv('DB_REPLICAS', 0)) + 1)
+]
+
+for alias in DATABASE_REPLICAS:
+    DATABASES[alias] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, f'db.{alias}.sqlite3'),
+        'CONN_MAX_AGE': DATABASES['default']['CONN_MAX_AGE'],
+        'TEST': {'MIRROR': 'default'},
+    }
+
+# Шардирование постов и комментариев по авторам (posts.sharding):
+# DB_POST_SHARDS=3 добавляет shard1 и shard2 к default. Схему шарда
+# создает migrate --database shardN, авторов переносит reshard.
+POST_SHARDS = ['default'] + [
+    f'shard{number}'
+    for number in range(1, int(os.getenv('DB_POST_SHARDS', 1)))
+]
+
+for alias in POST_SHARDS[1:]:
+    DATABASES[alias] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, f'db.{alias}.sqlite3'),
+        'CONN_MAX_AGE': DATABASES['default']['CONN_MAX_AGE'],
+    }
+
+POST_SHARD_ID_BLOCK = 100
+
+# Через сколько секунд reshard догоняет записи, попавшие на старый шард
+# автора во время переноса: дольше busy_timeout из SQLITE_PRAGMAS.
+POST_SHARD_SWEEP_DELAY = 6
+
+DATABASE_ROUTERS = [
+    'posts.sharding.ShardRouter',
+    'core.db_router.ReplicaRouter',
+]
+
+DATABASE_REPLICA_VIEWS = (
+    'posts:index',
+    'posts:group_list',
+    'posts:profile',
+    'posts:post_detail',
+)
+
+DATABASE_PIN_COOKIE = 'primary_pin'
+
+# Дольше интервала репликации, чтобы запись успела дойти до реплик.
+DATABASE_PIN_SECONDS = 15
+
+REPLICATION_INTERVAL = 5
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
 
 AUTH_PASSWORD_VALIDATORS = [
     {
-        'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
+        'NAME': (
+            'django.contrib.auth.password_validation.'
+            'UserAttributeSimilarityValidator'
+        ),
     },
     {
-        'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator',
+        'NAME': (
+            'django.contrib.auth.password_validation.'
+            'MinimumLengthValidator'
+        ),
     },
     {
-        'NAME': 'django.contrib.auth.password_validation.CommonPasswordValidator',
+        'NAME': (
+            'django.contrib.auth.password_validation.'
+            'CommonPasswordValidator'
+        ),
     },
     {
-        'NAME': 'django.contrib.auth.password_validation.NumericPasswordValidator',
+        'NAME': (
+            'django.contrib.auth.password_validation.'
+            'NumericPasswordValidator'
+        ),
     },
 ]
 
@@ -167,12 +272,153 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.cache_backends.sqlite.SQLiteCache',
+        'LOCATION': os.getenv(
+            'CACHE_LOCATION',
+            os.path.join(BASE_DIR, 'cache', 'cache.sqlite3')
+        ),
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+            'MAX_SIZE': 256 * 1024 * 1024,
+        },
     }
 }
 
+# Query budgets
+
+# Наибольшее число запросов на GET-запрос авторизованного пользователя;
+# сессия и пользователь входят в бюджет.
+QUERY_BUDGETS = {
+    'posts:index': 3,
+    'posts:search': 3,
+    'posts:group_list': 5,
+    'posts:profile': 5,
+    'posts:follow_index': 6,
+    'posts:post_detail': 5,
+    'posts:post_create': 3,
+    'posts:post_edit': 4,
+    'admin:posts_post_changelist': 7,
+    'admin:posts_comment_changelist': 5,
+    'admin:posts_follow_changelist': 5,
+}
+
+# Заполнение хранилища ключей sorl-thumbnail при первом показе картинки
+# происходит один раз и в бюджет не входит.
+QUERY_BUDGET_EXCLUDE = (
+    r'"thumbnail_kvstore"',
+    r'^(RELEASE )?SAVEPOINT ',
+)
+
+QUERY_BUDGET_SAMPLE_RATE = float(os.getenv('QUERY_BUDGET_SAMPLE_RATE', 0.01))
+
+QUERY_BUDGET_STRICT = False
+
+TEST_RUNNER = 'core.test_runner.QueryBudgetTestRunner'
+
+# Profiling
+
+# Профилируется в среднем один запрос из стольких; 0 - не профилировать.
+PROFILING_SAMPLE_EVERY = int(os.getenv('PROFILING_SAMPLE_EVERY', 0))
+
+PROFILING_URL_NAMES = ()
+
+PROFILING_HEADER = 'HTTP_X_PROFILE'
+
+PROFILING_DIR = os.path.join(BASE_DIR, 'cache', 'profiles')
+
+PROFILING_KEEP = 200
+
+# Metrics
+
+METRICS_ENABLED = True
+
+# Файлы счетчиков процессов; при деплое каталог очищают.
+METRICS_DIR = os.getenv(
+    'METRICS_DIR', os.path.join(BASE_DIR, 'cache', 'metrics')
+)
+
+METRICS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+METRICS_ALLOWED_IPS = os.getenv('METRICS_ALLOWED_IPS', '127.0.0.1').split(',')
+
+# Slow query log
+
+# Запросы дольше порога попадают в журнал; None - журнал выключен. В
+# окружении журнал выключают пустым значением или off.
+SLOW_QUERY_THRESHOLD_MS = os.getenv('SLOW_QUERY_THRESHOLD_MS', '100').strip()
+SLOW_QUERY_THRESHOLD_MS = (
+    None if SLOW_QUERY_THRESHOLD_MS.lower() in ('', 'off')
+    else float(SLOW_QUERY_THRESHOLD_MS)
+)
+
+SLOW_QUERY_EXPLAIN = True
+
+SLOW_QUERY_LOG = os.path.join(BASE_DIR, 'cache', 'slow_queries.jsonl')
+
+SLOW_QUERY_LOG_MAX_BYTES = 10 * 1024 * 1024
+
+SLOW_QUERY_LOG_BACKUPS = 5
+
 # DjDT
 
 INTERNAL_IPS = [
     '127.0.0.1',
 ]
+
+# Follow feed settings
+
+FEED_BACKFILL_SIZE = 200
+
+FEED_FANOUT_BATCH_SIZE = 500
+
+FEED_PULL_MIN_FOLLOWERS = 1000
+
+FEED_PULL_MIN_DAILY_POSTS = 50
+
+# Fragment cache settings
+
+FRAGMENT_CACHE_TIMEOUT = 60 * 60 * 6
+
+# Thumbnail settings
+
+POST_IMAGE_SIZE = (960, 339)
+
+POST_IMAGE_WIDTHS = (480, 960, 1440)
+
+POST_IMAGE_CROPS = ('center', 'left')
+
+# Форматы для <source> в порядке предпочтения; неподдерживаемые
+# установленным Pillow пропускаются.
+POST_IMAGE_FORMATS = ('AVIF', 'WEBP')
+
+POST_IMAGE_SIZES = '(max-width: 960px) 100vw, 960px'
+
+THUMBNAIL_BACKEND = 'core.thumbnail_backend.ThumbnailBackend'
+
+# Upload settings
+
+FILE_UPLOAD_HANDLERS = ['posts.uploads.SizeLimitedUploadHandler']
+
+POST_IMAGE_MAX_UPLOAD_SIZE = 20 * 1024 * 1024
+
+POST_IMAGE_UPLOAD_FORMATS = ('JPEG', 'PNG', 'GIF', 'WEBP')
+
+POST_IMAGE_MAX_PIXELS = 50_000_000
+
+POST_IMAGE_MAX_DIMENSION = 2560
+
+POST_IMAGE_QUALITY = 85
+
+POST_IMAGE_PROCESS_TIMEOUT = 30
+
+POST_IMAGE_WORKERS = int(os.getenv('POST_IMAGE_WORKERS', 1))
+
+MEDIA_GC_STATE_FILE = os.path.join(BASE_DIR, 'cache', 'media_gc.json')
+
+THUMBNAIL_WORKERS = int(os.getenv('THUMBNAIL_WORKERS', 2))
+
+THUMBNAIL_KVSTORE = 'core.thumbnail_kvstore.TieredKVStore'
+
+THUMBNAIL_LRU_SIZE = 10000
+
+THUMBNAIL_LRU_TIMEOUT = 60
@@ -3,11 +3,15 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
+from core.views import metrics_export, profiling_report
+
 urlpatterns = [
     path('about/', include('about.urls', namespace='about')),
+    path('admin/profiling/', profiling_report, name='profiling'),
     path('admin/', admin.site.urls),
     path('auth/', include('users.urls', namespace='users')),
     path('auth/', include('django.contrib.auth.urls')),
+    path('metrics', metrics_export, name='metrics'),
     path('', include('posts.urls', namespace='posts'))
 ]
 